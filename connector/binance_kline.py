@@ -9,15 +9,17 @@ Features:
 - Time range filtering with start_time and end_time
 - Automatic pagination for large data requests
 - Input validation for symbols and time ranges
-- Rate limiting considerations
+- Shared token-bucket rate limiting
 - Comprehensive error handling
 """
 
+import os
 import time
 import requests
 from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional, Union
 import logging
+from connector.rate_limit import RateLimiter, get_rate_limiter, binance_klines_weight
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -53,14 +55,27 @@ class BinanceKlineFetcher:
     
     # Maximum limit per request (Binance limit)
     MAX_LIMIT = 1500
+
+    # Bars per page used by range downloads (spot allows at most 1000)
+    PAGE_LIMIT = 1000
     
-    def __init__(self, market_type: str = "spot", request_delay: float = 0.1):
+    def __init__(
+        self,
+        market_type: str = "spot",
+        request_delay: float = 0.0,
+        rate_limiter: Optional[RateLimiter] = None,
+        base_url: Optional[str] = None
+    ):
         """
         Initialize the BinanceKlineFetcher.
         
         Args:
             market_type (str): Market type, either "spot" or "futures"
-            request_delay (float): Delay between requests in seconds to avoid rate limiting
+            request_delay (float): Extra delay after each request in seconds; pacing
+                is handled by the shared rate limiter, so this defaults to 0
+            rate_limiter (RateLimiter, optional): Limiter to use instead of the shared one
+            base_url (str, optional): REST root to use instead of the Binance hosts (e.g. a
+                local simulator); defaults to the BINANCE_BASE_URL env var if set
         """
         if market_type not in ["spot", "futures"]:
             raise ValueError("market_type must be 'spot' or 'futures'")
@@ -74,8 +89,10 @@ class BinanceKlineFetcher:
         else:
             self.base_url = self.FUTURES_BASE_URL
             self.klines_endpoint = self.FUTURES_KLINES_ENDPOINT
+        self.base_url = (base_url or os.getenv("BINANCE_BASE_URL") or self.base_url).rstrip("/")
             
         self.session = requests.Session()
+        self.rate_limiter = rate_limiter or get_rate_limiter(f"binance_{market_type}")
         
     def _validate_symbol(self, symbol: str) -> str:
         """
@@ -161,6 +178,8 @@ class BinanceKlineFetcher:
             BinanceKlineError: If API request fails
         """
         url = f"{self.base_url}{self.klines_endpoint}"
+        weight = binance_klines_weight(self.market_type, params.get('limit', 500))
+        self.rate_limiter.acquire(self.klines_endpoint, weight)
         
         try:
             response = self.session.get(url, params=params, timeout=30)
@@ -272,12 +291,39 @@ class BinanceKlineFetcher:
         # Make request
         raw_data = self._make_request(params)
         
-        # Add delay to avoid rate limiting
-        time.sleep(self.request_delay)
+        if self.request_delay:
+            time.sleep(self.request_delay)
         
         # Format and return data
         return self._format_kline_data(raw_data)
     
+    def fetch_page(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> List[Dict[str, Any]]:
+        """
+        Fetch klines whose open time lies in [start_ms, end_ms).
+
+        The range may be at most PAGE_LIMIT bars long.
+
+        Args:
+            symbol (str): Trading symbol (e.g., 'BTCUSDT')
+            interval (str): Kline interval (e.g., '1h', '1d')
+            start_ms (int): Inclusive start timestamp in milliseconds
+            end_ms (int): Exclusive end timestamp in milliseconds
+
+        Returns:
+            List[Dict]: Kline data sorted by open time ascending
+
+        Raises:
+            BinanceKlineError: If API request fails
+        """
+        klines = self.fetch_klines(
+            symbol=symbol,
+            interval=interval,
+            start_time=int(start_ms),
+            end_time=int(end_ms) - 1,
+            limit=self.PAGE_LIMIT
+        )
+        return [k for k in klines if start_ms <= k['open_time'] < end_ms]
+
     def fetch_klines_paginated(
         self,
         symbol: str,
@@ -361,12 +407,12 @@ class BinanceKlineFetcher:
         return all_klines
 
 
-def create_spot_fetcher(request_delay: float = 0.1) -> BinanceKlineFetcher:
+def create_spot_fetcher(request_delay: float = 0.0) -> BinanceKlineFetcher:
     """
     Create a BinanceKlineFetcher for spot market.
     
     Args:
-        request_delay (float): Delay between requests
+        request_delay (float): Extra delay between requests (rate limiting is automatic)
         
     Returns:
         BinanceKlineFetcher: Configured for spot market
@@ -374,12 +420,12 @@ def create_spot_fetcher(request_delay: float = 0.1) -> BinanceKlineFetcher:
     return BinanceKlineFetcher(market_type="spot", request_delay=request_delay)
 
 
-def create_futures_fetcher(request_delay: float = 0.1) -> BinanceKlineFetcher:
+def create_futures_fetcher(request_delay: float = 0.0) -> BinanceKlineFetcher:
     """
     Create a BinanceKlineFetcher for futures market.
     
     Args:
-        request_delay (float): Delay between requests
+        request_delay (float): Extra delay between requests (rate limiting is automatic)
         
     Returns:
         BinanceKlineFetcher: Configured for futures market
@@ -10,7 +10,7 @@ Features:
 - Historical open interest data with time range filtering
 - Support for different time intervals
 - Input validation and error handling
-- Rate limiting considerations
+- Shared token-bucket rate limiting
 """
 
 import time
@@ -18,6 +18,7 @@ import requests
 from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional, Union
 import logging
+from connector.rate_limit import RateLimiter, get_rate_limiter
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -49,15 +50,18 @@ class BinanceOpenInterestFetcher:
     # Maximum limit per request
     MAX_LIMIT = 500
     
-    def __init__(self, request_delay: float = 0.1):
+    def __init__(self, request_delay: float = 0.0, rate_limiter: Optional[RateLimiter] = None):
         """
         Initialize the BinanceOpenInterestFetcher.
         
         Args:
-            request_delay (float): Delay between requests in seconds to avoid rate limiting
+            request_delay (float): Extra delay after each request in seconds; pacing
+                is handled by the shared rate limiter, so this defaults to 0
+            rate_limiter (RateLimiter, optional): Limiter to use instead of the shared one
         """
         self.request_delay = request_delay
         self.session = requests.Session()
+        self.rate_limiter = rate_limiter or get_rate_limiter("binance_futures")
         
     def _validate_symbol(self, symbol: str) -> str:
         """
@@ -144,6 +148,7 @@ class BinanceOpenInterestFetcher:
             BinanceOpenInterestError: If API request fails
         """
         url = f"{self.FUTURES_BASE_URL}{endpoint}"
+        self.rate_limiter.acquire(endpoint)
         
         try:
             response = self.session.get(url, params=params, timeout=30)
@@ -182,8 +187,8 @@ class BinanceOpenInterestFetcher:
         # Make request
         data = self._make_request(self.OPEN_INTEREST_ENDPOINT, params)
         
-        # Add delay to avoid rate limiting
-        time.sleep(self.request_delay)
+        if self.request_delay:
+            time.sleep(self.request_delay)
         
         # Format response
         formatted_data = {
@@ -250,8 +255,8 @@ class BinanceOpenInterestFetcher:
         # Make request
         data = self._make_request(self.OPEN_INTEREST_HIST_ENDPOINT, params)
         
-        # Add delay to avoid rate limiting
-        time.sleep(self.request_delay)
+        if self.request_delay:
+            time.sleep(self.request_delay)
         
         # Format and return data
         return self._format_historical_data(data)
@@ -297,8 +302,8 @@ class BinanceOpenInterestFetcher:
         # Make request without symbol parameter to get all symbols
         data = self._make_request(self.OPEN_INTEREST_ENDPOINT, {})
         
-        # Add delay to avoid rate limiting
-        time.sleep(self.request_delay)
+        if self.request_delay:
+            time.sleep(self.request_delay)
         
         # If data is a list (all symbols), format each item
         if isinstance(data, list):
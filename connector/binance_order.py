@@ -29,6 +29,7 @@ from typing import Dict, Any, Optional, List, Union, Literal
 from enum import Enum
 import logging
 from dotenv import load_dotenv
+from connector.rate_limit import RateLimiter, get_rate_limiter
 
 # Load environment variables from .env file
 load_dotenv()
@@ -124,7 +125,9 @@ class BinanceOrderClient:
         api_secret: str = None,
         market_type: str = "futures",
         testnet: bool = False,
-        recv_window: int = 5000
+        recv_window: int = 5000,
+        rate_limiter: Optional[RateLimiter] = None,
+        base_url: Optional[str] = None
     ):
         """
         Initialize the BinanceOrderClient.
@@ -135,6 +138,9 @@ class BinanceOrderClient:
             market_type (str): Market type, either "spot" or "futures"
             testnet (bool): Whether to use testnet (for testing without real money)
             recv_window (int): Request validity window in milliseconds
+            rate_limiter (RateLimiter, optional): Limiter to use instead of the shared one
+            base_url (str, optional): REST root to use instead of the Binance hosts (e.g. a
+                local simulator); defaults to the BINANCE_BASE_URL env var if set
         """
         # Get API credentials from parameters or environment variables
         self.api_key = api_key or os.getenv("BINANCE_API_KEY")
@@ -153,12 +159,14 @@ class BinanceOrderClient:
         self.market_type = market_type
         self.testnet = testnet
         self.recv_window = recv_window
+        self.rate_limiter = rate_limiter or get_rate_limiter(f"binance_{market_type}")
         
         # Set base URL based on market type and testnet setting
         if market_type == "spot":
             self.base_url = self.SPOT_TESTNET_URL if testnet else self.SPOT_BASE_URL
         else:
             self.base_url = self.FUTURES_TESTNET_URL if testnet else self.FUTURES_BASE_URL
+        self.base_url = (base_url or os.getenv("BINANCE_BASE_URL") or self.base_url).rstrip("/")
             
         self.session = requests.Session()
         self.session.headers.update({
@@ -223,6 +231,8 @@ class BinanceOrderClient:
             BinanceOrderError: If API request fails
         """
         params = params or {}
+        # wait for the rate limiter before stamping, so the wait does not eat into recvWindow
+        self.rate_limiter.acquire(endpoint)
         
         # Add timestamp and recvWindow
         params['timestamp'] = self._get_timestamp()
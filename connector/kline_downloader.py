@@ -0,0 +1,208 @@
+"""
+Concurrent Historical Kline Downloader
+
+This module downloads long kline histories by splitting the requested time
+range into page-aligned chunks and fetching them concurrently. Request pacing
+is left to the fetcher's shared rate limiter, so the pool runs exactly as fast
+as the exchange permits.
+
+Features:
+- Works with OKXKlineFetcher and BinanceKlineFetcher (anything with fetch_page/PAGE_LIMIT)
+- Page-aligned chunks, so repeated downloads request identical pages
+- Concurrent fetching with per-page retries
+- In-order reassembly and de-duplication by timestamp
+- Progress reporting via logging and an optional callback
+"""
+
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+_UNIT_MS = {
+    's': 1000,
+    'm': 60 * 1000,
+    'h': 60 * 60 * 1000,
+    'd': 24 * 60 * 60 * 1000,
+    'w': 7 * 24 * 60 * 60 * 1000,
+}
+
+
+def interval_to_ms(interval: str) -> int:
+    """
+    Convert an OKX/Binance interval ('1m', '1H', '4h', '1D', ...) to milliseconds.
+
+    Args:
+        interval (str): Kline interval
+
+    Returns:
+        int: Interval length in milliseconds
+
+    Raises:
+        ValueError: If the interval has no fixed length (e.g. months)
+    """
+    unit = interval[-1]
+    if unit == 'M' or unit.lower() not in _UNIT_MS or not interval[:-1].isdigit():
+        raise ValueError(f"Unsupported interval for range downloads: {interval}")
+    return int(interval[:-1]) * _UNIT_MS[unit.lower()]
+
+
+def to_ms(timestamp: Union[int, float, str, datetime]) -> int:
+    """
+    Convert a timestamp to epoch milliseconds.
+
+    Args:
+        timestamp: datetime, ISO 8601 string, or epoch seconds/milliseconds
+
+    Returns:
+        int: Unix timestamp in milliseconds
+    """
+    if isinstance(timestamp, datetime):
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return int(timestamp.timestamp() * 1000)
+    if isinstance(timestamp, str):
+        dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+        return to_ms(dt)
+    if isinstance(timestamp, (int, float)):
+        return int(timestamp) if timestamp > 10**10 else int(timestamp * 1000)
+    raise ValueError("Timestamp must be datetime, string, or numeric")
+
+
+def normalize_kline(kline: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert an OKX or Binance formatted kline into the datawarehouse row format.
+
+    Args:
+        kline (Dict): Output of a fetcher's _format_kline_data
+
+    Returns:
+        Dict: {'timestamp' (ms), 'open', 'high', 'low', 'close', 'volume'}
+    """
+    return {
+        'timestamp': int(kline['timestamp'] if 'timestamp' in kline else kline['open_time']),
+        'open': float(kline['open_price']),
+        'high': float(kline['high_price']),
+        'low': float(kline['low_price']),
+        'close': float(kline['close_price']),
+        'volume': float(kline['volume']),
+    }
+
+
+class KlineDownloader:
+    """
+    Download a kline range as concurrent, page-aligned requests.
+    """
+
+    def __init__(self, fetcher, max_workers: int = 8, max_retries: int = 3, retry_delay: float = 1.0):
+        """
+        Initialize the KlineDownloader.
+
+        Args:
+            fetcher: OKXKlineFetcher or BinanceKlineFetcher instance
+            max_workers (int): Number of concurrent page requests
+            max_retries (int): Attempts per page before giving up
+            retry_delay (float): Base delay in seconds between attempts (doubles each retry)
+        """
+        self.fetcher = fetcher
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+    def plan(self, interval: str, start_ms: int, end_ms: int) -> List[Tuple[int, int]]:
+        """
+        Split [start_ms, end_ms) into page-aligned chunks.
+
+        Args:
+            interval (str): Kline interval
+            start_ms (int): Inclusive start timestamp in milliseconds
+            end_ms (int): Exclusive end timestamp in milliseconds
+
+        Returns:
+            List[Tuple[int, int]]: (start_ms, end_ms) per page, in time order
+        """
+        interval_ms = interval_to_ms(interval)
+        page_ms = self.fetcher.PAGE_LIMIT * interval_ms
+
+        pages = []
+        page_start = start_ms - start_ms % page_ms
+        while page_start < end_ms:
+            page_end = page_start + page_ms
+            pages.append((max(page_start, start_ms), min(page_end, end_ms)))
+            page_start = page_end
+        return pages
+
+    def _fetch_page(self, symbol: str, interval: str, page: Tuple[int, int]) -> List[Dict[str, Any]]:
+        for attempt in range(self.max_retries):
+            try:
+                return self.fetcher.fetch_page(symbol, interval, page[0], page[1])
+            except Exception as e:
+                if attempt == self.max_retries - 1:
+                    raise
+                delay = self.retry_delay * (2 ** attempt)
+                logger.warning(f"Page {page} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+        return []
+
+    def download(
+        self,
+        symbol: str,
+        interval: str,
+        start_time: Union[int, str, datetime],
+        end_time: Union[int, str, datetime],
+        progress: Optional[Callable[[int, int, int], None]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Download all klines with open time in [start_time, end_time).
+
+        Args:
+            symbol (str): Trading symbol in the fetcher's format
+            interval (str): Kline interval
+            start_time: Start of the range
+            end_time: End of the range (exclusive)
+            progress (callable, optional): Called as progress(done_pages, total_pages, rows)
+
+        Returns:
+            List[Dict]: Normalized klines sorted by timestamp, without duplicates
+
+        Raises:
+            ValueError: If the range is empty
+            Exception: The fetcher's error if a page still fails after retries
+        """
+        start_ms = to_ms(start_time)
+        end_ms = to_ms(end_time)
+        if start_ms >= end_ms:
+            raise ValueError("start_time must be before end_time")
+
+        pages = self.plan(interval, start_ms, end_ms)
+        results: List[Optional[List[Dict[str, Any]]]] = [None] * len(pages)
+        total_rows = 0
+        done = 0
+        report_every = max(1, len(pages) // 20)
+
+        logger.info(f"Downloading {symbol} {interval} in {len(pages)} pages "
+                    f"with {self.max_workers} workers")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self._fetch_page, symbol, interval, page): i
+                       for i, page in enumerate(pages)}
+            for future in as_completed(futures):
+                i = futures[future]
+                results[i] = future.result()
+                done += 1
+                total_rows += len(results[i])
+                if progress is not None:
+                    progress(done, len(pages), total_rows)
+                if done % report_every == 0 or done == len(pages):
+                    logger.info(f"Downloaded {done}/{len(pages)} pages, {total_rows} klines")
+
+        # Reassemble in page order and drop overlaps
+        merged: Dict[int, Dict[str, Any]] = {}
+        for page_rows in results:
+            for kline in page_rows or []:
+                row = normalize_kline(kline)
+                merged[row['timestamp']] = row
+        return [merged[ts] for ts in sorted(merged)]
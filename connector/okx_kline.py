@@ -9,15 +9,17 @@ Features:
 - Time range filtering with start_time and end_time
 - Automatic pagination for large data requests
 - Input validation for symbols and time ranges
-- Rate limiting considerations
+- Shared token-bucket rate limiting
 - Comprehensive error handling
 """
 
+import os
 import time
 import requests
 from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional, Union
 import logging
+from connector.rate_limit import RateLimiter, get_rate_limiter
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -43,6 +45,7 @@ class OKXKlineFetcher:
     # API endpoints
     SPOT_KLINES_ENDPOINT = "/api/v5/market/candles"
     FUTURES_KLINES_ENDPOINT = "/api/v5/market/candles"  # Same endpoint for futures
+    HISTORY_KLINES_ENDPOINT = "/api/v5/market/history-candles"  # Older data, paged by timestamp
 
     # Valid intervals for kline data (OKX format)
     VALID_INTERVALS = [
@@ -52,22 +55,37 @@ class OKXKlineFetcher:
 
     # Maximum limit per request (OKX limit)
     MAX_LIMIT = 300
+    HISTORY_MAX_LIMIT = 100
 
-    def __init__(self, market_type: str = "spot", request_delay: float = 0.1):
+    # Bars per page used by range downloads (history-candles limit)
+    PAGE_LIMIT = HISTORY_MAX_LIMIT
+
+    def __init__(
+        self,
+        market_type: str = "spot",
+        request_delay: float = 0.0,
+        rate_limiter: Optional[RateLimiter] = None,
+        base_url: Optional[str] = None
+    ):
         """
         Initialize the OKXKlineFetcher.
 
         Args:
             market_type (str): Market type, either "spot" or "futures"
-            request_delay (float): Delay between requests in seconds to avoid rate limiting
+            request_delay (float): Extra delay after each request in seconds; pacing
+                is handled by the shared rate limiter, so this defaults to 0
+            rate_limiter (RateLimiter, optional): Limiter to use instead of the shared one
+            base_url (str, optional): REST root to use instead of www.okx.com; defaults
+                to the OKX_BASE_URL env var if set
         """
         if market_type not in ["spot", "futures"]:
             raise ValueError("market_type must be 'spot' or 'futures'")
 
         self.market_type = market_type
         self.request_delay = request_delay
-        self.base_url = self.BASE_URL
+        self.base_url = (base_url or os.getenv("OKX_BASE_URL") or self.BASE_URL).rstrip("/")
         self.session = requests.Session()
+        self.rate_limiter = rate_limiter or get_rate_limiter("okx")
 
     def _validate_symbol(self, symbol: str) -> str:
         """
@@ -147,12 +165,13 @@ class OKXKlineFetcher:
         else:
             raise ValueError("Timestamp must be datetime, string, or numeric")
 
-    def _make_request(self, params: Dict[str, Any]) -> List[List]:
+    def _make_request(self, params: Dict[str, Any], endpoint: Optional[str] = None) -> List[List]:
         """
         Make API request to OKX.
 
         Args:
             params (dict): Request parameters
+            endpoint (str, optional): API endpoint, defaults to the candles endpoint
 
         Returns:
             List[List]: Raw kline data from OKX API
@@ -160,7 +179,9 @@ class OKXKlineFetcher:
         Raises:
             OKXKlineError: If API request fails
         """
-        url = f"{self.base_url}{self.SPOT_KLINES_ENDPOINT}"
+        endpoint = endpoint or self.SPOT_KLINES_ENDPOINT
+        url = f"{self.base_url}{endpoint}"
+        self.rate_limiter.acquire(endpoint)
 
         try:
             response = self.session.get(url, params=params, timeout=30)
@@ -276,12 +297,45 @@ class OKXKlineFetcher:
         # Make request
         raw_data = self._make_request(params)
 
-        # Add delay to avoid rate limiting
-        time.sleep(self.request_delay)
+        if self.request_delay:
+            time.sleep(self.request_delay)
 
         # Format and return data
         return self._format_kline_data(raw_data)
 
+    def fetch_page(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> List[Dict[str, Any]]:
+        """
+        Fetch confirmed klines whose open time lies in [start_ms, end_ms).
+
+        Uses the history-candles endpoint with numeric millisecond cursors, so
+        the range may be at most PAGE_LIMIT bars long. For the futures market
+        the perpetual swap (e.g. BTC-USDT-SWAP) is requested.
+
+        Args:
+            symbol (str): Trading symbol (e.g., 'BTC-USDT')
+            interval (str): Kline interval (e.g., '1m', '1H', '1D')
+            start_ms (int): Inclusive start timestamp in milliseconds
+            end_ms (int): Exclusive end timestamp in milliseconds
+
+        Returns:
+            List[Dict]: Kline data sorted by timestamp ascending
+
+        Raises:
+            OKXKlineError: If API request fails
+        """
+        symbol = self._validate_symbol(symbol)
+        params = {
+            'instId': symbol if self.market_type == "spot" else f"{symbol}-SWAP",
+            'bar': self._validate_interval(interval),
+            'after': str(int(end_ms)),         # records older than end_ms
+            'before': str(int(start_ms) - 1),  # records newer than start_ms - 1
+            'limit': self.PAGE_LIMIT
+        }
+        raw_data = self._make_request(params, endpoint=self.HISTORY_KLINES_ENDPOINT)
+        klines = [k for k in self._format_kline_data(raw_data)
+                  if k['confirm'] == '1' and start_ms <= k['timestamp'] < end_ms]
+        return sorted(klines, key=lambda k: k['timestamp'])
+
     def fetch_klines_paginated(
         self,
         symbol: str,
@@ -373,12 +427,12 @@ class OKXKlineFetcher:
         return all_klines
 
 
-def create_spot_fetcher(request_delay: float = 0.1) -> OKXKlineFetcher:
+def create_spot_fetcher(request_delay: float = 0.0) -> OKXKlineFetcher:
     """
     Create an OKXKlineFetcher for spot market.
 
     Args:
-        request_delay (float): Delay between requests
+        request_delay (float): Extra delay between requests (rate limiting is automatic)
 
     Returns:
         OKXKlineFetcher: Configured for spot market
@@ -386,12 +440,12 @@ def create_spot_fetcher(request_delay: float = 0.1) -> OKXKlineFetcher:
     return OKXKlineFetcher(market_type="spot", request_delay=request_delay)
 
 
-def create_futures_fetcher(request_delay: float = 0.1) -> OKXKlineFetcher:
+def create_futures_fetcher(request_delay: float = 0.0) -> OKXKlineFetcher:
     """
     Create an OKXKlineFetcher for futures market.
 
     Args:
-        request_delay (float): Delay between requests
+        request_delay (float): Extra delay between requests (rate limiting is automatic)
 
     Returns:
         OKXKlineFetcher: Configured for futures market
@@ -11,6 +11,7 @@ Features:
 - Order cancellation and query functionality
 - Position management for futures
 - Input validation and error handling
+- Thread-safe: signatures are sent as per-request headers over a bounded connection pool
 
 Security Notice:
 - Never hardcode API keys in your code
@@ -20,16 +21,20 @@ Security Notice:
 
 import os
 import time
+import threading
 import hmac
 import hashlib
 import base64
+import json
 import requests
+from requests.adapters import HTTPAdapter
 from datetime import datetime, timezone
 from typing import Dict, Any, Optional, List, Union, Literal
 from enum import Enum
 import logging
 from dotenv import load_dotenv
 from urllib.parse import urlencode
+from connector.rate_limit import RateLimiter, get_rate_limiter
 
 # Load environment variables from .env file
 load_dotenv()
@@ -117,6 +122,13 @@ class OKXOrderClient:
     FUTURES_INSTRUMENT_INFO_ENDPOINT = "/api/v5/account/instruments"
     FUTURES_POSITION_INFO_ENDPOINT = "/api/v5/account/positions"
 
+    # Batch endpoints (same path for spot and futures)
+    BATCH_ORDERS_ENDPOINT = "/api/v5/trade/batch-orders"
+    CANCEL_BATCH_ORDERS_ENDPOINT = "/api/v5/trade/cancel-batch-orders"
+
+    # Maximum orders per batch request (OKX limit)
+    MAX_BATCH_SIZE = 20
+
     def __init__(
         self,
         api_key: str = None,
@@ -124,7 +136,11 @@ class OKXOrderClient:
         passphrase: str = None,
         market_type: str = "futures",
         testnet: bool = False,
-        recv_window: int = 5000
+        recv_window: int = 5000,
+        rate_limiter: Optional[RateLimiter] = None,
+        pool_maxsize: int = 10,
+        timeout: float = 30,
+        base_url: Optional[str] = None
     ):
         """
         Initialize the OKXOrderClient.
@@ -136,6 +152,12 @@ class OKXOrderClient:
             market_type (str): Market type, either "spot" or "futures"
             testnet (bool): Whether to use testnet (for testing without real money)
             recv_window (int): Request validity window in milliseconds
+            rate_limiter (RateLimiter, optional): Limiter to use instead of the shared OKX one
+            pool_maxsize (int): Maximum keep-alive connections kept to OKX; threads
+                beyond this wait for a free connection instead of opening new ones
+            timeout (float): HTTP timeout per request in seconds
+            base_url (str, optional): REST root to use instead of www.okx.com (e.g. a
+                local simulator); defaults to the OKX_BASE_URL env var if set
         """
         # Get API credentials from parameters or environment variables
         self.api_key = api_key or os.getenv("OKX_API_KEY")
@@ -155,17 +177,26 @@ class OKXOrderClient:
         self.market_type = market_type
         self.testnet = testnet
         self.recv_window = recv_window
+        self.rate_limiter = rate_limiter or get_rate_limiter("okx")
+        self.timeout = timeout
 
         # OKX uses the same base URL for both live and testnet
         # Testnet is handled via different API credentials
-        self.base_url = self.BASE_URL
+        self.base_url = (base_url or os.getenv("OKX_BASE_URL") or self.BASE_URL).rstrip("/")
 
+        # Static headers only; per-request signature headers are passed to each
+        # call so the session can be shared between threads.
         self.session = requests.Session()
         self.session.headers.update({
             "Content-Type": "application/json",
             "OK-ACCESS-KEY": self.api_key,
             "OK-ACCESS-PASSPHRASE": self.passphrase
         })
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, pool_block=True)
+        # one slot per pooled connection, taken before signing so the pool never blocks a signed request
+        self._slots = threading.BoundedSemaphore(pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
         logger.info(f"Initialized OKXOrderClient for {market_type} market"
                    f"{' (testnet)' if testnet else ''}")
@@ -206,12 +237,35 @@ class OKXOrderClient:
 
         return base64.b64encode(signature).decode('utf-8')
 
+    def _send(self, method: str, url: str, request_path: str, body: str) -> requests.Response:
+        """
+        Sign and send one request.
+
+        The timestamp is taken here, after the rate limiter and the connection
+        slot have been acquired, so waiting never ages a signed request past
+        OKX's timestamp window (error 50102).
+        """
+        timestamp = self._get_timestamp()
+        # NOTE: must sign request_path (with the query string), not just endpoint
+        headers = {
+            "OK-ACCESS-SIGN": self._generate_signature(timestamp, method, request_path, body),
+            "OK-ACCESS-TIMESTAMP": timestamp
+        }
+        if method.upper() == "GET":
+            return self.session.get(url, headers=headers, timeout=self.timeout)
+        if method.upper() == "POST":
+            return self.session.post(url, data=body, headers=headers, timeout=self.timeout)
+        if method.upper() == "DELETE":
+            return self.session.delete(url, data=body, headers=headers, timeout=self.timeout)
+        raise ValueError(f"Unsupported HTTP method: {method}")
+
     def _make_signed_request(
         self,
         method: str,
         endpoint: str,
         params: Dict[str, Any] = None,
-        data: Dict[str, Any] = None
+        data: Union[Dict[str, Any], List[Dict[str, Any]]] = None,
+        allow_partial: bool = False
     ) -> Dict[str, Any]:
         """
         Make a signed API request to OKX.
@@ -220,7 +274,10 @@ class OKXOrderClient:
             method (str): HTTP method (GET, POST, DELETE)
             endpoint (str): API endpoint
             params (Dict): URL parameters
-            data (Dict): Request body data
+            data (Dict/List): Request body data (a list for batch endpoints)
+            allow_partial (bool): Return batch responses with code '1' (all failed)
+                or '2' (partially failed) instead of raising, so per-order
+                sCode/sMsg can be inspected
 
         Returns:
             Dict: Response data from OKX API
@@ -228,12 +285,9 @@ class OKXOrderClient:
         Raises:
             OKXOrderError: If API request fails
         """
-        timestamp = self._get_timestamp()
-
         # Prepare request body
         body = ""
         if data:
-            import json
             body = json.dumps(data, separators=(',', ':'))
 
         # Build request path (endpoint + optional query string) for signature
@@ -244,32 +298,20 @@ class OKXOrderClient:
             query = urlencode(sorted(params.items()), doseq=True)
 
         request_path = endpoint + (f"?{query}" if query else "")
-
-        # Generate signature (NOTE: must sign request_path, not just endpoint)
-        signature = self._generate_signature(timestamp, method, request_path, body)
-
-        # Update headers
-        self.session.headers.update({
-            "OK-ACCESS-SIGN": signature,
-            "OK-ACCESS-TIMESTAMP": timestamp
-        })
-
         url = f"{self.base_url}{request_path}"
 
+        # batch endpoints are limited by the number of orders, not requests
+        self.rate_limiter.acquire(endpoint, len(data) if isinstance(data, list) else 1, method=method)
+
         try:
-            if method.upper() == "GET":
-                response = self.session.get(url)
-            elif method.upper() == "POST":
-                response = self.session.post(url, data=body)
-            elif method.upper() == "DELETE":
-                response = self.session.delete(url, data=body)
-            else:
-                raise ValueError(f"Unsupported HTTP method: {method}")
+            with self._slots:
+                response = self._send(method, url, request_path, body)
 
             data = response.json()
 
             # Check OKX API response format
-            if data.get('code') != '0':
+            ok_codes = ('0', '1', '2') if allow_partial else ('0',)
+            if data.get('code') not in ok_codes:
                 error_code = data.get('code', str(response.status_code))
                 error_msg = data.get('msg', 'Unknown error')
                 raise OKXOrderError(
@@ -313,6 +355,84 @@ class OKXOrderClient:
             # For futures, OKX uses format like BTC-USDT-SWAP
             return f"{symbol}-SWAP"
 
+    def _build_order_data(
+        self,
+        symbol: str,
+        side: Union[str, OrderSide],
+        order_type: Union[str, OrderType, FuturesOrderType],
+        size: Union[str, float],
+        price: Optional[Union[str, float]] = None,
+        time_in_force: Optional[Union[str, TimeInForce]] = None,
+        position_side: Optional[Union[str, PositionSide]] = None,
+        reduce_only: Optional[bool] = None,
+        client_order_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Build the request body for a single order.
+
+        Shared by single and batch order placement.
+
+        Returns:
+            Dict: OKX order request body
+        """
+        side = side.value if isinstance(side, OrderSide) else side.lower()
+        order_type = order_type.value if isinstance(order_type, (OrderType, FuturesOrderType)) else order_type.lower()
+
+        data = {
+            "instId": self._get_inst_id(symbol),
+            "tdMode": "cash" if self.market_type == "spot" else "isolated",
+            "side": side,
+            "ordType": order_type,
+            "sz": str(size)
+        }
+
+        if price is not None:
+            data["px"] = str(price)
+
+        if time_in_force is not None:
+            tif = time_in_force.value if isinstance(time_in_force, TimeInForce) else time_in_force
+            data["tif"] = tif
+
+        if self.market_type == "futures":
+            if position_side is not None:
+                ps = position_side.value if isinstance(position_side, PositionSide) else position_side.lower()
+                data["posSide"] = ps
+
+            if reduce_only is not None:
+                data["reduceOnly"] = str(reduce_only).lower()
+
+        if client_order_id is not None:
+            data["clOrdId"] = client_order_id
+
+        return data
+
+    def _send_batch(self, endpoint: str, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Send items to a batch endpoint in chunks of MAX_BATCH_SIZE.
+
+        A failed chunk does not abort the remaining ones; every item in it is
+        reported with the chunk's error code instead.
+
+        Returns:
+            List[Dict]: One result per item, in input order, each with
+            'sCode'/'sMsg' ('0' means success) and the original 'request'
+        """
+        results = []
+        for i in range(0, len(items), self.MAX_BATCH_SIZE):
+            chunk = items[i:i + self.MAX_BATCH_SIZE]
+            try:
+                resp = self._make_signed_request("POST", endpoint, data=chunk, allow_partial=True)
+                rows = resp.get('data', [])
+            except OKXOrderError as e:
+                logger.warning(f"Batch request to {endpoint} failed: {e}")
+                rows = [{"sCode": e.code or "-1", "sMsg": e.message} for _ in chunk]
+
+            for j, req in enumerate(chunk):
+                row = dict(rows[j]) if j < len(rows) else {"sCode": "-1", "sMsg": "Missing result"}
+                row["request"] = req
+                results.append(row)
+        return results
+
     # ==================== SPOT MARKET ORDERS ====================
 
     def place_spot_order(
@@ -344,30 +464,17 @@ class OKXOrderClient:
             raise ValueError("This client is configured for futures market. "
                            "Use place_futures_order() instead.")
 
-        symbol = self._validate_symbol(symbol)
-        side = side.value if isinstance(side, OrderSide) else side.lower()
-        order_type = order_type.value if isinstance(order_type, OrderType) else order_type.lower()
-
-        # Build request data
-        data = {
-            "instId": symbol,
-            "tdMode": "cash",  # Spot trading
-            "side": side,
-            "ordType": order_type,
-            "sz": str(size)
-        }
-
-        if price is not None:
-            data["px"] = str(price)
-
-        if time_in_force is not None:
-            tif = time_in_force.value if isinstance(time_in_force, TimeInForce) else time_in_force
-            data["tif"] = tif
-
-        if client_order_id is not None:
-            data["clOrdId"] = client_order_id
+        data = self._build_order_data(
+            symbol=symbol,
+            side=side,
+            order_type=order_type,
+            size=size,
+            price=price,
+            time_in_force=time_in_force,
+            client_order_id=client_order_id
+        )
 
-        logger.info(f"Placing spot {side} {order_type} order for {symbol}")
+        logger.info(f"Placing spot {data['side']} {data['ordType']} order for {data['instId']}")
 
         return self._make_signed_request("POST", self.SPOT_ORDER_ENDPOINT, data=data)
 
@@ -460,37 +567,19 @@ class OKXOrderClient:
             raise ValueError("This client is configured for spot market. "
                            "Use place_spot_order() instead.")
 
-        inst_id = self._get_inst_id(symbol)
-        side = side.value if isinstance(side, OrderSide) else side.lower()
-        order_type = order_type.value if isinstance(order_type, FuturesOrderType) else order_type.lower()
-
-        # Build request data
-        data = {
-            "instId": inst_id,
-            "tdMode": "isolated",  # Futures trading mode
-            "side": side,
-            "ordType": order_type,
-            "sz": str(size)
-        }
-
-        if price is not None:
-            data["px"] = str(price)
-
-        if time_in_force is not None:
-            tif = time_in_force.value if isinstance(time_in_force, TimeInForce) else time_in_force
-            data["tif"] = tif
-
-        if position_side is not None:
-            ps = position_side.value if isinstance(position_side, PositionSide) else position_side.lower()
-            data["posSide"] = ps
-
-        if reduce_only is not None:
-            data["reduceOnly"] = str(reduce_only).lower()
-
-        if client_order_id is not None:
-            data["clOrdId"] = client_order_id
+        data = self._build_order_data(
+            symbol=symbol,
+            side=side,
+            order_type=order_type,
+            size=size,
+            price=price,
+            time_in_force=time_in_force,
+            position_side=position_side,
+            reduce_only=reduce_only,
+            client_order_id=client_order_id
+        )
 
-        logger.info(f"Placing futures {side} {order_type} order for {inst_id}")
+        logger.info(f"Placing futures {data['side']} {data['ordType']} order for {data['instId']}")
 
         return self._make_signed_request("POST", self.FUTURES_ORDER_ENDPOINT, data=data)
 
@@ -619,19 +708,70 @@ class OKXOrderClient:
         if not pending_orders.get('data'):
             return {"cancelled": 0, "message": "No open orders to cancel"}
 
-        cancelled_count = 0
-        for order in pending_orders['data']:
-            try:
-                self.cancel_order(
-                    symbol=order['instId'],
-                    order_id=order['ordId']
-                )
-                cancelled_count += 1
-                time.sleep(0.1)  # Small delay to avoid rate limits
-            except Exception as e:
-                logger.warning(f"Failed to cancel order {order['ordId']}: {e}")
+        result = self.cancel_batch_orders([
+            {"instId": order['instId'], "ordId": order['ordId']}
+            for order in pending_orders['data']
+        ])
+
+        for row in result['failed']:
+            logger.warning(f"Failed to cancel order {row['request'].get('ordId')}: {row.get('sMsg')}")
+
+        return {"cancelled": result['success'], "total": len(pending_orders['data'])}
 
-        return {"cancelled": cancelled_count, "total": len(pending_orders['data'])}
+    def place_batch_orders(self, orders: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Place several orders using OKX's batch endpoint.
+
+        Orders are sent in chunks of up to MAX_BATCH_SIZE per request.
+
+        Args:
+            orders (List[Dict]): Order specs with the keyword arguments of
+                place_futures_order / place_spot_order (symbol, side,
+                order_type, size, price, time_in_force, position_side,
+                reduce_only, client_order_id)
+
+        Returns:
+            Dict: {'data': per-order results in input order, 'success': int,
+            'failed': results whose sCode is not '0'}
+        """
+        items = [self._build_order_data(**order) for order in orders]
+
+        logger.info(f"Placing {len(items)} orders in batches of {self.MAX_BATCH_SIZE}")
+
+        results = self._send_batch(self.BATCH_ORDERS_ENDPOINT, items)
+        failed = [r for r in results if r.get('sCode') != '0']
+        return {"data": results, "success": len(results) - len(failed), "failed": failed}
+
+    def cancel_batch_orders(self, orders: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Cancel several orders using OKX's batch endpoint.
+
+        Args:
+            orders (List[Dict]): Each with 'symbol' (or a raw 'instId') and
+                'order_id'/'client_order_id' (or raw 'ordId'/'clOrdId')
+
+        Returns:
+            Dict: {'data': per-order results in input order, 'success': int,
+            'failed': results whose sCode is not '0'}
+        """
+        items = []
+        for order in orders:
+            item = {"instId": order.get('instId') or self._get_inst_id(order['symbol'])}
+            order_id = order.get('ordId', order.get('order_id'))
+            client_order_id = order.get('clOrdId', order.get('client_order_id'))
+            if order_id is None and client_order_id is None:
+                raise ValueError("Either order_id or client_order_id is required")
+            if order_id is not None:
+                item["ordId"] = order_id
+            if client_order_id is not None:
+                item["clOrdId"] = client_order_id
+            items.append(item)
+
+        logger.info(f"Cancelling {len(items)} orders in batches of {self.MAX_BATCH_SIZE}")
+
+        results = self._send_batch(self.CANCEL_BATCH_ORDERS_ENDPOINT, items)
+        failed = [r for r in results if r.get('sCode') != '0']
+        return {"data": results, "success": len(results) - len(failed), "failed": failed}
 
     def get_order(
         self,
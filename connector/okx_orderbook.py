@@ -0,0 +1,184 @@
+import threading
+import time
+import zlib
+from bisect import bisect_left
+from typing import List, Optional, Tuple
+from connector.okx_ws_manager import OKXWsManager
+from connector.ws_decode import loads
+
+
+class _BookSide:
+    """
+    One side of the book as parallel sorted arrays.
+
+    `keys` is ascending (price for asks, -price for bids) so index 0 is always
+    the best level; the original price/size strings are kept for the checksum.
+    """
+
+    def __init__(self, is_bid: bool):
+        self.sign = -1.0 if is_bid else 1.0
+        self.keys: List[float] = []
+        self.prices: List[float] = []
+        self.sizes: List[float] = []
+        self.raw: List[Tuple[str, str]] = []
+
+    def clear(self):
+        self.keys, self.prices, self.sizes, self.raw = [], [], [], []
+
+    def apply(self, levels: List[List[str]]):
+        for level in levels:
+            px, sz = level[0], level[1]
+            price = float(px)
+            size = float(sz)
+            key = self.sign * price
+            i = bisect_left(self.keys, key)
+            exists = i < len(self.keys) and self.keys[i] == key
+            if size == 0:
+                if exists:
+                    del self.keys[i], self.prices[i], self.sizes[i], self.raw[i]
+            elif exists:
+                self.sizes[i] = size
+                self.raw[i] = (px, sz)
+            else:
+                self.keys.insert(i, key)
+                self.prices.insert(i, price)
+                self.sizes.insert(i, size)
+                self.raw.insert(i, (px, sz))
+
+
+class OKXOrderBook:
+    """
+    Local L2 order book maintained from the OKX `books` / `books5` channels.
+
+    `books` sends a snapshot followed by incremental updates; every push is
+    checked against the exchange CRC32 checksum and seqId chain, and on a
+    mismatch the book is marked invalid and resubscribed for a fresh snapshot.
+    `books5` pushes full 5-level snapshots. Sizes are in contracts, the same
+    unit OrderManager sends.
+    """
+
+    def __init__(self, symbol: str, channel: str = "books", inst_type: str = "SWAP", manager: OKXWsManager = None):
+        self.symbol = symbol.replace('_', '-').upper()
+        self.channel = channel
+        self.inst_id = f"{self.symbol}-{inst_type}"
+        self.bids = _BookSide(is_bid=True)
+        self.asks = _BookSide(is_bid=False)
+        self.valid = False
+        self.seq_id: Optional[int] = None
+        self.exch_ts: Optional[int] = None
+        self.recv_ts: Optional[float] = None
+        self.resyncs = 0
+        self._lock = threading.Lock()
+        self._own_manager = manager is None
+        self.manager = manager or OKXWsManager()
+
+    @staticmethod
+    def checksum(bids: List[Tuple[str, str]], asks: List[Tuple[str, str]]) -> int:
+        # OKX: 前 25 檔 bid/ask 交錯串成 "bidPx:bidSz:askPx:askSz:..." 後取 CRC32 (signed int32)
+        parts = []
+        for i in range(25):
+            if i < len(bids):
+                parts.extend(bids[i])
+            if i < len(asks):
+                parts.extend(asks[i])
+        crc = zlib.crc32(':'.join(parts).encode())
+        return crc - (1 << 32) if crc >= 1 << 31 else crc
+
+    def _resync(self, reason: str):
+        print(f"[BOOK] {self.inst_id} {reason}, resubscribing")
+        self.valid = False
+        self.resyncs += 1
+        self.manager.resubscribe(self.channel, self.inst_id)
+
+    def _on_push(self, message: str):
+        recv_ts = time.time()
+        msg = loads(message)
+        action = msg.get('action', 'snapshot')
+        for book in msg['data']:
+            with self._lock:
+                if action == 'snapshot':
+                    self.bids.clear()
+                    self.asks.clear()
+                elif not self.valid:
+                    continue
+                elif book.get('prevSeqId') is not None and self.seq_id is not None and int(book['prevSeqId']) != self.seq_id:
+                    self._resync(f"sequence gap {book['prevSeqId']} != {self.seq_id}")
+                    continue
+                self.bids.apply(book.get('bids', []))
+                self.asks.apply(book.get('asks', []))
+                if book.get('checksum') is not None and self.checksum(self.bids.raw, self.asks.raw) != int(book['checksum']):
+                    self._resync("checksum mismatch")
+                    continue
+                self.seq_id = int(book['seqId']) if book.get('seqId') is not None else None
+                self.exch_ts = int(book['ts']) if book.get('ts') else None
+                self.recv_ts = recv_ts
+                self.valid = True
+
+    def _on_reconnect(self):
+        with self._lock:
+            self.valid = False
+
+    def start(self):
+        self.manager.subscribe(self.channel, self.inst_id, self._on_push, on_reconnect=self._on_reconnect, raw=True)
+        if self._own_manager:
+            self.manager.start()
+
+    def stop(self):
+        self.manager.unsubscribe(self.channel, self.inst_id, self._on_push, on_reconnect=self._on_reconnect)
+        if self._own_manager:
+            self.manager.stop()
+
+    def is_stale(self, max_age: float = 5.0) -> bool:
+        return not self.valid or self.recv_ts is None or time.time() - self.recv_ts > max_age
+
+    def best_bid(self) -> Optional[Tuple[float, float]]:
+        with self._lock:
+            return (self.bids.prices[0], self.bids.sizes[0]) if self.bids.prices else None
+
+    def best_ask(self) -> Optional[Tuple[float, float]]:
+        with self._lock:
+            return (self.asks.prices[0], self.asks.sizes[0]) if self.asks.prices else None
+
+    def depth(self, levels: int = 5) -> Tuple[List[Tuple[float, float]], List[Tuple[float, float]]]:
+        with self._lock:
+            return (list(zip(self.bids.prices[:levels], self.bids.sizes[:levels])),
+                    list(zip(self.asks.prices[:levels], self.asks.sizes[:levels])))
+
+    def vwap_to_size(self, side: str, size: float) -> Tuple[Optional[float], float]:
+        """
+        Average fill price of a market order of `size` contracts.
+
+        Args:
+            side (str): 'buy' (walks the asks) or 'sell' (walks the bids)
+            size (float): Order size in contracts
+
+        Returns:
+            Tuple[Optional[float], float]: (vwap, fillable size); vwap is None
+            if the book is empty, and fillable < size if the book is too thin
+        """
+        book = self.asks if side == 'buy' else self.bids
+        remaining = size
+        notional = 0.0
+        with self._lock:
+            for price, level_size in zip(book.prices, book.sizes):
+                take = level_size if level_size < remaining else remaining
+                notional += take * price
+                remaining -= take
+                if remaining <= 0:
+                    break
+        filled = size - remaining
+        return (notional / filled if filled > 0 else None), filled
+
+    def slippage(self, side: str, size: float) -> Optional[float]:
+        """
+        Estimated slippage of a market order versus the touch, as a fraction.
+
+        Returns None if the book is not valid or cannot fill `size`.
+        """
+        if not self.valid:
+            return None
+        touch = self.best_ask() if side == 'buy' else self.best_bid()
+        vwap, filled = self.vwap_to_size(side, size)
+        if touch is None or vwap is None or filled < size:
+            return None
+        return (vwap - touch[0]) / touch[0] if side == 'buy' else (touch[0] - vwap) / touch[0]
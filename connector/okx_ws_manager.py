@@ -0,0 +1,250 @@
+import os
+import threading
+import time
+import json
+from queue import Queue
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from connector.ws_supervisor import SupervisedWebSocket
+from connector.ws_decode import loads, route_key, is_event
+
+PUBLIC_URL = "wss://ws.okx.com:8443/ws/v5/public"
+BUSINESS_URL = "wss://ws.okx.com:8443/ws/v5/business"
+
+# OKX 把 candle / mark-price-candle 等K線頻道放在 business 端點
+BUSINESS_CHANNEL_PREFIXES = ("candle", "mark-price-candle", "index-candle")
+
+Handler = Union[Callable[[dict], None], Queue]
+
+
+def channel_url(channel: str, public_url: str = PUBLIC_URL, business_url: str = BUSINESS_URL) -> str:
+    return business_url if channel.startswith(BUSINESS_CHANNEL_PREFIXES) else public_url
+
+
+class _WsShard:
+    """One supervised websocket connection carrying a subset of the manager's subscriptions."""
+
+    def __init__(self, manager: "OKXWsManager", url: str):
+        self.manager = manager
+        self.url = url
+        self.subscriptions: List[Tuple[str, str]] = []
+        self.conn = SupervisedWebSocket(url, on_open=self._on_open, on_message=manager._on_frame,
+                                        name=f"OKX WS {url.rsplit('/', 1)[-1]}", **manager.ws_options)
+
+    def _send(self, op: str, keys: List[Tuple[str, str]]):
+        if not keys or not self.conn.connected.is_set():
+            return
+        # 單一訊息不宜過長，分批送出
+        for i in range(0, len(keys), 50):
+            args = [{"channel": channel, "instId": inst_id} for channel, inst_id in keys[i:i + 50]]
+            self.conn.send(json.dumps({"op": op, "args": args}))
+
+    def subscribe(self, key: Tuple[str, str]):
+        self.subscriptions.append(key)
+        self._send("subscribe", [key])
+
+    def unsubscribe(self, key: Tuple[str, str]):
+        self.subscriptions.remove(key)
+        self._send("unsubscribe", [key])
+
+    def _on_open(self, conn: SupervisedWebSocket):
+        keys = list(self.subscriptions)
+        if conn.reconnects:
+            # 重連: 先讓訂閱者補齊斷線期間的資料，再重新訂閱
+            self.manager._notify_reconnect(keys)
+        self._send("subscribe", keys)
+        print(f"[OKX WS] {self.url} 訂閱 {len(keys)} 個頻道")
+
+    def start(self):
+        self.conn.start()
+
+    def stop(self):
+        self.conn.stop()
+
+
+class OKXWsManager:
+    """
+    Multiplex many OKX (channel, instId) subscriptions over shared websockets.
+
+    Candle channels go to the business endpoint and everything else to the
+    public endpoint; each endpoint gets as many connections (shards) as needed
+    to stay under `max_subscriptions` per connection. Every data push is parsed
+    once and handed to the callbacks or queues registered for its
+    (channel, instId). Frames are routed by their leading `arg` object
+    (connector.ws_decode.route_key), so acks and pongs are never fully parsed,
+    and `raw=True` handlers receive the undecoded text to decode with a typed
+    decoder themselves; the full JSON parse only runs if some handler needs it.
+
+    Connections are supervised (heartbeat, backoff reconnect, resubscribe);
+    `on_reconnect` callbacks run before resubscribing so callers can backfill
+    what they missed, and `last_update(channel, instId)` / `is_stale()` expose
+    when each subscription last received data.
+    """
+
+    def __init__(self, max_subscriptions: int = 200, public_url: str = None, business_url: str = None,
+                 **ws_options: Any):
+        self.max_subscriptions = max_subscriptions
+        # OKX_WS_PUBLIC_URL / OKX_WS_BUSINESS_URL point every manager at e.g. a local simulator
+        self.public_url = public_url or os.getenv("OKX_WS_PUBLIC_URL") or PUBLIC_URL
+        self.business_url = business_url or os.getenv("OKX_WS_BUSINESS_URL") or BUSINESS_URL
+        # ping_interval / pong_timeout / reconnect_delay / max_reconnect_delay for SupervisedWebSocket
+        self.ws_options = ws_options
+        self._handlers: Dict[Tuple[str, str], List[Tuple[Handler, bool]]] = {}
+        self._reconnect_handlers: Dict[Tuple[str, str], List[Callable[[], None]]] = {}
+        self._last_update: Dict[Tuple[str, str], float] = {}
+        self._shards: Dict[str, List[_WsShard]] = {}
+        self._key_shard: Dict[Tuple[str, str], _WsShard] = {}
+        self._listeners: List[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+        self._started = False
+
+    def subscribe(self, channel: str, inst_id: str, handler: Handler,
+                  on_reconnect: Optional[Callable[[], None]] = None, raw: bool = False) -> Tuple[str, str]:
+        """
+        Register `handler` (callable taking the parsed push, or a Queue) for a channel.
+        With `raw=True` the handler gets the raw text frame instead.
+
+        The exchange subscription is shared: only the first handler for a
+        (channel, instId) subscribes on the wire. `on_reconnect` is called on
+        the connection thread after a reconnect, before resubscribing.
+        """
+        key = (channel, inst_id)
+        with self._lock:
+            handlers = self._handlers.setdefault(key, [])
+            handlers.append((handler, raw))
+            if on_reconnect is not None:
+                self._reconnect_handlers.setdefault(key, []).append(on_reconnect)
+            if len(handlers) == 1:
+                shard = self._shard_for(channel_url(channel, self.public_url, self.business_url))
+                self._key_shard[key] = shard
+                shard.subscribe(key)
+        return key
+
+    def unsubscribe(self, channel: str, inst_id: str, handler: Handler,
+                    on_reconnect: Optional[Callable[[], None]] = None):
+        key = (channel, inst_id)
+        with self._lock:
+            handlers = self._handlers.get(key, [])
+            for entry in handlers:
+                if entry[0] is handler:
+                    handlers.remove(entry)
+                    break
+            if on_reconnect in self._reconnect_handlers.get(key, []):
+                self._reconnect_handlers[key].remove(on_reconnect)
+            if not handlers and key in self._key_shard:
+                del self._handlers[key]
+                self._reconnect_handlers.pop(key, None)
+                self._key_shard.pop(key).unsubscribe(key)
+
+    def resubscribe(self, channel: str, inst_id: str):
+        """Unsubscribe and subscribe again on the wire, e.g. to get a fresh order book snapshot."""
+        key = (channel, inst_id)
+        with self._lock:
+            shard = self._key_shard.get(key)
+            if shard is not None:
+                shard._send("unsubscribe", [key])
+                shard._send("subscribe", [key])
+
+    def _shard_for(self, url: str) -> _WsShard:
+        shards = self._shards.setdefault(url, [])
+        for shard in shards:
+            if len(shard.subscriptions) < self.max_subscriptions:
+                return shard
+        shard = _WsShard(self, url)
+        shards.append(shard)
+        if self._started:
+            shard.start()
+        return shard
+
+    def _notify_reconnect(self, keys: List[Tuple[str, str]]):
+        for key in keys:
+            for callback in list(self._reconnect_handlers.get(key, ())):
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"[OKX WS] reconnect handler error on {key}: {e}")
+
+    def add_listener(self, listener: Callable[[str], None]):
+        """Call `listener(raw_frame)` for every frame received on any connection (e.g. a StreamRecorder)."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str], None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def inject(self, message: str):
+        """Dispatch a raw frame as if it had been received; used to replay recorded streams."""
+        self._dispatch(message)
+
+    def handlers(self) -> List[Handler]:
+        """Every registered handler, across all subscriptions."""
+        with self._lock:
+            return [handler for entries in self._handlers.values() for handler, _ in entries]
+
+    def _on_frame(self, message: str):
+        for listener in self._listeners:
+            try:
+                listener(message)
+            except Exception as e:
+                print(f"[OKX WS] listener error: {e}")
+        self._dispatch(message)
+
+    def _dispatch(self, message: str):
+        data = None
+        key = route_key(message)
+        if key is None:
+            if is_event(message):
+                if '"error"' in message:
+                    print(f"[OKX WS] Error: {message}")
+                return
+            # 不是預期的欄位順序時退回完整解析
+            data = loads(message)
+            if 'data' not in data:
+                return
+            arg = data.get('arg', {})
+            key = (arg.get('channel'), arg.get('instId'))
+        self._last_update[key] = time.time()
+        for handler, raw in self._handlers.get(key, ()):
+            try:
+                if raw:
+                    payload = message
+                else:
+                    if data is None:
+                        data = loads(message)
+                    payload = data
+                if isinstance(handler, Queue):
+                    handler.put(payload)
+                else:
+                    handler(payload)
+            except Exception as e:
+                print(f"[OKX WS] handler error on {key}: {e}")
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            shards = [shard for shards in self._shards.values() for shard in shards]
+        for shard in shards:
+            shard.start()
+
+    def stop(self):
+        with self._lock:
+            self._started = False
+            shards = [shard for shards in self._shards.values() for shard in shards]
+        for shard in shards:
+            shard.stop()
+
+    def last_update(self, channel: str, inst_id: str) -> Optional[float]:
+        """Wall-clock time of the last data push for (channel, instId), or None."""
+        return self._last_update.get((channel, inst_id))
+
+    def is_stale(self, channel: str, inst_id: str, max_age: float) -> bool:
+        """True if the subscription's connection is down or it got no data for `max_age` seconds."""
+        shard = self._key_shard.get((channel, inst_id))
+        last = self._last_update.get((channel, inst_id))
+        if shard is None or not shard.conn.connected.is_set() or last is None:
+            return True
+        return time.time() - last > max_age
+
+    def connection_count(self) -> int:
+        return sum(len(shards) for shards in self._shards.values())
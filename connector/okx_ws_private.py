@@ -0,0 +1,167 @@
+import threading
+import json
+import time
+import hmac
+import hashlib
+import base64
+import os
+from collections import OrderedDict
+from typing import Dict, Optional
+from connector.ws_supervisor import SupervisedWebSocket
+from connector.ws_decode import loads
+
+PRIVATE_URL = "wss://ws.okx.com:8443/ws/v5/private"
+
+FILLED_STATES = ('filled',)
+CLOSED_STATES = ('canceled', 'mmp_canceled')
+
+
+class OKXWsPrivate:
+    """
+    Authenticated OKX websocket for the private `orders` and `positions` channels.
+
+    Keeps a local cache of the latest push per order / position so the OMS can
+    wait on fill events instead of polling REST. Order pushes are dropped once
+    `wait_order` has returned their final state, and at most `max_orders` are
+    kept (oldest first out) for orders nobody waits on. `connected_since`
+    changes on every (re)login, which lets callers detect that pushes may have
+    been missed.
+    The connection is supervised: it heartbeats, reconnects with backoff and
+    logs in / resubscribes again on its own.
+    """
+
+    def __init__(
+        self,
+        api_key: str = None,
+        api_secret: str = None,
+        passphrase: str = None,
+        inst_type: str = "SWAP",
+        ws_url: str = None,
+        max_orders: int = 1000,
+        **ws_options
+    ):
+        self.api_key = api_key or os.getenv("OKX_API_KEY")
+        self.api_secret = api_secret or os.getenv("OKX_API_SECRET")
+        self.passphrase = passphrase or os.getenv("OKX_PASSPHRASE")
+        if not all([self.api_key, self.api_secret, self.passphrase]):
+            raise ValueError("API key, secret, and passphrase are required for the private websocket")
+
+        self.inst_type = inst_type
+        # OKX_WS_PRIVATE_URL points the socket at e.g. a local simulator
+        self.ws_url = ws_url = ws_url or os.getenv("OKX_WS_PRIVATE_URL") or PRIVATE_URL
+        # ordId -> latest order push; bounded, and final states are dropped once wait_order returns them
+        self.orders: "OrderedDict[str, dict]" = OrderedDict()
+        self.max_orders = max_orders
+        self.positions: Dict[tuple, dict] = {}  # (instId, posSide) -> latest position push
+        self.connected = threading.Event()
+        self.connected_since = None
+        self.last_message_time = None
+        self._cond = threading.Condition()
+        self._conn = SupervisedWebSocket(ws_url, on_open=self._on_open, on_message=self._on_message,
+                                         on_close=self._on_close, name="OKX WS PRIVATE", **ws_options)
+
+    def _sign(self, timestamp: str) -> str:
+        message = timestamp + "GET" + "/users/self/verify"
+        digest = hmac.new(self.api_secret.encode('utf-8'), message.encode('utf-8'), hashlib.sha256).digest()
+        return base64.b64encode(digest).decode('utf-8')
+
+    def _on_open(self, conn: SupervisedWebSocket):
+        timestamp = str(int(time.time()))
+        login = {
+            "op": "login",
+            "args": [{
+                "apiKey": self.api_key,
+                "passphrase": self.passphrase,
+                "timestamp": timestamp,
+                "sign": self._sign(timestamp)
+            }]
+        }
+        conn.send(json.dumps(login))
+
+    def _on_message(self, message):
+        self.last_message_time = time.time()
+        data = loads(message)
+
+        event = data.get('event')
+        if event == 'login':
+            if data.get('code') == '0':
+                sub = {
+                    "op": "subscribe",
+                    "args": [
+                        {"channel": "orders", "instType": self.inst_type},
+                        {"channel": "positions", "instType": self.inst_type}
+                    ]
+                }
+                self._conn.send(json.dumps(sub))
+            else:
+                print(f"[OKX WS PRIVATE] login failed: {data}")
+            return
+        if event == 'subscribe':
+            if data.get('arg', {}).get('channel') == 'orders':
+                with self._cond:
+                    self.connected_since = time.time()
+                    self.connected.set()
+                    self._cond.notify_all()
+            return
+        if event == 'error':
+            print(f"[OKX WS PRIVATE] Error: {data}")
+            return
+
+        channel = data.get('arg', {}).get('channel')
+        rows = data.get('data') or []
+        if channel == 'orders':
+            with self._cond:
+                for o in rows:
+                    self.orders[o['ordId']] = o
+                    self.orders.move_to_end(o['ordId'])
+                while len(self.orders) > self.max_orders:
+                    self.orders.popitem(last=False)
+                self._cond.notify_all()
+        elif channel == 'positions':
+            with self._cond:
+                for p in rows:
+                    self.positions[(p.get('instId'), p.get('posSide'))] = p
+
+    def _on_close(self):
+        with self._cond:
+            self.connected.clear()
+            self._cond.notify_all()
+
+    def start(self):
+        self._conn.start()
+
+    def stop(self):
+        self._conn.stop()
+
+    def is_stale(self, max_age: float) -> bool:
+        # private 頻道平時很安靜，heartbeat 的 pong 也算在內
+        return not self.connected.is_set() or self._conn.is_stale(max_age)
+
+    def get_order(self, order_id: str) -> Optional[dict]:
+        return self.orders.get(order_id)
+
+    def get_position(self, inst_id: str, pos_side: str = 'net') -> Optional[dict]:
+        return self.positions.get((inst_id, pos_side))
+
+    def wait_order(self, order_id: str, timeout: float, since: float = None) -> Optional[str]:
+        """
+        Block until the order reaches a final state.
+
+        Returns the final OKX state, or None if the socket is down, reconnected
+        after `since` (pushes may have been lost) or the timeout expired; the
+        caller should then fall back to REST.
+        """
+        since = since if since is not None else time.time()
+        deadline = time.time() + timeout
+        with self._cond:
+            while True:
+                if not self.connected.is_set() or self.connected_since is None or self.connected_since > since:
+                    return None
+                state = self.orders.get(order_id, {}).get('state')
+                if state in FILLED_STATES or state in CLOSED_STATES:
+                    del self.orders[order_id]
+                    return state
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
@@ -1,87 +1,201 @@
-import websocket
 import threading
 import json
 import time
-from typing import Callable, Dict, List, Optional
+from typing import Callable, Dict, List, NamedTuple, Optional
 from queue import Queue
+from connector.okx_ws_manager import OKXWsManager
+from connector.okx_kline import OKXKlineFetcher
+from connector.kline_downloader import KlineDownloader, interval_to_ms
+from connector.ws_decode import decode_tickers, decode_candles
+
+class TickerSnapshot(NamedTuple):
+    # 不可變的一筆 top-of-book，整筆以參考替換，讀取端不需加鎖
+    inst_id: str
+    bid: float
+    bid_size: float
+    ask: float
+    ask_size: float
+    last: float
+    vol24h: float
+    exch_ts: Optional[int]   # 交易所時間 (ms)
+    recv_ts: float           # 本地收到時間 (time.time())
+
+    @property
+    def latency_ms(self) -> Optional[float]:
+        # 交易所時間到本地收到的延遲 (含時鐘誤差)
+        return self.recv_ts * 1000 - self.exch_ts if self.exch_ts is not None else None
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.recv_ts
+
+    @property
+    def mid(self) -> float:
+        return (self.bid + self.ask) / 2 if self.bid and self.ask else self.last
+
+    def buy_price(self) -> float:
+        # 市價買在 ask，沒有報價時退回 last
+        return self.ask or self.last
+
+    def sell_price(self) -> float:
+        return self.bid or self.last
+
+
+def _float(value: str) -> float:
+    return float(value) if value else 0.0
+
 
 class OKXWsTicker:
-    def __init__(self, symbol: str, channel: str = "tickers", inst_type: str = "SWAP"):
+    def __init__(self, symbol: str, channel: str = "tickers", inst_type: str = "SWAP", manager: OKXWsManager = None):
         self.symbol = symbol.replace('_', '-').upper()
         self.channel = channel
         self.inst_type = inst_type
-        self.ws_url = "wss://ws.okx.com:8443/ws/v5/public"
-        self.last_price = None
-        self._ws = None
-        self._thread = None
-        self._stop = threading.Event()
-
-    def _on_message(self, ws, message):
-        data = json.loads(message)
-        # print(f"[OKX WS] Message: {data}")
-        if 'data' in data and len(data['data']) > 0:
-            self.last_price = float(data['data'][0].get('last', 0))
-
-    def _on_error(self, ws, error):
-        print(f"[OKX WS] Error: {error}")
-
-    def _on_close(self, ws, close_status_code, close_msg):
-        print(f"[OKX WS] Closed: {close_status_code} {close_msg}")
-
-    def _on_open(self, ws):
-        sub = {
-            "op": "subscribe",
-            "args": [
-                {
-                    "channel": self.channel,
-                    "instId": f"{self.symbol}-{self.inst_type}"
-                }
-            ]
-        }
-        ws.send(json.dumps(sub))
-        print(f"[OKX WS] 訂閱: {sub}")
+        self.inst_id = f"{self.symbol}-{self.inst_type}"
+        self.snapshot: Optional[TickerSnapshot] = None
+        # 傳入共用的 manager 則多個訂閱共用連線，否則自己建一個
+        self._own_manager = manager is None
+        self.manager = manager or OKXWsManager()
 
-    def start(self):
-        def run():
-            self._ws = websocket.WebSocketApp(
-                self.ws_url,
-                on_open=self._on_open,
-                on_message=self._on_message,
-                on_error=self._on_error,
-                on_close=self._on_close
+    def _on_push(self, message: str):
+        # 只解碼 ticker 需要的欄位
+        recv_ts = time.time()
+        ticks = decode_tickers(message)
+        if len(ticks) > 0:
+            tick = ticks[0]
+            self.snapshot = TickerSnapshot(
+                inst_id=tick.instId or self.inst_id,
+                bid=_float(tick.bidPx),
+                bid_size=_float(tick.bidSz),
+                ask=_float(tick.askPx),
+                ask_size=_float(tick.askSz),
+                last=_float(tick.last),
+                vol24h=_float(tick.vol24h),
+                exch_ts=int(tick.ts) if tick.ts else None,
+                recv_ts=recv_ts
             )
-            self._ws.run_forever()
-        self._thread = threading.Thread(target=run, daemon=True)
-        self._thread.start()
+
+    def start(self):
+        self.manager.subscribe(self.channel, self.inst_id, self._on_push, raw=True)
+        print(f"[OKX WS] 訂閱: {self.channel} {self.inst_id}")
+        if self._own_manager:
+            self.manager.start()
 
     def stop(self):
-        self._stop.set()
-        if self._ws:
-            self._ws.close()
-        if self._thread:
-            self._thread.join()
+        self.manager.unsubscribe(self.channel, self.inst_id, self._on_push)
+        if self._own_manager:
+            self.manager.stop()
+
+    @property
+    def last_price(self) -> Optional[float]:
+        snap = self.snapshot
+        return snap.last if snap is not None else None
+
+    @property
+    def last_update_time(self) -> Optional[float]:
+        snap = self.snapshot
+        return snap.recv_ts if snap is not None else None
 
     def get_last_price(self):
         return self.last_price
+
+    def get_snapshot(self) -> Optional[TickerSnapshot]:
+        # 回傳最新一筆完整報價 (bid/ask/last 一致)，含 exch_ts / recv_ts / latency_ms
+        return self.snapshot
+
+    def is_stale(self, max_age: float = 10.0) -> bool:
+        # 連線中斷或超過 max_age 秒沒有新 ticker
+        return self.manager.is_stale(self.channel, self.inst_id, max_age)
     
 class OKXWsKline:
-    def __init__(self, symbol: str, interval: str, confirm_queue: Queue):
+    def __init__(self, symbol: str, interval: str, confirm_queue: Queue, manager: OKXWsManager = None, last_ts: Optional[int] = None,
+                 backfill: bool = True):
         self.symbol = symbol.replace('_', '-').upper()
         self.interval = interval            # e.g. "15m", "1H"
         self.channel = f"candle{interval}"
         self.inst_type = "SWAP"
-        self.ws_url = "wss://ws.okx.com:8443/ws/v5/business"
+        self.inst_id = f"{self.symbol}-{self.inst_type}"
 
         self.confirm_queue = confirm_queue
-        self._ws = None
-        self._thread = None
+        self._own_manager = manager is None
+        self.manager = manager or OKXWsManager()
+        self.step_ms = interval_to_ms(interval)
+        # 最後送出的 confirmed K 線 ts；斷線重連或跳根時從這裡用 REST 補抓
+        self.last_ts = last_ts
+        # False: 缺口不以 REST 補抓 (重播錄製資料時由 StreamReplayer 關閉，不連網且結果可重現)
+        self.backfill = backfill
+        self.last_update_time = None
+        self._downloader = KlineDownloader(OKXKlineFetcher(market_type="futures"), max_workers=2)
+        self._lock = threading.Lock()
+        # 補抓中的範圍尾端 (None 表示沒有在補抓) 與期間收到、待補抓完才送出的K線
+        self._backfill_end: Optional[int] = None
+        self._held: List[dict] = []
 
-    def _on_message(self, ws, message):
-        data = json.loads(message)
-        if "data" not in data:
+    def _emit(self, bar: dict):
+        if self.last_ts is not None and bar["ts"] <= self.last_ts:
             return
+        self.last_ts = bar["ts"]
+        self.confirm_queue.put(bar)
+
+    def _download(self, start_ms: int, end_ms: int) -> list:
+        if start_ms >= end_ms:
+            return []
+        try:
+            rows = self._downloader.download(self.symbol, self.interval, start_ms, end_ms)
+        except Exception as e:
+            print(f"[WS] backfill {self.channel} failed: {e}")
+            return []
+        print(f"[WS] backfilled {len(rows)} {self.channel} bars")
+        return rows
+
+    def _request_backfill(self, end_ms: int):
+        # 呼叫端持有 self._lock；REST 補抓在背景執行緒，不佔用共用 websocket 的接收執行緒
+        if self._backfill_end is None:
+            self._backfill_end = end_ms
+            threading.Thread(target=self._run_backfill, daemon=True, name=f"backfill-{self.channel}").start()
+        else:
+            self._backfill_end = max(self._backfill_end, end_ms)
+
+    def _run_backfill(self):
+        fetched = None
+        while True:
+            with self._lock:
+                end_ms = self._backfill_end
+                if fetched is not None and end_ms <= fetched:
+                    # 補抓完成: 依序送出期間暫存的即時K線 (已補到的會被 _emit 濾掉)
+                    held, self._held = self._held, []
+                    for bar in held:
+                        self._emit(bar)
+                    self._backfill_end = None
+                    return
+                start_ms = self.last_ts + self.step_ms
+            rows = self._download(start_ms, end_ms)
+            fetched = end_ms
+            with self._lock:
+                for r in rows:
+                    self._emit({
+                        "ts": r["timestamp"],
+                        "open": r["open"],
+                        "high": r["high"],
+                        "low": r["low"],
+                        "close": r["close"],
+                        "volume": r["volume"],
+                        "interval": self.interval
+                    })
 
-        k = data["data"][0]
+    def _on_reconnect(self):
+        # 重新訂閱後補齊斷線期間已收盤的K線
+        with self._lock:
+            if self.last_ts is None or not self.backfill:
+                return
+            now = int(time.time() * 1000)
+            end_ms = now - now % self.step_ms
+            if self.last_ts + self.step_ms < end_ms:
+                self._request_backfill(end_ms)
+
+    def _on_push(self, message: str):
+        recv_ns = time.perf_counter_ns()
+        self.last_update_time = time.time()
+        k = decode_candles(message)[0]
         confirm = k[8]
 
         if confirm == "1":
@@ -92,36 +206,36 @@ class OKXWsKline:
                 "low": float(k[3]),
                 "close": float(k[4]),
                 "volume": float(k[5]),
-                "interval": self.interval
+                "interval": self.interval,
+                # monotonic receive time, start of the candle -> signal -> order latency span
+                "recv_ns": recv_ns
             }
-            self.confirm_queue.put(bar)
-
-    def _on_open(self, ws):
-        sub = {
-            "op": "subscribe",
-            "args": [{
-                "channel": self.channel,
-                "instId": f"{self.symbol}-{self.inst_type}"
-            }]
-        }
-        ws.send(json.dumps(sub))
-        print(f"[WS] subscribed {self.channel}")
+            with self._lock:
+                if self._backfill_end is not None:
+                    # 補抓進行中: 先暫存，維持K線順序；與前一根之間又有缺口時延長補抓範圍
+                    prev_ts = self._held[-1]["ts"] if self._held else self._backfill_end - self.step_ms
+                    if bar["ts"] > prev_ts + self.step_ms:
+                        self._backfill_end = max(self._backfill_end, bar["ts"])
+                    self._held.append(bar)
+                elif self.backfill and self.last_ts is not None and bar["ts"] > self.last_ts + self.step_ms:
+                    self._request_backfill(bar["ts"])
+                    self._held.append(bar)
+                else:
+                    self._emit(bar)
 
-    def start(self):
-        def run():
-            self._ws = websocket.WebSocketApp(
-                self.ws_url,
-                on_open=self._on_open,
-                on_message=self._on_message
-            )
-            self._ws.run_forever()
+    def is_stale(self, max_age: float = 10.0) -> bool:
+        return self.manager.is_stale(self.channel, self.inst_id, max_age)
 
-        self._thread = threading.Thread(target=run, daemon=True)
-        self._thread.start()
+    def start(self):
+        self.manager.subscribe(self.channel, self.inst_id, self._on_push, on_reconnect=self._on_reconnect, raw=True)
+        print(f"[WS] subscribed {self.channel}")
+        if self._own_manager:
+            self.manager.start()
 
     def stop(self):
-        if self._ws:
-            self._ws.close()
+        self.manager.unsubscribe(self.channel, self.inst_id, self._on_push, on_reconnect=self._on_reconnect)
+        if self._own_manager:
+            self.manager.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,195 @@
+"""
+Client-side Rate Limiter
+
+This module provides token-bucket rate limiting shared by the OKX and Binance
+connectors, so REST clients run at the highest rate the exchange permits
+instead of sleeping a fixed delay after every request.
+
+Features:
+- Token buckets with weighted acquisition (Binance request weight, OKX batch size)
+- Per-endpoint limits for OKX and shared IP-weight budgets for Binance
+- Thread-safe blocking acquire and asyncio-friendly acquire_async
+- Process-wide limiter instances so every client of an exchange shares one budget
+"""
+
+import asyncio
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+
+class TokenBucket:
+    """
+    A token bucket holding `capacity` tokens refilled over `period` seconds.
+
+    Acquisition reserves tokens immediately (the balance may go negative) and
+    returns how long the caller must wait, so concurrent callers queue up in
+    arrival order instead of racing for the next refill.
+    """
+
+    def __init__(self, capacity: float, period: float):
+        """
+        Initialize the TokenBucket.
+
+        Args:
+            capacity (float): Maximum tokens (requests or weight) per period
+            period (float): Window length in seconds
+        """
+        if capacity <= 0 or period <= 0:
+            raise ValueError("capacity and period must be positive")
+
+        self.capacity = float(capacity)
+        self.period = float(period)
+        self.rate = self.capacity / self.period
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, weight: float = 1) -> float:
+        """
+        Reserve `weight` tokens.
+
+        Args:
+            weight (float): Tokens to consume
+
+        Returns:
+            float: Seconds to wait before the request may be sent
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= weight
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, weight: float = 1) -> None:
+        """Block the calling thread until `weight` tokens are available."""
+        wait = self.reserve(weight)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, weight: float = 1) -> None:
+        """Wait without blocking the event loop until `weight` tokens are available."""
+        wait = self.reserve(weight)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class RateLimiter:
+    """
+    A set of token buckets keyed by endpoint.
+
+    Keys are either a path or "METHOD path" for endpoints whose HTTP methods
+    are limited separately (OKX places and queries orders on the same path).
+    Endpoints without an explicit limit share the `default` bucket, which is
+    how Binance's per-IP request-weight budget is modelled.
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[float, float]], default: Tuple[float, float]):
+        """
+        Initialize the RateLimiter.
+
+        Args:
+            limits (Dict): Endpoint path or "METHOD path" -> (capacity, period seconds)
+            default (Tuple): (capacity, period seconds) for all other endpoints
+        """
+        self._buckets = {endpoint: TokenBucket(*limit) for endpoint, limit in limits.items()}
+        self._default = TokenBucket(*default)
+
+    def bucket(self, endpoint: str, method: Optional[str] = None) -> TokenBucket:
+        """Return the bucket that governs `method endpoint` (method-specific limits first)."""
+        if method is not None:
+            bucket = self._buckets.get(f"{method.upper()} {endpoint}")
+            if bucket is not None:
+                return bucket
+        return self._buckets.get(endpoint, self._default)
+
+    def acquire(self, endpoint: str, weight: float = 1, method: Optional[str] = None) -> None:
+        """Block until a request to `endpoint` with `weight` is permitted."""
+        self.bucket(endpoint, method).acquire(weight)
+
+    async def acquire_async(self, endpoint: str, weight: float = 1, method: Optional[str] = None) -> None:
+        """Asyncio variant of acquire()."""
+        await self.bucket(endpoint, method).acquire_async(weight)
+
+
+# OKX limits are per endpoint (requests per 2 seconds); batch endpoints count orders
+OKX_LIMITS = {
+    "/api/v5/market/candles": (40, 2.0),
+    "/api/v5/market/history-candles": (20, 2.0),
+    "/api/v5/market/ticker": (20, 2.0),
+    "/api/v5/market/books": (40, 2.0),
+    # placing (POST) and querying (GET) an order are limited separately
+    "POST /api/v5/trade/order": (60, 2.0),
+    "GET /api/v5/trade/order": (60, 2.0),
+    "/api/v5/trade/batch-orders": (300, 2.0),
+    "/api/v5/trade/cancel-order": (60, 2.0),
+    "/api/v5/trade/cancel-batch-orders": (300, 2.0),
+    "/api/v5/trade/amend-order": (60, 2.0),
+    "/api/v5/trade/orders-pending": (60, 2.0),
+    "/api/v5/account/balance": (10, 2.0),
+    "/api/v5/account/positions": (10, 2.0),
+    "/api/v5/account/set-leverage": (20, 2.0),
+}
+OKX_DEFAULT_LIMIT = (10, 2.0)
+
+# Binance limits are a shared request-weight budget per IP (per minute)
+BINANCE_SPOT_DEFAULT_LIMIT = (6000, 60.0)
+BINANCE_FUTURES_DEFAULT_LIMIT = (2400, 60.0)
+BINANCE_FUTURES_LIMITS = {
+    # futures data endpoints have their own budget of 1000 requests per 5 minutes
+    "/futures/data/openInterestHist": (1000, 300.0),
+}
+
+
+def binance_klines_weight(market_type: str, limit: int) -> int:
+    """
+    Request weight of a Binance klines call.
+
+    Args:
+        market_type (str): "spot" or "futures"
+        limit (int): Requested number of klines
+
+    Returns:
+        int: Request weight
+    """
+    if market_type == "spot":
+        return 2
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str) -> RateLimiter:
+    """
+    Get the process-wide limiter for an exchange.
+
+    Args:
+        name (str): One of "okx", "binance_spot", "binance_futures"
+
+    Returns:
+        RateLimiter: Shared limiter instance
+    """
+    with _limiters_lock:
+        limiter: Optional[RateLimiter] = _limiters.get(name)
+        if limiter is None:
+            if name == "okx":
+                limiter = RateLimiter(OKX_LIMITS, OKX_DEFAULT_LIMIT)
+            elif name == "binance_spot":
+                limiter = RateLimiter({}, BINANCE_SPOT_DEFAULT_LIMIT)
+            elif name == "binance_futures":
+                limiter = RateLimiter(BINANCE_FUTURES_LIMITS, BINANCE_FUTURES_DEFAULT_LIMIT)
+            else:
+                raise ValueError(f"Unknown rate limiter: {name}")
+            _limiters[name] = limiter
+        return limiter
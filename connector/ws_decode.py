@@ -0,0 +1,131 @@
+"""
+Websocket Message Decoding
+
+OKX pushes every frame as JSON text. Most of the decoding cost on the
+websocket threads goes to dicts that are thrown away after one field is read,
+so this module provides:
+
+- `loads`: the fastest available JSON parser (msgspec, then orjson, then json)
+- `route_key`: a pre-filter that reads only the leading `arg` object, so pongs
+  and subscribe/unsubscribe acks are rejected without parsing the frame
+- typed decoders for ticker and candle pushes; with msgspec installed these
+  decode straight into structs and skip every field that is not declared
+
+Install the optional backends with `pip install "live-trade[fast-json]"`.
+"""
+
+import json
+from typing import Any, List, Optional, Tuple
+
+try:
+    import msgspec
+except ImportError:  # optional dependency
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+if msgspec is not None:
+    BACKEND = "msgspec"
+    loads = msgspec.json.Decoder().decode
+elif orjson is not None:
+    BACKEND = "orjson"
+    loads = orjson.loads
+else:
+    BACKEND = "json"
+    loads = json.loads
+
+_ARG_PREFIX = '{"arg":{'
+_DATA_MARKER = ',"data":'
+
+
+def route_key(message: str) -> Optional[Tuple[str, str]]:
+    """
+    Return (channel, instId) for a data push, or None for any other frame.
+
+    OKX serializes pushes as {"arg":{...},"data":[...]}, so only the small
+    `arg` object is parsed here; `event` frames and `pong` never match.
+
+    Args:
+        message (str): Raw websocket text frame
+
+    Returns:
+        Optional[Tuple[str, str]]: Routing key of the push
+    """
+    if not message.startswith(_ARG_PREFIX):
+        return None
+    end = message.find('}', len(_ARG_PREFIX))
+    if end < 0 or not message.startswith(_DATA_MARKER, end + 1):
+        return None
+    return _arg_field(message, '"channel":"', end), _arg_field(message, '"instId":"', end)
+
+
+def _arg_field(message: str, marker: str, end: int) -> Optional[str]:
+    # arg 內只有簡單字串欄位，直接找字串比 json 解析快
+    start = message.find(marker, len(_ARG_PREFIX) - 1, end)
+    if start < 0:
+        return None
+    start += len(marker)
+    return message[start:message.find('"', start, end)]
+
+
+def is_event(message: str) -> bool:
+    """True for event frames (login/subscribe acks and errors)."""
+    return message.startswith('{"event"')
+
+
+if msgspec is not None:
+    class Ticker(msgspec.Struct):
+        instId: str = ""
+        last: str = ""
+        lastSz: str = ""
+        askPx: str = ""
+        askSz: str = ""
+        bidPx: str = ""
+        bidSz: str = ""
+        vol24h: str = ""
+        ts: str = ""
+
+    class _TickerPush(msgspec.Struct):
+        data: List[Ticker]
+
+    class _CandlePush(msgspec.Struct):
+        data: List[List[str]]
+
+    _ticker_decoder = msgspec.json.Decoder(_TickerPush)
+    _candle_decoder = msgspec.json.Decoder(_CandlePush)
+
+    def decode_tickers(message: str) -> List["Ticker"]:
+        """Decode a `tickers` push into Ticker structs."""
+        return _ticker_decoder.decode(message).data
+
+    def decode_candles(message: str) -> List[List[str]]:
+        """Decode a `candle*` push into rows [ts, o, h, l, c, vol, volCcy, volCcyQuote, confirm]."""
+        return _candle_decoder.decode(message).data
+else:
+    class Ticker:
+        # 沒有 msgspec 時以 dict 為底，欄位用屬性存取，缺少的欄位為空字串
+        __slots__ = ("_d",)
+
+        def __init__(self, d: dict):
+            self._d = d
+
+        def __getattr__(self, name: str) -> str:
+            return self._d.get(name, "")
+
+    def decode_tickers(message: str) -> List[Ticker]:
+        """Decode a `tickers` push into Ticker objects."""
+        return [Ticker(d) for d in loads(message)['data']]
+
+    def decode_candles(message: str) -> List[List[str]]:
+        """Decode a `candle*` push into rows [ts, o, h, l, c, vol, volCcy, volCcyQuote, confirm]."""
+        return loads(message)['data']
+
+
+def decode(message: str) -> Optional[Any]:
+    """Fully decode a data push, or return None for pongs and event frames."""
+    if route_key(message) is None:
+        return None
+    return loads(message)
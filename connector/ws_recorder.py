@@ -0,0 +1,234 @@
+"""
+Websocket Stream Recording and Replay
+
+`StreamRecorder` taps an OKXWsManager and appends every raw frame with its
+receive time to gzip-compressed chunk files, one `<recv_ts>\t<frame>` line
+per frame. Writing happens on a background thread so the websocket threads
+only pay for a queue put.
+
+`StreamReplayer` reads the chunks back in order and injects the frames into an
+OKXWsManager that is never started, so the same consumers (OKXWsTicker,
+OKXWsKline and whatever drains their queues, e.g. the KlineAggregator) run
+against the recorded session without network, at the original pace, faster,
+or as fast as possible for profiling. Consumers that would backfill gaps over
+REST have that turned off when the replay starts, so replays are deterministic.
+
+    python -m connector.ws_recorder record data/ws BTC-USDT ETH-USDT
+    python -m connector.ws_recorder replay data/ws BTC-USDT ETH-USDT [--speed 10]
+"""
+
+import glob
+import gzip
+import os
+import sys
+import threading
+import time
+from queue import Queue, Empty
+from typing import Iterator, List, Optional, Tuple
+from connector.okx_ws_manager import OKXWsManager
+
+CHUNK_SUFFIX = ".ws.gz"
+
+
+class StreamRecorder:
+    """
+    Record every frame received by `manager` into `directory`.
+
+    A new chunk file is started every `chunk_seconds`; files are named by the
+    UTC time of their first frame so lexical order is replay order.
+    """
+
+    def __init__(self, manager: OKXWsManager, directory: str, chunk_seconds: float = 3600.0,
+                 prefix: str = "okx", compresslevel: int = 6):
+        self.manager = manager
+        self.directory = directory
+        self.chunk_seconds = chunk_seconds
+        self.prefix = prefix
+        self.compresslevel = compresslevel
+        self.frames = 0
+        self.files: List[str] = []
+        self._queue: Queue = Queue()
+        self._stop = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self._file = None
+        self._chunk_start = 0.0
+
+    def _on_frame(self, message: str):
+        self._queue.put((time.time(), message))
+
+    def _open_chunk(self, ts: float):
+        if self._file is not None:
+            self._file.close()
+        name = time.strftime("%Y%m%d-%H%M%S", time.gmtime(ts)) + f"-{int(ts * 1000) % 1000:03d}"
+        path = os.path.join(self.directory, f"{self.prefix}-{name}{CHUNK_SUFFIX}")
+        self._file = gzip.open(path, "at", encoding="utf-8", compresslevel=self.compresslevel)
+        self._chunk_start = ts
+        self.files.append(path)
+
+    def _write(self, batch: List[Tuple[float, str]]):
+        for ts, message in batch:
+            if self._file is None or ts - self._chunk_start >= self.chunk_seconds:
+                self._open_chunk(ts)
+            # OKX 的 frame 是單行 JSON，不含換行與 tab
+            self._file.write(f"{ts:.6f}\t{message}\n")
+        self.frames += len(batch)
+
+    def _run_writer(self):
+        while True:
+            try:
+                batch = [self._queue.get(timeout=0.5)]
+            except Empty:
+                if self._stop.is_set():
+                    break
+                continue
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except Empty:
+                    break
+            self._write(batch)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._stop.clear()
+        self._writer = threading.Thread(target=self._run_writer, daemon=True)
+        self._writer.start()
+        self.manager.add_listener(self._on_frame)
+
+    def stop(self):
+        self.manager.remove_listener(self._on_frame)
+        self._stop.set()
+        if self._writer:
+            self._writer.join()
+        print(f"[WS REC] {self.frames} frames -> {len(self.files)} files in {self.directory}")
+
+
+def chunk_files(path: str) -> List[str]:
+    """Chunk files under a directory (or a single file), in recording order."""
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, f"*{CHUNK_SUFFIX}")))
+    return [path]
+
+
+def read_frames(paths: List[str]) -> Iterator[Tuple[float, str]]:
+    """Yield (recv_ts, raw frame) from chunk files in order."""
+    for path in paths:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                ts, _, message = line.rstrip("\n").partition("\t")
+                yield float(ts), message
+
+
+class StreamReplayer:
+    """
+    Replay recorded frames into `manager` (an OKXWsManager that is not started).
+
+    Args:
+        path (str): Chunk directory or a single chunk file
+        manager (OKXWsManager): Manager the consumers subscribed on
+        speed (float): 1.0 replays at the recorded pace, 10.0 ten times faster,
+            None (or <= 0) as fast as possible
+        start_ts / end_ts (float): Optional receive-time window to replay
+    """
+
+    def __init__(self, path: str, manager: OKXWsManager, speed: Optional[float] = 1.0,
+                 start_ts: Optional[float] = None, end_ts: Optional[float] = None):
+        self.paths = chunk_files(path)
+        self.manager = manager
+        self.speed = speed if speed and speed > 0 else None
+        self.start_ts = start_ts
+        self.end_ts = end_ts
+        self.frames = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def disable_backfill(self):
+        """
+        Turn off REST gap backfill on the consumers subscribed on `manager`
+        (e.g. OKXWsKline), so a gap in the recording stays a gap and the
+        replay never touches the network.
+        """
+        for handler in self.manager.handlers():
+            owner = getattr(handler, "__self__", None)
+            if hasattr(owner, "backfill"):
+                owner.backfill = False
+
+    def replay(self) -> int:
+        """Replay on the calling thread; returns the number of frames injected."""
+        self.disable_backfill()
+        first_ts = None
+        wall_start = time.perf_counter()
+        for ts, message in read_frames(self.paths):
+            if self._stop.is_set():
+                break
+            if self.start_ts is not None and ts < self.start_ts:
+                continue
+            if self.end_ts is not None and ts > self.end_ts:
+                break
+            if first_ts is None:
+                first_ts = ts
+            if self.speed is not None:
+                delay = (ts - first_ts) / self.speed - (time.perf_counter() - wall_start)
+                if delay > 0 and self._stop.wait(delay):
+                    break
+            self.manager.inject(message)
+            self.frames += 1
+        return self.frames
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.replay, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def join(self, timeout: Optional[float] = None):
+        if self._thread:
+            self._thread.join(timeout)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("record", "replay"):
+        print("usage: python -m connector.ws_recorder record <dir> <SYMBOL>... | replay <dir> <SYMBOL>... [--speed N]")
+        sys.exit(1)
+    if sys.argv[1] == "record":
+        from connector.okx_ws_ticker import OKXWsTicker
+        manager = OKXWsManager()
+        recorder = StreamRecorder(manager, sys.argv[2])
+        for symbol in sys.argv[3:]:
+            OKXWsTicker(symbol, manager=manager).start()
+            manager.subscribe("candle1m", f"{symbol.replace('_', '-').upper()}-SWAP", lambda data: None, raw=True)
+        recorder.start()
+        manager.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            manager.stop()
+            recorder.stop()
+    else:
+        # 重播到與 trading_main 相同的消費者；speed 省略時以最高速重播，用於 profiling
+        from connector.okx_ws_ticker import OKXWsTicker, OKXWsKline
+        args = sys.argv[3:]
+        speed = None
+        if "--speed" in args:
+            speed = float(args[args.index("--speed") + 1])
+            del args[args.index("--speed"):args.index("--speed") + 2]
+        manager = OKXWsManager()
+        tickers = [OKXWsTicker(symbol, manager=manager) for symbol in args]
+        klines = [OKXWsKline(symbol, "1m", Queue(), manager=manager, backfill=False) for symbol in args]
+        for consumer in tickers + klines:
+            consumer.start()
+        replayer = StreamReplayer(sys.argv[2], manager, speed=speed)
+        t0 = time.perf_counter()
+        n = replayer.replay()
+        elapsed = time.perf_counter() - t0
+        print(f"[WS REPLAY] {n} frames in {elapsed:.3f}s ({n / elapsed if elapsed else 0:,.0f} frames/s)")
+        for ticker, kline in zip(tickers, klines):
+            print(f"  {ticker.inst_id}: {ticker.get_snapshot()}, {kline.confirm_queue.qsize()} confirmed 1m bars")
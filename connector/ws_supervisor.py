@@ -0,0 +1,143 @@
+import websocket
+import threading
+import time
+from typing import Callable, Optional
+
+
+class SupervisedWebSocket:
+    """
+    A websocket connection that keeps itself alive.
+
+    OKX drops connections that stay silent for 30 seconds, so a text `ping` is
+    sent after `ping_interval` seconds without traffic; if nothing (not even
+    `pong`) arrives within `pong_timeout`, the socket is closed and reopened.
+    Reconnects back off exponentially up to `max_reconnect_delay`. `on_open`
+    runs on every (re)connect, so callers resubscribe there; `connects`
+    counts successful opens and `last_message_time` surfaces staleness.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        on_open: Callable[["SupervisedWebSocket"], None],
+        on_message: Callable[[str], None],
+        on_close: Optional[Callable[[], None]] = None,
+        name: str = "OKX WS",
+        ping_interval: float = 20.0,
+        pong_timeout: float = 10.0,
+        reconnect_delay: float = 1.0,
+        max_reconnect_delay: float = 60.0
+    ):
+        self.url = url
+        self.name = name
+        self.ping_interval = ping_interval
+        self.pong_timeout = pong_timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self._user_on_open = on_open
+        self._user_on_message = on_message
+        self._user_on_close = on_close
+
+        self.connects = 0
+        self.connected = threading.Event()
+        self.connected_since: Optional[float] = None
+        self.last_message_time: Optional[float] = None
+        self._ping_sent: Optional[float] = None
+        self._ws = None
+        self._stop = threading.Event()
+        self._threads = []
+
+    @property
+    def reconnects(self) -> int:
+        return max(0, self.connects - 1)
+
+    def send(self, message: str):
+        if self._ws is not None and self.connected.is_set():
+            self._ws.send(message)
+
+    def is_stale(self, max_age: float) -> bool:
+        """True if the socket is down or nothing has arrived for `max_age` seconds."""
+        if not self.connected.is_set() or self.last_message_time is None:
+            return True
+        return time.time() - self.last_message_time > max_age
+
+    def _on_open(self, ws):
+        now = time.time()
+        self.connects += 1
+        self.connected_since = now
+        self.last_message_time = now
+        self._ping_sent = None
+        self.connected.set()
+        try:
+            self._user_on_open(self)
+        except Exception as e:
+            print(f"[{self.name}] on_open error: {e}")
+
+    def _on_message(self, ws, message):
+        self.last_message_time = time.time()
+        self._ping_sent = None
+        if message == 'pong':
+            return
+        self._user_on_message(message)
+
+    def _on_error(self, ws, error):
+        print(f"[{self.name}] Error: {error}")
+
+    def _on_close(self, ws, close_status_code, close_msg):
+        self.connected.clear()
+        print(f"[{self.name}] Closed: {close_status_code} {close_msg}")
+        if self._user_on_close is not None:
+            self._user_on_close()
+
+    def _run(self):
+        delay = self.reconnect_delay
+        while not self._stop.is_set():
+            opened_before = self.connects
+            self._ws = websocket.WebSocketApp(
+                self.url,
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=self._on_error,
+                on_close=self._on_close
+            )
+            self._ws.run_forever()
+            self.connected.clear()
+            if self._stop.is_set():
+                break
+            # 有連上過就從頭退避，連不上才加倍
+            if self.connects > opened_before:
+                delay = self.reconnect_delay
+            print(f"[{self.name}] reconnecting in {delay:.0f}s")
+            self._stop.wait(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _heartbeat(self):
+        while not self._stop.wait(1.0):
+            if not self.connected.is_set() or self.last_message_time is None:
+                continue
+            now = time.time()
+            if self._ping_sent is not None:
+                if now - self._ping_sent > self.pong_timeout:
+                    print(f"[{self.name}] no pong in {self.pong_timeout:.0f}s, reconnecting")
+                    self._ping_sent = None
+                    self._ws.close()
+            elif now - self.last_message_time > self.ping_interval:
+                self._ping_sent = now
+                try:
+                    self._ws.send('ping')
+                except Exception:
+                    self._ws.close()
+
+    def start(self):
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._run, daemon=True),
+                         threading.Thread(target=self._heartbeat, daemon=True)]
+        for t in self._threads:
+            t.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._ws:
+            self._ws.close()
+        for t in self._threads:
+            t.join()
@@ -0,0 +1,105 @@
+import threading
+from collections import OrderedDict
+from typing import Hashable, List, Optional, Tuple
+import pandas as pd
+
+
+class KlineCache:
+    # 讀取快取: key = (symbol, interval, spec)，spec 為 ("window", n) / ("range", start_ts, end_ts) / ("aligned", ...)
+    # 以 DataFrame 佔用記憶體為上限做 LRU 淘汰；寫入時能接在尾端的就增量延伸，否則作廢
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self._entries: "OrderedDict[Hashable, Tuple[pd.DataFrame, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[pd.DataFrame]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0].copy()
+
+    def put(self, key: Hashable, df: pd.DataFrame):
+        nbytes = int(df.memory_usage(index=True).sum())
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            self._set(key, df.copy(), nbytes)
+
+    def _set(self, key: Hashable, df: pd.DataFrame, nbytes: int):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.bytes -= old[1]
+        self._entries[key] = (df, nbytes)
+        self.bytes += nbytes
+        while self.bytes > self.max_bytes and self._entries:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.bytes -= evicted
+            self.evictions += 1
+
+    def _drop(self, key: Hashable):
+        _, nbytes = self._entries.pop(key)
+        self.bytes -= nbytes
+
+    def on_insert(self, symbol: str, interval: str, rows: List[tuple]):
+        # rows: (ts, open, high, low, close, volume)，已寫入 DB
+        if not rows:
+            return
+        min_ts = min(r[0] for r in rows)
+        max_ts = max(r[0] for r in rows)
+        new = None
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == symbol]:
+                _, key_interval, spec = key
+                if spec[0] == "aligned":
+                    # 多週期對齊結果牽涉衍生表，任何寫入都作廢
+                    self._drop(key)
+                    continue
+                if key_interval != interval:
+                    continue
+                df, _ = self._entries[key]
+                last_ts = int(df['timestamp'].iloc[-1]) if len(df) else None
+                if spec[0] == "range":
+                    start_ts, end_ts = spec[1], spec[2]
+                    if (end_ts is not None and min_ts >= end_ts) or (start_ts is not None and max_ts < start_ts):
+                        continue
+                    if end_ts is not None or last_ts is None or min_ts <= last_ts:
+                        self._drop(key)
+                        continue
+                elif last_ts is None or min_ts <= last_ts:
+                    self._drop(key)
+                    continue
+                # 新資料全在快取最後一根之後: 直接接上
+                if new is None:
+                    new = pd.DataFrame(sorted(rows), columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+                part = new if spec[0] == "window" or spec[1] is None else new[new['timestamp'] >= spec[1]]
+                merged = pd.concat([df, part], ignore_index=True)
+                if spec[0] == "window":
+                    merged = merged.iloc[-spec[1]:].reset_index(drop=True)
+                self._set(key, merged, int(merged.memory_usage(index=True).sum()))
+
+    def invalidate(self, symbol: Optional[str] = None, interval: Optional[str] = None):
+        with self._lock:
+            for key in [k for k in self._entries
+                        if (symbol is None or k[0] == symbol) and (interval is None or k[1] == interval)]:
+                self._drop(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+            }
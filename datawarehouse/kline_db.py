@@ -3,87 +3,380 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import sqlite3
 import pandas as pd
-import time
-from connector.okx_kline import OKXKlineFetcher, fetch_futures_klines
-from typing import Dict, Any
+import threading
+import numbers
+from contextlib import contextmanager
+from connector.okx_kline import OKXKlineFetcher
+from connector.binance_kline import BinanceKlineFetcher
+from connector.kline_downloader import KlineDownloader, interval_to_ms
+from datawarehouse.cache import KlineCache
+from typing import Dict, Any, List, Callable, Optional, Tuple
 
 def get_db_conn(db_path: str = "datawarehouse/kline.db"):
     conn = sqlite3.connect(db_path)
     return conn
 
-def listen_and_store_kline(symbol: str, interval: str, market_type: str = "futures"):
-    fetcher = OKXKlineFetcher(market_type=market_type)
-    last_timestamp = None
-    while True:
-        klines = fetch_futures_klines(symbol=symbol, interval=interval, limit=1)
-        df = pd.DataFrame(klines, columns=["timestamp", "open_price", "high_price", "low_price", "close_price", "volume"])
-        df.rename(columns={
-            "open_price": "open",
-            "high_price": "high",
-            "low_price": "low",
-            "close_price": "close",
-            "volume": "volume",
-        }, inplace=True)
-        ts = df['timestamp'].iloc[-1]
-        if ts != last_timestamp:
-            insert_kline(symbol, interval, df.iloc[-1].to_dict())
-            last_timestamp = ts
-            print(f"已存入新K線: {ts}")
-        else:
-            print("尚無新K線")
-        # 休息到下個 interval
-        if interval.endswith('m'):
-            sleep_sec = int(interval[:-1]) * 60
-        elif interval.endswith('H'):
-            sleep_sec = int(interval[:-1]) * 3600
-        else:
-            sleep_sec = 60
-        time.sleep(sleep_sec)
+def kline_table_name(symbol: str, interval: str) -> str:
+    return f"kline_{symbol.replace('-', '_')}_{interval}"
 
-def create_kline_table(symbol: str, interval: str, db_path: str = "datawarehouse/kline.db"):
-    table = f"kline_{symbol.replace('-', '_')}_{interval}"
+# v2: ts 為毫秒整數主鍵 (WITHOUT ROWID，資料依 ts 聚簇存放)
+KLINE_SCHEMA_V2 = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        ts INTEGER PRIMARY KEY,
+        open REAL NOT NULL,
+        high REAL NOT NULL,
+        low REAL NOT NULL,
+        close REAL NOT NULL,
+        volume REAL NOT NULL
+    ) WITHOUT ROWID
+"""
+
+def derived_table_name(symbol: str, interval: str) -> str:
+    return f"agg_{symbol.replace('-', '_')}_{interval}"
+
+# 由 1m 物化出的高週期: (symbol, interval) -> 來源週期
+DERIVED_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS derived_intervals (
+        symbol TEXT,
+        interval TEXT,
+        base_interval TEXT,
+        PRIMARY KEY (symbol, interval)
+    )
+"""
+
+# 以 ts 取整分桶；open/close 取桶內最小/最大 ts 那根，只寫入來源已涵蓋到桶尾的完整桶
+RESAMPLE_SQL = """
+    INSERT OR REPLACE INTO {dst} (ts, open, high, low, close, volume)
+    SELECT b.bucket, o.open, b.high, b.low, c.close, b.volume
+    FROM (
+        SELECT ts - ts % :step AS bucket, MIN(ts) AS first_ts, MAX(ts) AS last_ts,
+               MAX(high) AS high, MIN(low) AS low, SUM(volume) AS volume
+        FROM {src}
+        WHERE ts >= :start AND ts < :end
+        GROUP BY bucket
+    ) b
+    JOIN {src} o ON o.ts = b.first_ts
+    JOIN {src} c ON c.ts = b.last_ts
+"""
+
+def to_epoch_ms(value) -> int:
+    if isinstance(value, numbers.Real):
+        return int(value)
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert(None)
+    return int(ts.value // 1_000_000)
+
+# 舊版 timestamp 欄轉毫秒整數: 數值、數字字串 (舊 listen_and_store_kline 會寫成 '1700000000000.0')、日期字串
+LEGACY_TS_SQL = """
+    CASE
+        WHEN typeof(timestamp) IN ('integer', 'real') THEN CAST(timestamp AS INTEGER)
+        WHEN timestamp GLOB '*[0-9]*' AND timestamp NOT GLOB '*[^0-9.]*' THEN CAST(CAST(timestamp AS REAL) AS INTEGER)
+        ELSE CAST(ROUND((julianday(timestamp) - 2440587.5) * 86400000) AS INTEGER)
+    END
+"""
+
+def migrate_kline_table(conn: sqlite3.Connection, table: str) -> int:
+    # 舊版 timestamp TEXT 表原地轉成 v2；有任何一列無法轉換就中止，不刪資料
+    failed = conn.execute(f"""
+        SELECT COUNT(*) FROM {table}
+        WHERE ({LEGACY_TS_SQL}) IS NULL OR CAST(open AS REAL) IS NULL
+    """).fetchone()[0]
+    if failed:
+        raise ValueError(f"{table}: {failed} 筆 timestamp/open 無法轉換，已中止轉換 (原表未變動)")
+    tmp = f"{table}__v2"
+    with conn:
+        conn.execute(f"DROP TABLE IF EXISTS {tmp}")
+        conn.execute(KLINE_SCHEMA_V2.format(table=tmp))
+        conn.execute(f"""
+            INSERT OR REPLACE INTO {tmp} (ts, open, high, low, close, volume)
+            SELECT {LEGACY_TS_SQL} AS ts,
+                   CAST(open AS REAL), CAST(high AS REAL), CAST(low AS REAL),
+                   CAST(close AS REAL), CAST(volume AS REAL)
+            FROM {table}
+        """)
+        source = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        rows = conn.execute(f"SELECT COUNT(*) FROM {tmp}").fetchone()[0]
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute(f"ALTER TABLE {tmp} RENAME TO {table}")
+    # 筆數差異只來自換算後 ts 相同的重複列
+    print(f"已轉換 {table} 至 v2 schema: {rows} 筆" + (f" (合併 {source - rows} 筆重複 ts)" if source > rows else ""))
+    return rows
+
+def migrate_kline_tables(db_path: str = "datawarehouse/kline.db") -> Dict[str, int]:
     conn = get_db_conn(db_path)
-    c = conn.cursor()
-    c.execute(f"""
-        CREATE TABLE IF NOT EXISTS {table} (
-            timestamp TEXT PRIMARY KEY,
-            open REAL,
-            high REAL,
-            low REAL,
-            close REAL,
-            volume REAL
-        )
-    """)
-    conn.commit()
+    tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
+              if row[0].startswith("kline_") and not row[0].endswith("__v2")]
+    migrated = {}
+    for table in tables:
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        if 'timestamp' in columns:
+            try:
+                migrated[table] = migrate_kline_table(conn, table)
+            except ValueError as e:
+                # 保留原表，其它表照常轉換
+                print(e)
     conn.close()
+    return migrated
+
+class KlineStore:
+    # 長駐連線 + WAL，批次寫入在單一交易內完成；連線可跨執行緒共用 (以 lock 序列化)
+    # 讀取經過 LRU 快取 (cache_bytes=0 關閉)，本連線寫入時同步延伸或作廢；
+    # 其它行程 (或連線) 的寫入由 PRAGMA data_version 偵測，變動時整個快取作廢
+    def __init__(self, db_path: str = "datawarehouse/kline.db", cache_bytes: int = 64 * 1024 * 1024):
+        self.db_path = db_path
+        self.cache = KlineCache(cache_bytes) if cache_bytes else None
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.execute("PRAGMA cache_size=-65536")    # 64 MB page cache
+        self.conn.execute("PRAGMA mmap_size=268435456")  # 256 MB
+        self._lock = threading.RLock()
+        self._tables = set()
+        self.conn.execute(DERIVED_SCHEMA)
+        self.conn.commit()
+        # (symbol, base_interval) -> 由它物化的週期
+        self._derived: Dict[Tuple[str, str], List[str]] = {}
+        for symbol, interval, base_interval in self.conn.execute("SELECT symbol, interval, base_interval FROM derived_intervals"):
+            self._derived.setdefault((symbol, base_interval), []).append(interval)
+        self._data_version = self._read_data_version()
+
+    def _read_data_version(self) -> int:
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def enable_cache(self, cache_bytes: int = 64 * 1024 * 1024):
+        with self._lock:
+            if self.cache is None:
+                self.cache = KlineCache(cache_bytes)
+                self._data_version = self._read_data_version()
+
+    def ensure_table(self, symbol: str, interval: str) -> str:
+        table = kline_table_name(symbol, interval)
+        if table in self._tables:
+            return table
+        with self._lock:
+            columns = [row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")]
+            if 'timestamp' in columns:
+                migrate_kline_table(self.conn, table)
+            self.conn.execute(KLINE_SCHEMA_V2.format(table=table))
+            self.conn.commit()
+            self._tables.add(table)
+        return table
+
+    def insert_klines(self, symbol: str, interval: str, klines: List[Dict[str, Any]]) -> int:
+        table = self.ensure_table(symbol, interval)
+        rows = [(to_epoch_ms(k['timestamp']), float(k['open']), float(k['high']), float(k['low']), float(k['close']), float(k['volume']))
+                for k in klines]
+        with self._lock, self.conn:
+            self.conn.executemany(f"""
+                INSERT OR REPLACE INTO {table} (ts, open, high, low, close, volume)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, rows)
+        if rows and (symbol, interval) in self._derived:
+            start_ts = min(r[0] for r in rows)
+            end_ts = max(r[0] for r in rows) + interval_to_ms(interval)
+            for derived in self._derived[(symbol, interval)]:
+                self.refresh_derived(symbol, derived, start_ts, end_ts)
+        if self.cache is not None:
+            with self._lock:
+                self.cache.on_insert(symbol, interval, rows)
+        return len(rows)
+
+    def materialize(self, symbol: str, interval: str, base_interval: str = "1m") -> int:
+        # 登記後每次寫入 base_interval 都會增量更新 interval 的彙總表
+        if interval_to_ms(interval) % interval_to_ms(base_interval):
+            raise ValueError(f"{interval} is not a multiple of {base_interval}")
+        self.ensure_table(symbol, base_interval)
+        with self._lock:
+            self.conn.execute(KLINE_SCHEMA_V2.format(table=derived_table_name(symbol, interval)))
+            self.conn.execute("INSERT OR REPLACE INTO derived_intervals (symbol, interval, base_interval) VALUES (?, ?, ?)",
+                              (symbol, interval, base_interval))
+            self.conn.commit()
+            intervals = self._derived.setdefault((symbol, base_interval), [])
+            if interval not in intervals:
+                intervals.append(interval)
+        return self.refresh_derived(symbol, interval)
+
+    def refresh_derived(self, symbol: str, interval: str, start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> int:
+        # 重算與 [start_ts, end_ts) 相交的桶；未指定 start_ts 時從彙總表最後一桶接續
+        base_interval = next((base for (sym, base), intervals in self._derived.items() if sym == symbol and interval in intervals), None)
+        if base_interval is None:
+            raise ValueError(f"{symbol} {interval} is not materialized")
+        src = self.ensure_table(symbol, base_interval)
+        dst = derived_table_name(symbol, interval)
+        step = interval_to_ms(interval)
+        with self._lock, self.conn:
+            if start_ts is None:
+                start_ts = self.conn.execute(f"SELECT MAX(ts) FROM {dst}").fetchone()[0]
+                start_ts = -2**62 if start_ts is None else start_ts
+            last_ts = self.conn.execute(f"SELECT MAX(ts) FROM {src}").fetchone()[0]
+            if last_ts is None:
+                return 0
+            # 來源最後一根所在的桶若還沒走完就先不寫
+            limit = last_ts + interval_to_ms(base_interval)
+            limit -= limit % step
+            end = limit if end_ts is None else min(limit, -(-int(end_ts) // step) * step)
+            start = int(start_ts) - int(start_ts) % step
+            if start >= end:
+                return 0
+            cur = self.conn.execute(RESAMPLE_SQL.format(src=src, dst=dst), {"step": step, "start": start, "end": end})
+            return cur.rowcount
+
+    def fetch_aligned(self, symbol: str, intervals: List[str], start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+                      window: Optional[int] = None) -> pd.DataFrame:
+        # intervals[0] 為主週期，其餘週期以 ts 之前最近一根對齊 (同 merge_asof backward)，單一查詢完成
+        main = intervals[0]
+        table = self.ensure_table(symbol, main)
+        columns = ["m.ts AS timestamp", f"m.close AS close_{main}"]
+        joins = []
+        for i, interval in enumerate(intervals[1:]):
+            other = derived_table_name(symbol, interval) if interval in self._derived.get((symbol, main), []) \
+                else self.ensure_table(symbol, interval)
+            columns.append(f"d{i}.close AS close_{interval}")
+            joins.append(f"LEFT JOIN {other} d{i} ON d{i}.ts = (SELECT MAX(ts) FROM {other} WHERE ts <= m.ts)")
+        sql = f"""
+            SELECT {', '.join(columns)}
+            FROM (SELECT ts, close FROM {table} WHERE ts >= ? AND ts < ? ORDER BY ts DESC LIMIT ?) m
+            {' '.join(joins)}
+            ORDER BY m.ts
+        """
+        params = (-2**63 if start_ts is None else int(start_ts), 2**63 - 1 if end_ts is None else int(end_ts),
+                  -1 if window is None else int(window))
+        key = (symbol, main, ("aligned", tuple(intervals), start_ts, end_ts, window))
+        with self._lock:
+            return self._cached(key, lambda: pd.read_sql_query(sql, self.conn, params=params))
+
+    def _cached(self, key, load: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        # 呼叫端需持有 self._lock，避免讀到舊資料後覆蓋掉寫入時的更新
+        if self.cache is None:
+            return load()
+        version = self._read_data_version()
+        if version != self._data_version:
+            # 其它連線寫過這個檔案: 無法得知改了哪些表，全部作廢
+            self.cache.invalidate()
+            self._data_version = version
+        df = self.cache.get(key)
+        if df is None:
+            df = load()
+            self.cache.put(key, df)
+        return df
+
+    def fetch_klines(self, symbol: str, interval: str, window: int) -> pd.DataFrame:
+        table = self.ensure_table(symbol, interval)
+        def load():
+            df = pd.read_sql_query(
+                f"SELECT ts AS timestamp, open, high, low, close, volume FROM {table} ORDER BY ts DESC LIMIT ?",
+                self.conn, params=(window,))
+            return df.iloc[::-1].reset_index(drop=True)
+        with self._lock:
+            return self._cached((symbol, interval, ("window", int(window))), load)
+
+    def fetch_range(self, symbol: str, interval: str, start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+                    use_cache: bool = True) -> pd.DataFrame:
+        # [start_ts, end_ts) 毫秒，走 ts 主鍵索引；整表掃描類的一次性讀取可用 use_cache=False 避免擠掉熱資料
+        table = self.ensure_table(symbol, interval)
+        key = (symbol, interval, ("range", start_ts, end_ts))
+        params = (-2**63 if start_ts is None else int(start_ts), 2**63 - 1 if end_ts is None else int(end_ts))
+        def load():
+            return pd.read_sql_query(
+                f"SELECT ts AS timestamp, open, high, low, close, volume FROM {table} WHERE ts >= ? AND ts < ? ORDER BY ts",
+                self.conn, params=params)
+        with self._lock:
+            return self._cached(key, load) if use_cache else load()
+
+    def list_klines(self) -> List[Tuple[str, str]]:
+        # 倉庫內所有 (symbol, interval)，由表名 kline_{SYMBOL}_{interval} 還原
+        with self._lock:
+            names = [row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name LIKE 'kline%'")]
+        pairs = []
+        for name in names:
+            if not name.startswith("kline_") or name.endswith("__v2"):
+                continue
+            symbol, interval = name[len("kline_"):].rsplit('_', 1)
+            pairs.append((symbol.replace('_', '-'), interval))
+        return sorted(pairs)
+
+    @contextmanager
+    def transaction(self):
+        # 在共用連線上開一個交易並持有 lock；其它模組的 metadata 表 (如 sync_state) 也經由這裡寫入
+        with self._lock, self.conn:
+            yield self.conn
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+_stores: Dict[str, KlineStore] = {}
+_stores_lock = threading.Lock()
+
+def get_store(db_path: str = "datawarehouse/kline.db", cache_bytes: int = 64 * 1024 * 1024) -> KlineStore:
+    # 同一個 db_path 共用一個 KlineStore；第一次以 cache_bytes=0 建立時關閉快取，之後的呼叫可再開啟
+    key = os.path.abspath(db_path)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = KlineStore(db_path, cache_bytes)
+        elif cache_bytes:
+            _stores[key].enable_cache(cache_bytes)
+        return _stores[key]
+
+def listen_and_store_kline(symbol: str, interval: str, market_type: str = "futures", db_path: str = "datawarehouse/kline.db"):
+    # 以 websocket 收 confirmed K 線寫入，斷線後自動補抓缺口；多組訂閱請直接用 KlineRecorder
+    from datawarehouse.recorder import KlineRecorder
+    KlineRecorder([(symbol, interval)], market_type=market_type, db_path=db_path).run_forever()
+
+def create_kline_table(symbol: str, interval: str, db_path: str = "datawarehouse/kline.db"):
+    get_store(db_path).ensure_table(symbol, interval)
 
 def insert_kline(symbol: str, interval: str, kline: Dict[str, Any], db_path: str = "datawarehouse/kline.db"):
-    table = f"kline_{symbol.replace('-', '_')}_{interval}"
-    create_kline_table(symbol, interval, db_path)
-    conn = get_db_conn(db_path)
-    c = conn.cursor()
-    c.execute(f"""
-        INSERT OR REPLACE INTO {table} (timestamp, open, high, low, close, volume)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (
-        kline['timestamp'], kline['open'], kline['high'], kline['low'], kline['close'], kline['volume']
-    ))
-    conn.commit()
-    conn.close()
+    get_store(db_path).insert_klines(symbol, interval, [kline])
+
+def insert_klines(symbol: str, interval: str, klines: List[Dict[str, Any]], db_path: str = "datawarehouse/kline.db"):
+    get_store(db_path).insert_klines(symbol, interval, klines)
+
+def backfill_klines(symbol: str, interval: str, start_time, end_time, exchange: str = "okx", market_type: str = "futures",
+                    max_workers: int = 8, progress: Optional[Callable[[int, int, int], None]] = None,
+                    db_path: str = "datawarehouse/kline.db") -> int:
+    # 多執行緒分頁下載指定區間後一次寫入
+    if exchange == "okx":
+        fetcher = OKXKlineFetcher(market_type=market_type)
+    elif exchange == "binance":
+        fetcher = BinanceKlineFetcher(market_type=market_type)
+    else:
+        raise ValueError(f"Unsupported exchange: {exchange}")
+    klines = KlineDownloader(fetcher, max_workers=max_workers).download(symbol, interval, start_time, end_time, progress=progress)
+    if klines:
+        insert_klines(symbol, interval, klines, db_path)
+    print(f"已寫入 {len(klines)} 根K線: {symbol} {interval}")
+    return len(klines)
 
 def fetch_klines_from_db(symbol: str, interval: str, window: int, db_path: str = "datawarehouse/kline.db") -> pd.DataFrame:
-    table = f"kline_{symbol.replace('-', '_')}_{interval}"
-    create_kline_table(symbol, interval, db_path)
-    conn = get_db_conn(db_path)
-    df = pd.read_sql_query(f"SELECT * FROM {table} ORDER BY timestamp DESC LIMIT ?", conn, params=(window,))
-    conn.close()
-    df = df.sort_values('timestamp').reset_index(drop=True)
-    return df
+    return get_store(db_path).fetch_klines(symbol, interval, window)
+
+def fetch_klines_range_from_db(symbol: str, interval: str, start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+                               db_path: str = "datawarehouse/kline.db") -> pd.DataFrame:
+    return get_store(db_path).fetch_range(symbol, interval, start_ts, end_ts)
+
+def kline_cache_stats(db_path: str = "datawarehouse/kline.db") -> dict:
+    store = get_store(db_path)
+    return store.cache.stats() if store.cache is not None else {}
+
+def materialize_interval(symbol: str, interval: str, base_interval: str = "1m", db_path: str = "datawarehouse/kline.db") -> int:
+    return get_store(db_path).materialize(symbol, interval, base_interval)
+
+def fetch_aligned_klines_from_db(symbol: str, intervals: list, start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+                                 window: Optional[int] = None, db_path: str = "datawarehouse/kline.db") -> pd.DataFrame:
+    return get_store(db_path).fetch_aligned(symbol, intervals, start_ts, end_ts, window)
 
 def fetch_multi_interval_closes_from_db(symbol: str, intervals: list, window: int, db_path: str = "datawarehouse/kline.db") -> pd.DataFrame:
+    store = get_store(db_path)
+    if all(interval in store._derived.get((symbol, intervals[0]), []) for interval in intervals[1:]):
+        return store.fetch_aligned(symbol, intervals, window=window)
     dfs = {}
     for interval in intervals:
-        df = fetch_klines_from_db(symbol, interval, window)
+        df = fetch_klines_from_db(symbol, interval, window, db_path)
         df = df[["timestamp", "close"]].copy()
         df = df.rename(columns={"close": f"close_{interval}"})
         dfs[interval] = df
@@ -98,5 +391,9 @@ def fetch_multi_interval_closes_from_db(symbol: str, intervals: list, window: in
     return result
 
 if __name__ == "__main__":
-    df = fetch_klines_from_db('BTC-USDT', '1m', 10)
-    print(df)
+    if len(sys.argv) > 1 and sys.argv[1] == "migrate":
+        # python datawarehouse/kline_db.py migrate [db_path]
+        print(migrate_kline_tables(*sys.argv[2:3]))
+    else:
+        df = fetch_klines_from_db('BTC-USDT', '1m', 10)
+        print(df)
@@ -0,0 +1,118 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import threading
+import pandas as pd
+from typing import Any, Dict, List, Optional, Union
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency: pip install "live-trade[parquet]"
+    pa = None
+    pq = None
+
+COLUMNS = ["ts", "open", "high", "low", "close", "volume"]
+
+
+class ParquetKlineStore:
+    # 欄式 K 線倉庫: {root}/{symbol}/{interval}/{YYYY-MM}.parquet，ts 為 int64 毫秒
+    def __init__(self, root: str = "datawarehouse/parquet", row_group_size: int = 10_000):
+        if pa is None:
+            raise ImportError("ParquetKlineStore requires pyarrow: pip install pyarrow")
+        self.root = root
+        self.row_group_size = row_group_size
+        self.schema = pa.schema([
+            ("ts", pa.int64()),
+            ("open", pa.float64()),
+            ("high", pa.float64()),
+            ("low", pa.float64()),
+            ("close", pa.float64()),
+            ("volume", pa.float64()),
+        ])
+        self._lock = threading.Lock()
+
+    def _dir(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.root, symbol.replace('-', '_'), interval)
+
+    def months(self, symbol: str, interval: str) -> List[str]:
+        path = self._dir(symbol, interval)
+        if not os.path.isdir(path):
+            return []
+        return sorted(f[:-len(".parquet")] for f in os.listdir(path) if f.endswith(".parquet"))
+
+    def write_klines(self, symbol: str, interval: str, klines: Union[List[Dict[str, Any]], pd.DataFrame]) -> int:
+        df = klines.copy() if isinstance(klines, pd.DataFrame) else pd.DataFrame(klines)
+        if df.empty:
+            return 0
+        if "ts" not in df:
+            df = df.rename(columns={"timestamp": "ts"})
+        if not pd.api.types.is_integer_dtype(df["ts"]):
+            ts = df["ts"]
+            if pd.api.types.is_datetime64_any_dtype(ts):
+                df["ts"] = ts.astype("int64") // 1_000_000 if ts.dt.tz is None else ts.dt.tz_convert(None).astype("int64") // 1_000_000
+            else:
+                df["ts"] = pd.to_numeric(ts).astype("int64")
+        df = df[COLUMNS]
+        dt = pd.to_datetime(df["ts"], unit="ms")
+        month = dt.dt.year * 100 + dt.dt.month
+
+        path = self._dir(symbol, interval)
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            for m, part in df.groupby(month):
+                file = os.path.join(path, f"{m // 100:04d}-{m % 100:02d}.parquet")
+                if os.path.exists(file):
+                    part = pd.concat([pq.read_table(file).to_pandas(), part], ignore_index=True)
+                # 新資料覆蓋舊資料，同一 ts 只保留一筆
+                part = part.drop_duplicates("ts", keep="last").sort_values("ts")
+                table = pa.Table.from_pandas(part, schema=self.schema, preserve_index=False)
+                tmp = file + ".tmp"
+                pq.write_table(table, tmp, row_group_size=self.row_group_size)
+                os.replace(tmp, file)
+        return len(df)
+
+    def read_range(self, symbol: str, interval: str, start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> pd.DataFrame:
+        # 先依月份檔名剪枝，再以 row group 統計下推 ts 範圍
+        start_month = pd.to_datetime(start_ts, unit="ms").strftime("%Y-%m") if start_ts is not None else None
+        end_month = pd.to_datetime(end_ts, unit="ms").strftime("%Y-%m") if end_ts is not None else None
+        filters = []
+        if start_ts is not None:
+            filters.append(("ts", ">=", int(start_ts)))
+        if end_ts is not None:
+            filters.append(("ts", "<", int(end_ts)))
+
+        tables = []
+        for m in self.months(symbol, interval):
+            if (start_month and m < start_month) or (end_month and m > end_month):
+                continue
+            file = os.path.join(self._dir(symbol, interval), f"{m}.parquet")
+            tables.append(pq.read_table(file, filters=filters or None))
+        if not tables:
+            return pd.DataFrame(columns=["timestamp"] + COLUMNS[1:])
+        df = pa.concat_tables(tables).to_pandas()
+        return df.rename(columns={"ts": "timestamp"}).reset_index(drop=True)
+
+    def fetch_klines(self, symbol: str, interval: str, window: int) -> pd.DataFrame:
+        # 與 fetch_klines_from_db 相同: 最新 window 根，依時間由舊到新
+        tables = []
+        rows = 0
+        for m in reversed(self.months(symbol, interval)):
+            table = pq.read_table(os.path.join(self._dir(symbol, interval), f"{m}.parquet"))
+            tables.append(table)
+            rows += table.num_rows
+            if rows >= window:
+                break
+        if not tables:
+            return pd.DataFrame(columns=["timestamp"] + COLUMNS[1:])
+        df = pa.concat_tables(list(reversed(tables))).to_pandas().tail(window)
+        return df.rename(columns={"ts": "timestamp"}).reset_index(drop=True)
+
+    def import_from_sqlite(self, symbol: str, interval: str, db_path: str = "datawarehouse/kline.db") -> int:
+        from datawarehouse.kline_db import get_store
+        df = get_store(db_path).fetch_range(symbol, interval)
+        return self.write_klines(symbol, interval, df)
+
+
+def fetch_klines_from_parquet(symbol: str, interval: str, window: int, root: str = "datawarehouse/parquet") -> pd.DataFrame:
+    return ParquetKlineStore(root).fetch_klines(symbol, interval, window)
@@ -0,0 +1,158 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional, Tuple
+from connector.kline_downloader import interval_to_ms
+from datawarehouse.kline_db import get_store
+
+
+def _timestamps_ms(ts: pd.Series) -> np.ndarray:
+    # 支援毫秒整數、datetime 與日期字串 (CSV)
+    if pd.api.types.is_integer_dtype(ts) or pd.api.types.is_float_dtype(ts):
+        return ts.to_numpy(dtype="int64")
+    dt = pd.to_datetime(ts, utc=True)
+    return dt.dt.tz_convert(None).to_numpy(dtype="datetime64[ms]").astype("int64")
+
+
+def _merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def scan_klines(df: pd.DataFrame, interval: str, outlier_z: float = 10.0) -> Dict[str, Any]:
+    # 向量化檢查一段K線 (欄位 timestamp/open/high/low/close/volume，依存放順序)
+    # 回傳各類問題的毫秒時間戳；gaps 為缺少的 [start, end) 區間
+    step = interval_to_ms(interval)
+    n = len(df)
+    report: Dict[str, Any] = {
+        "interval": interval,
+        "rows": n,
+        "first_ts": None,
+        "last_ts": None,
+        "missing_bars": 0,
+        "gaps": [],
+        "misaligned": np.empty(0, dtype="int64"),
+        "duplicates": np.empty(0, dtype="int64"),
+        "out_of_order": np.empty(0, dtype="int64"),
+        "ohlc_invalid": np.empty(0, dtype="int64"),
+        "zero_volume": np.empty(0, dtype="int64"),
+        "outliers": np.empty(0, dtype="int64"),
+    }
+    if n == 0:
+        return report
+
+    ts = _timestamps_ms(df["timestamp"])
+    o = df["open"].to_numpy(dtype="float64")
+    h = df["high"].to_numpy(dtype="float64")
+    l = df["low"].to_numpy(dtype="float64")
+    c = df["close"].to_numpy(dtype="float64")
+    v = df["volume"].to_numpy(dtype="float64")
+
+    # 依存放順序: 時間倒退或重複
+    diff = np.diff(ts)
+    report["out_of_order"] = ts[1:][diff < 0]
+    uniq, counts = np.unique(ts, return_counts=True)
+    report["duplicates"] = uniq[counts > 1]
+    report["misaligned"] = uniq[uniq % step != 0]
+
+    # 缺口以排序去重後的時間軸計算
+    report["first_ts"] = int(uniq[0])
+    report["last_ts"] = int(uniq[-1])
+    steps = np.diff(uniq)
+    idx = np.nonzero(steps > step)[0]
+    report["missing_bars"] = int(((steps[idx] - 1) // step).sum()) if len(idx) else 0
+    report["gaps"] = [(int(uniq[i]) + step, int(uniq[i + 1])) for i in idx]
+
+    with np.errstate(invalid="ignore"):
+        invalid = (
+            ~np.isfinite(o) | ~np.isfinite(h) | ~np.isfinite(l) | ~np.isfinite(c) | ~np.isfinite(v)
+            | (l <= 0) | (h < l) | (h < np.maximum(o, c)) | (l > np.minimum(o, c)) | (v < 0)
+        )
+    report["ohlc_invalid"] = ts[invalid]
+    report["zero_volume"] = ts[v == 0]
+
+    # 以 log 報酬的 MAD 穩健 z 分數找跳價 (K線內 high/low 振幅亦同)
+    order = np.argsort(ts, kind="stable")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ret = np.diff(np.log(c[order]), prepend=np.nan)
+        rng = np.log(h[order] / l[order])
+    flagged = np.zeros(n, dtype=bool)
+    for x in (ret, rng):
+        finite = np.isfinite(x)
+        if finite.sum() < 3:
+            continue
+        med = np.median(x[finite])
+        mad = np.median(np.abs(x[finite] - med)) * 1.4826
+        if mad > 0:
+            with np.errstate(invalid="ignore"):
+                flagged |= np.abs(x - med) / mad > outlier_z
+    report["outliers"] = ts[order][flagged]
+    return report
+
+
+def refetch_ranges(report: Dict[str, Any], include_bad_bars: bool = True) -> List[Tuple[int, int]]:
+    # 需要重抓的 [start, end) 區間: 缺口，加上 OHLC 異常 / 跳價的單根
+    step = interval_to_ms(report["interval"])
+    ranges = list(report["gaps"])
+    if include_bad_bars:
+        bad = np.union1d(report["ohlc_invalid"], report["outliers"])
+        ranges += [(int(t), int(t) + step) for t in bad]
+    return _merge_ranges(ranges)
+
+
+def scan_store(symbol: str, interval: str, start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+               outlier_z: float = 10.0, db_path: str = "datawarehouse/kline.db") -> Dict[str, Any]:
+    df = get_store(db_path).fetch_range(symbol, interval, start_ts, end_ts, use_cache=False)
+    report = scan_klines(df, interval, outlier_z)
+    report["symbol"] = symbol
+    return report
+
+
+def scan_csv(csv_path: str, interval: str, outlier_z: float = 10.0) -> Dict[str, Any]:
+    # 回測用 CSV (get_backtest_data 匯出格式)，不排序，保留原始順序以檢查亂序
+    df = pd.read_csv(csv_path)
+    if "timestamp" not in df and "ts" in df:
+        df = df.rename(columns={"ts": "timestamp"})
+    report = scan_klines(df, interval, outlier_z)
+    report["symbol"] = os.path.basename(csv_path)
+    return report
+
+
+def scan_warehouse(db_path: str = "datawarehouse/kline.db", intervals: Optional[List[str]] = None,
+                   outlier_z: float = 10.0) -> List[Dict[str, Any]]:
+    reports = []
+    for symbol, interval in get_store(db_path).list_klines():
+        if intervals is not None and interval not in intervals:
+            continue
+        reports.append(scan_store(symbol, interval, outlier_z=outlier_z, db_path=db_path))
+    return reports
+
+
+def feed_sync(reports: List[Dict[str, Any]], sync, include_bad_bars: bool = True) -> int:
+    # 把掃描結果交給 KlineSync，下次 sync 時補抓
+    total = 0
+    for report in reports:
+        ranges = refetch_ranges(report, include_bad_bars)
+        if ranges:
+            sync.add_gaps(report["symbol"], report["interval"], ranges)
+            total += len(ranges)
+    return total
+
+
+def summarize(report: Dict[str, Any]) -> str:
+    return (f"{report.get('symbol')} {report['interval']}: {report['rows']} 根, 缺 {report['missing_bars']} 根 "
+            f"({len(report['gaps'])} 段), 重複 {len(report['duplicates'])}, 亂序 {len(report['out_of_order'])}, "
+            f"未對齊 {len(report['misaligned'])}, OHLC異常 {len(report['ohlc_invalid'])}, "
+            f"零量 {len(report['zero_volume'])}, 跳價 {len(report['outliers'])}")
+
+
+if __name__ == "__main__":
+    for r in scan_warehouse():
+        print(summarize(r))
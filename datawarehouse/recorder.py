@@ -0,0 +1,171 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import threading
+import time
+from queue import Queue, Empty
+from typing import Dict, List, Optional, Tuple
+from connector.okx_kline import OKXKlineFetcher
+from connector.kline_downloader import KlineDownloader, interval_to_ms
+from connector.ws_supervisor import SupervisedWebSocket
+from connector.okx_ws_manager import BUSINESS_URL
+from connector.ws_decode import route_key, is_event, decode_candles
+from datawarehouse.kline_db import get_store
+
+
+class KlineRecorder:
+    # 一條 business websocket 訂閱多組 (symbol, interval) 的 confirmed K 線，批次寫入 KlineStore；
+    # 發現缺口 (斷線重連、跳根) 時交給獨立的補抓執行緒以 REST 分頁補抓，不卡住即時K線寫入
+    def __init__(self, subscriptions: List[Tuple[str, str]], market_type: str = "futures",
+                 db_path: str = "datawarehouse/kline.db", flush_interval: float = 1.0,
+                 reconnect_delay: float = 1.0, max_reconnect_delay: float = 60.0,
+                 ws_url: str = None):
+        self.subscriptions = [(symbol.replace('_', '-').upper(), interval) for symbol, interval in subscriptions]
+        self.market_type = market_type
+        self.ws_url = ws_url = ws_url or os.getenv("OKX_WS_BUSINESS_URL") or BUSINESS_URL
+        self.flush_interval = flush_interval
+        self.store = get_store(db_path)
+        self.downloader = KlineDownloader(OKXKlineFetcher(market_type=market_type), max_workers=4)
+
+        # (instId, channel) -> (symbol, interval)
+        self._routes = {(self._inst_id(symbol), f"candle{interval}"): (symbol, interval)
+                        for symbol, interval in self.subscriptions}
+        self._last_ts: Dict[Tuple[str, str], Optional[int]] = {}
+        for symbol, interval in self.subscriptions:
+            df = self.store.fetch_klines(symbol, interval, 1)
+            self._last_ts[(symbol, interval)] = int(df['timestamp'].iloc[-1]) if len(df) else None
+
+        self._pending: Dict[Tuple[str, str], List[dict]] = {}
+        self._gaps: Queue = Queue()  # (symbol, interval, start_ms, end_ms)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._conn = SupervisedWebSocket(ws_url, on_open=self._on_open, on_message=self._on_message, name="RECORDER",
+                                         reconnect_delay=reconnect_delay, max_reconnect_delay=max_reconnect_delay)
+        self._writer = None
+        self._backfiller = None
+        self.written = 0
+
+    def _inst_id(self, symbol: str) -> str:
+        return symbol if self.market_type == "spot" else f"{symbol}-SWAP"
+
+    def _on_open(self, conn: SupervisedWebSocket):
+        sub = {
+            "op": "subscribe",
+            "args": [{"channel": f"candle{interval}", "instId": self._inst_id(symbol)}
+                     for symbol, interval in self.subscriptions]
+        }
+        conn.send(json.dumps(sub))
+        print(f"[RECORDER] 訂閱 {len(self.subscriptions)} 組K線")
+        # (重新) 連線後補齊斷線期間已收盤的K線；最後一根留給 websocket，
+        # 並把 last_ts 推進到補抓範圍尾端，_on_message 就不會再對同一段排一次
+        now = int(time.time() * 1000)
+        with self._lock:
+            for key, last_ts in self._last_ts.items():
+                if last_ts is None:
+                    continue
+                step = interval_to_ms(key[1])
+                end = now - now % step - step
+                if last_ts + step < end:
+                    self._gaps.put((key[0], key[1], last_ts + step, end))
+                    self._last_ts[key] = end - step
+
+    def _on_message(self, message):
+        route = route_key(message)
+        if route is None:
+            if is_event(message) and '"error"' in message:
+                print(f"[RECORDER] Error: {message}")
+            return
+        key = self._routes.get((route[1], route[0]))
+        if key is None:
+            return
+
+        step = interval_to_ms(key[1])
+        with self._lock:
+            for k in decode_candles(message):
+                if k[8] != '1':
+                    continue
+                ts = int(k[0])
+                last_ts = self._last_ts.get(key)
+                if last_ts is not None:
+                    if ts <= last_ts:
+                        continue
+                    if ts > last_ts + step:
+                        self._gaps.put((key[0], key[1], last_ts + step, ts))
+                self._last_ts[key] = ts
+                self._pending.setdefault(key, []).append({
+                    'timestamp': ts,
+                    'open': float(k[1]),
+                    'high': float(k[2]),
+                    'low': float(k[3]),
+                    'close': float(k[4]),
+                    'volume': float(k[5]),
+                })
+
+    def flush(self) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        total = 0
+        for (symbol, interval), rows in pending.items():
+            total += self.store.insert_klines(symbol, interval, rows)
+        with self._lock:
+            self.written += total
+        return total
+
+    def backfill(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> int:
+        rows = self.downloader.download(symbol, interval, start_ms, end_ms)
+        total = self.store.insert_klines(symbol, interval, rows) if rows else 0
+        print(f"[RECORDER] 補抓 {symbol} {interval}: {len(rows)} 根")
+        with self._lock:
+            self.written += total
+        return total
+
+    def _run_writer(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    def _run_backfiller(self):
+        while not self._stop.is_set():
+            try:
+                gap = self._gaps.get(timeout=0.5)
+            except Empty:
+                continue
+            try:
+                self.backfill(*gap)
+            except Exception as e:
+                print(f"[RECORDER] 補抓失敗 {gap[0]} {gap[1]} [{gap[2]}, {gap[3]}): {e}")
+                # 稍後重試；停止時仍未補完的缺口需另外用 KlineSync.add_gaps 補
+                if not self._stop.wait(5):
+                    self._gaps.put(gap)
+
+    def start(self):
+        self._stop.clear()
+        self._conn.start()
+        self._writer = threading.Thread(target=self._run_writer, daemon=True)
+        self._writer.start()
+        self._backfiller = threading.Thread(target=self._run_backfiller, daemon=True)
+        self._backfiller.start()
+
+    def stop(self):
+        self._stop.set()
+        self._conn.stop()
+        if self._writer:
+            self._writer.join()
+        if self._backfiller:
+            self._backfiller.join()
+
+    def is_stale(self, max_age: float = 60.0) -> bool:
+        return self._conn.is_stale(max_age)
+
+    def run_forever(self):
+        self.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.stop()
+
+
+if __name__ == "__main__":
+    KlineRecorder([("BTC-USDT", "1m"), ("BTC-USDT", "15m"), ("ETH-USDT", "1m")]).run_forever()
@@ -0,0 +1,154 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+from connector.okx_kline import OKXKlineFetcher
+from connector.binance_kline import BinanceKlineFetcher
+from connector.kline_downloader import KlineDownloader, interval_to_ms
+from datawarehouse.kline_db import get_store
+
+# 每個 (exchange, symbol, interval) 記錄已同步範圍 [first_ts, last_ts] 與已知缺口 [start_ts, end_ts)
+SYNC_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sync_state (
+        exchange TEXT,
+        symbol TEXT,
+        interval TEXT,
+        first_ts INTEGER,
+        last_ts INTEGER,
+        updated_at INTEGER,
+        PRIMARY KEY (exchange, symbol, interval)
+    );
+    CREATE TABLE IF NOT EXISTS sync_gaps (
+        exchange TEXT,
+        symbol TEXT,
+        interval TEXT,
+        start_ts INTEGER,
+        end_ts INTEGER,
+        PRIMARY KEY (exchange, symbol, interval, start_ts)
+    );
+"""
+
+
+class KlineSync:
+    def __init__(self, exchange: str = "okx", market_type: str = "futures", db_path: str = "datawarehouse/kline.db",
+                 max_workers: int = 8, chunk_pages: int = 50):
+        if exchange == "okx":
+            fetcher = OKXKlineFetcher(market_type=market_type)
+        elif exchange == "binance":
+            fetcher = BinanceKlineFetcher(market_type=market_type)
+        else:
+            raise ValueError(f"Unsupported exchange: {exchange}")
+        self.exchange = exchange
+        self.db_path = db_path
+        self.downloader = KlineDownloader(fetcher, max_workers=max_workers)
+        # 每批下載多少頁後寫入並記錄進度，中斷後最多重抓一批
+        self.chunk_pages = chunk_pages
+        # 所有讀寫都經過同一個 KlineStore (單一連線 + lock)，多執行緒 sync 時只有下載是平行的
+        self.store = get_store(db_path)
+        with self.store.transaction() as conn:
+            for stmt in SYNC_SCHEMA.split(";"):
+                if stmt.strip():
+                    conn.execute(stmt)
+
+    def get_state(self, symbol: str, interval: str) -> Optional[Tuple[int, int]]:
+        with self.store.transaction() as conn:
+            return conn.execute(
+                "SELECT first_ts, last_ts FROM sync_state WHERE exchange=? AND symbol=? AND interval=?",
+                (self.exchange, symbol, interval)).fetchone()
+
+    def get_gaps(self, symbol: str, interval: str) -> List[Tuple[int, int]]:
+        with self.store.transaction() as conn:
+            return conn.execute(
+                "SELECT start_ts, end_ts FROM sync_gaps WHERE exchange=? AND symbol=? AND interval=? ORDER BY start_ts",
+                (self.exchange, symbol, interval)).fetchall()
+
+    def add_gaps(self, symbol: str, interval: str, gaps: List[Tuple[int, int]]):
+        # 外部 (例如資料品質掃描) 回報的缺口，下次 sync 會補抓
+        with self.store.transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO sync_gaps (exchange, symbol, interval, start_ts, end_ts) VALUES (?, ?, ?, ?, ?)",
+                [(self.exchange, symbol, interval, int(s), int(e)) for s, e in gaps if e > s])
+
+    def missing_ranges(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> List[Tuple[int, int, str]]:
+        # (start, end, kind): kind 為 head / gap / tail，決定寫入後如何更新進度
+        state = self.get_state(symbol, interval)
+        if state is None:
+            return [(start_ms, end_ms, "tail")]
+        first_ts, last_ts = state
+        step = interval_to_ms(interval)
+        ranges = []
+        if start_ms < first_ts:
+            ranges.append((start_ms, first_ts, "head"))
+        for s, e in self.get_gaps(symbol, interval):
+            if e > start_ms and s < end_ms:
+                ranges.append((s, e, "gap"))
+        if last_ts + step < end_ms:
+            ranges.append((last_ts + step, end_ms, "tail"))
+        return ranges
+
+    def _record(self, symbol: str, interval: str, kind: str, range_start: int, chunk_start: int, chunk_end: int, range_end: int):
+        step = interval_to_ms(interval)
+        now = int(time.time() * 1000)
+        with self.store.transaction() as conn:
+            state = conn.execute(
+                "SELECT first_ts, last_ts FROM sync_state WHERE exchange=? AND symbol=? AND interval=?",
+                (self.exchange, symbol, interval)).fetchone()
+            if state is None:
+                first_ts, last_ts = chunk_start, chunk_end - step
+            else:
+                first_ts, last_ts = state
+                if kind == "tail":
+                    last_ts = max(last_ts, chunk_end - step)
+                elif kind == "head":
+                    first_ts = min(first_ts, chunk_start)
+            conn.execute(
+                "INSERT OR REPLACE INTO sync_state (exchange, symbol, interval, first_ts, last_ts, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (self.exchange, symbol, interval, first_ts, last_ts, now))
+            if kind == "gap":
+                # 缺口縮成尚未補完的剩餘部分
+                conn.execute(
+                    "DELETE FROM sync_gaps WHERE exchange=? AND symbol=? AND interval=? AND start_ts=?",
+                    (self.exchange, symbol, interval, range_start))
+                if chunk_end < range_end:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO sync_gaps (exchange, symbol, interval, start_ts, end_ts) VALUES (?, ?, ?, ?, ?)",
+                        (self.exchange, symbol, interval, chunk_end, range_end))
+
+    def sync(self, symbol: str, interval: str, lookback_days: float = 360, end_time: Optional[int] = None) -> int:
+        step = interval_to_ms(interval)
+        end_ms = end_time if end_time is not None else int(time.time() * 1000)
+        end_ms -= end_ms % step  # 不抓尚未收盤的K線
+        start_ms = end_ms - int(lookback_days * 24 * 60 * 60 * 1000)
+
+        chunk_ms = self.chunk_pages * self.downloader.fetcher.PAGE_LIMIT * step
+        total = 0
+        for range_start, range_end, kind in self.missing_ranges(symbol, interval, start_ms, end_ms):
+            # head 由新往舊補，其它由舊往新，確保中斷時已記錄的範圍是連續的
+            chunks = []
+            cursor = range_start
+            while cursor < range_end:
+                chunks.append((cursor, min(cursor + chunk_ms, range_end)))
+                cursor += chunk_ms
+            if kind == "head":
+                chunks.reverse()
+            for chunk_start, chunk_end in chunks:
+                klines = self.downloader.download(symbol, interval, chunk_start, chunk_end)
+                if klines:
+                    self.store.insert_klines(symbol, interval, klines)
+                self._record(symbol, interval, kind, range_start, chunk_start, chunk_end, range_end)
+                if kind == "gap":
+                    range_start = chunk_end
+                total += len(klines)
+        print(f"[SYNC] {self.exchange} {symbol} {interval}: 新增 {total} 根K線")
+        return total
+
+    def sync_many(self, symbols: List[str], intervals: List[str], lookback_days: float = 360, max_symbols: int = 4) -> int:
+        jobs = [(symbol, interval) for symbol in symbols for interval in intervals]
+        with ThreadPoolExecutor(max_workers=max_symbols) as pool:
+            return sum(pool.map(lambda job: self.sync(job[0], job[1], lookback_days), jobs))
+
+
+if __name__ == "__main__":
+    KlineSync().sync("BTC-USDT", "1m", lookback_days=1)
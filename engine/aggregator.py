@@ -0,0 +1,71 @@
+from connector.kline_downloader import interval_to_ms
+
+
+class KlineAggregator:
+    """
+    Incrementally build higher-timeframe bars from confirmed base (1m) bars.
+
+    Bars are bucketed by floored epoch timestamp (ts - ts % interval_ms), so a
+    missing base bar never shifts later buckets. A bucket is emitted as soon as
+    its last base bar arrives, or when a bar from a later bucket shows up.
+    """
+
+    def __init__(self, intervals: list, base_interval: str = "1m"):
+        self.base_interval = base_interval
+        self.base_ms = interval_to_ms(base_interval)
+        self.intervals = {iv: interval_to_ms(iv) for iv in intervals}
+        for iv, ms in self.intervals.items():
+            if ms % self.base_ms != 0:
+                raise ValueError(f"{iv} is not a multiple of {base_interval}")
+        self._current = {iv: None for iv in self.intervals}
+        self._last_ts = None
+
+    def update(self, bar: dict) -> list:
+        """Feed one confirmed base bar; return the higher-timeframe bars it closed."""
+        ts = int(bar["ts"])
+        # duplicates / out-of-order pushes (e.g. REST seed overlapping the websocket)
+        if self._last_ts is not None and ts <= self._last_ts:
+            return []
+        self._last_ts = ts
+
+        closed = []
+        for iv, ms in self.intervals.items():
+            bucket = ts - ts % ms
+            cur = self._current[iv]
+            if cur is not None and cur["ts"] != bucket:
+                # gap: the previous bucket never got its last base bar
+                closed.append(cur)
+                cur = None
+            if cur is None:
+                cur = {
+                    "ts": bucket,
+                    "open": float(bar["open"]),
+                    "high": float(bar["high"]),
+                    "low": float(bar["low"]),
+                    "close": float(bar["close"]),
+                    "volume": float(bar.get("volume", 0)),
+                    "interval": iv,
+                }
+            else:
+                cur["high"] = max(cur["high"], float(bar["high"]))
+                cur["low"] = min(cur["low"], float(bar["low"]))
+                cur["close"] = float(bar["close"])
+                cur["volume"] += float(bar.get("volume", 0))
+
+            if ts + self.base_ms >= bucket + ms:
+                closed.append(cur)
+                cur = None
+            self._current[iv] = cur
+        return closed
+
+    def seed(self, bars: list) -> list:
+        """Replay historical base bars to rebuild the in-progress buckets; returns the bars they closed."""
+        closed = []
+        for bar in sorted(bars, key=lambda b: int(b["ts"])):
+            closed.extend(self.update(bar))
+        return closed
+
+    def bucket_start(self, ts: int) -> int:
+        """Start of the largest configured bucket containing ts."""
+        ms = max(self.intervals.values())
+        return ts - ts % ms
@@ -1,15 +1,57 @@
+import numpy as np
 import pandas as pd
-from typing import Any, Dict
+from typing import Any, Dict, List, Tuple
 from engine.backtest.rms import RiskManager
+from connector.kline_downloader import interval_to_ms
+from engine.online.logging import get_event_log, EventType
 import matplotlib.pyplot as plt
 
+def bucket_bars(df_1m: pd.DataFrame, interval: str) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+    # 以 floor(ts / interval) 分桶一次算好所有高週期K線；bar_at[i] 為處理第 i 根 1m 時要送出到哪一根K線為止 (沒有則為 -1)
+    # 與 KlineAggregator 相同: 完整的桶在它最後一分鐘送出，缺尾巴的桶等下一個桶的第一根出現才送出；
+    # 同一根 1m 可能同時送出兩根 (缺口桶 + 自己收完的桶)，呼叫端需補送 bar_at 之前未送的K線
+    step = interval_to_ms(interval) * 1_000_000
+    src = pd.to_datetime(df_1m['timestamp'])
+    tz = src.dt.tz
+    # 以 UTC ns 分桶；產生的K線時間沿用輸入的時區，才能與 resample 出的初始K線比對
+    ts = (src.dt.tz_convert(None) if tz is not None else src).to_numpy(dtype='datetime64[ns]').astype('int64')
+    bucket = ts // step
+    last = np.flatnonzero(np.append(bucket[1:] != bucket[:-1], True))
+    complete = (ts[last] + interval_to_ms("1m") * 1_000_000) % step == 0
+    emit_at = np.where(complete, last, last + 1)
+    # 資料最後一個桶沒走完就不送
+    emitted = emit_at < len(ts)
+
+    bars = df_1m[['open', 'high', 'low', 'close', 'volume']].groupby(bucket).agg({
+        'open': 'first',
+        'high': 'max',
+        'low': 'min',
+        'close': 'last',
+        'volume': 'sum'
+    })
+    stamps = pd.to_datetime(bars.index.to_numpy() * step, utc=tz is not None)
+    bars.insert(0, 'timestamp', stamps.tz_convert(tz) if tz is not None else stamps)
+    bar_at = np.full(len(ts), -1)
+    np.maximum.at(bar_at, emit_at[emitted], np.flatnonzero(emitted))
+    return bars.to_dict('records'), bar_at
+
+def _append_bars(df: pd.DataFrame, bars: List[Dict[str, Any]], limit: int = 100) -> pd.DataFrame:
+    for bar in bars:
+        # 初始 resample 的最後一根可能是未收完的同一桶，收完後取代它
+        if df['timestamp'].iloc[-1] == bar['timestamp']:
+            df = df.iloc[:-1]
+        df = pd.concat([df, pd.DataFrame([bar])], ignore_index=True)
+    return df.iloc[-limit:].reset_index(drop=True)
+
 class Strategy:
     def generate_signals(self, *dfs: pd.DataFrame) -> pd.Series:
         raise NotImplementedError
 
 class Backtester:
-    def __init__(self, df_1m: pd.DataFrame, strategy: Strategy, fee: float = 0.0005):
+    def __init__(self, df_1m: pd.DataFrame, strategy: Strategy, fee: float = 0.0005, event_log=None):
         self.df_1m = df_1m.copy()
+        # 交易事件交給背景執行緒寫 logs/backtest.jsonl，不拖慢回測迴圈
+        self.events = event_log or get_event_log("backtest")
         self.strategy = strategy
         self.fee = fee
         self.results = None
@@ -43,8 +85,11 @@ class Backtester:
         signal_df_15m = df_15m
         current_signal = self.strategy.generate_signals(signal_df_15m, df_1h)
 
-        current_15m_data = []
-        current_1h_data = []
+        bars_15m, bar_15m_at = bucket_bars(df_1m, "15m")
+        bars_1h, bar_1h_at = bucket_bars(df_1m, "1h")
+        # 已送出的最後一根 (前 6000 根已由初始 resample 涵蓋)
+        sent_15m = bar_15m_at[:6000].max()
+        sent_1h = bar_1h_at[:6000].max()
 
         current_idx = 6000
         current_position = 0
@@ -64,42 +109,20 @@ class Backtester:
 
         while current_idx < len(df_1m):
             new_1m = df_1m.iloc[current_idx]
-            current_15m_data.append(new_1m)
-            current_1h_data.append(new_1m)
-
-            if len(current_15m_data) == 15:
-                new_15m = {
-                    'timestamp': pd.to_datetime(current_15m_data[0]['timestamp']),
-                    'open': current_15m_data[0]['open'],
-                    'high': max(d['high'] for d in current_15m_data),
-                    'low': min(d['low'] for d in current_15m_data),
-                    'close': current_15m_data[-1]['close'],
-                    'volume': sum(d['volume'] for d in current_15m_data)
-                }
-                df_15m = pd.concat([df_15m, pd.DataFrame([new_15m])], ignore_index=True)
-                if len(df_15m) > 100:
-                    df_15m = df_15m.iloc[1:].reset_index(drop=True)
+
+            if bar_15m_at[current_idx] > sent_15m:
+                df_15m = _append_bars(df_15m, bars_15m[sent_15m + 1:bar_15m_at[current_idx] + 1])
+                sent_15m = bar_15m_at[current_idx]
                 signal_df_15m = df_15m
-                current_15m_data = []
                 current_signal = self.strategy.generate_signals(signal_df_15m, df_1h)
 
-            if len(current_1h_data) == 60:
-                new_1h = {
-                    'timestamp': pd.to_datetime(current_1h_data[0]['timestamp']),
-                    'open': current_1h_data[0]['open'],
-                    'high': max(d['high'] for d in current_1h_data),
-                    'low': min(d['low'] for d in current_1h_data),
-                    'close': current_1h_data[-1]['close'],
-                    'volume': sum(d['volume'] for d in current_1h_data)
-                }
-                df_1h = pd.concat([df_1h, pd.DataFrame([new_1h])], ignore_index=True)
-                if len(df_1h) > 100:
-                    df_1h = df_1h.iloc[1:].reset_index(drop=True)
-                current_1h_data = []
+            if bar_1h_at[current_idx] > sent_1h:
+                df_1h = _append_bars(df_1h, bars_1h[sent_1h + 1:bar_1h_at[current_idx] + 1])
+                sent_1h = bar_1h_at[current_idx]
                 current_signal = self.strategy.generate_signals(signal_df_15m, df_1h)
 
             if current_position == 0 and current_signal != 0:
-                print("進場:", current_signal, "價格:", signal_df_15m['close'].iloc[-1], "時間:", signal_df_15m['timestamp'].iloc[-1])
+                self.events.info(EventType.TRADE, msg="進場", position=current_signal, price=signal_df_15m['close'].iloc[-1], time=signal_df_15m['timestamp'].iloc[-1])
                 current_position = current_signal
                 entry_price = signal_df_15m['close'].iloc[-1]
                 entry_idx = current_idx
@@ -120,7 +143,7 @@ class Backtester:
                     if exit_price >= avg_entry * (1 + 1 / leverage):
                         check_liquidation = True
                 if check_liquidation:
-                    print("強平出場:", current_position, "價格:", exit_price, "時間:", new_1m['timestamp'])
+                    self.events.warning(EventType.TRADE, msg="強平出場", position=current_position, price=exit_price, time=new_1m['timestamp'])
                     total_qty = sum(p['qty'] for p in risk_manager.positions)
                     # 強平損失 = 倉位價值 * leverage (100%虧損)
                     pnl = -total_qty * leverage
@@ -139,10 +162,10 @@ class Backtester:
                     entry_price = None
                 elif risk_manager.should_add_position(entry_price, current_price, current_position):
                     qty = risk_manager.add_position(current_price, base_qty)
-                    print("加倉:", current_position, "價格:", current_price, "時間:", new_1m['timestamp'], "加倉量:", qty, "reverse_pct:", (current_price - entry_price) / entry_price)
+                    self.events.info(EventType.LADDER_ADD, msg="加倉", position=current_position, price=current_price, time=new_1m['timestamp'], qty=qty, reverse_pct=(current_price - entry_price) / entry_price)
                     # entry_price = new_1m['close']
                     if qty is None:
-                        print("已達最大加倉層數，無法再加倉")
+                        self.events.warning(EventType.LADDER_ADD, msg="已達最大加倉層數，無法再加倉", time=new_1m['timestamp'])
                         exit_price = current_price
                         total_qty = sum(p['qty'] for p in risk_manager.positions)
                         avg_entry = sum(p['price'] * p['qty'] for p in risk_manager.positions) / total_qty
@@ -162,9 +185,8 @@ class Backtester:
                         entry_price = None
                 elif risk_manager and risk_manager.check_take_profit(current_price, current_position):
                     exit_price = current_price
-                    print("出場:", current_position, "價格:", exit_price, "時間:", new_1m['timestamp'])
+                    self.events.info(EventType.TP, msg="出場", position=current_position, price=exit_price, time=new_1m['timestamp'])
                     total_qty = sum(p['qty'] for p in risk_manager.positions)
-                    # print("total_qty:", total_qty)
                     avg_entry = sum(p['price'] * p['qty'] for p in risk_manager.positions) / total_qty
                     pnl = (exit_price - avg_entry) / avg_entry * current_position * total_qty * leverage
                     # pnl -= pnl* self.fee
@@ -0,0 +1,187 @@
+import json
+import math
+import os
+import time
+
+
+def empty_state():
+    # ladder 與 RiskManager.positions 相同格式: [{"price": , "qty": }]
+    return {"position": 0, "entry_price": None, "ladder": [], "trailing_peak": None, "pending": None}
+
+
+class TraderJournal:
+    """
+    Crash-recovery journal of one symbol's trader state.
+
+    Every transition is one JSON line appended to `<directory>/<symbol>.journal`
+    and fsynced before the trader moves on. Every `snapshot_every` records the
+    whole state is written atomically to `<symbol>.snapshot.json` and the
+    journal restarts, so `recover()` reads one small snapshot plus at most
+    `snapshot_every` lines.
+
+    Ops:
+        order       an order is about to be sent (kept as `pending` until resolved)
+        order_done  the pending order failed, timed out or returned no id
+        open / add  a ladder layer was filled
+        close       the position was closed
+        trailing    the trailing take-profit peak moved
+        reconcile   state overwritten after comparing with the exchange
+    """
+
+    def __init__(self, directory: str, symbol: str, snapshot_every: int = 50, fsync: bool = True):
+        self.directory = directory
+        self.symbol = symbol
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        name = symbol.replace('-', '_').upper()
+        self.journal_path = os.path.join(directory, f"{name}.journal")
+        self.snapshot_path = os.path.join(directory, f"{name}.snapshot.json")
+        self.state = empty_state()
+        self.seq = 0
+        self._since_snapshot = 0
+        self._file = None
+
+    def _sync(self, f):
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    def _apply(self, rec: dict):
+        op = rec["op"]
+        state = self.state
+        if op == "order":
+            state["pending"] = {"action": rec["action"], "qty": rec["qty"], "price": rec.get("price")}
+        elif op == "order_done":
+            state["pending"] = None
+        elif op == "open":
+            self.state = empty_state()
+            self.state.update(position=rec["position"], entry_price=rec["entry_price"],
+                              ladder=[{"price": rec["price"], "qty": rec["qty"]}])
+        elif op == "add":
+            state["ladder"].append({"price": rec["price"], "qty": rec["qty"]})
+            state["pending"] = None
+        elif op == "close":
+            self.state = empty_state()
+        elif op == "trailing":
+            state["trailing_peak"] = rec["peak"]
+        elif op == "reconcile":
+            self.state = json.loads(json.dumps(rec["state"]))
+        else:
+            raise ValueError(f"Unknown journal op: {op}")
+
+    def recover(self) -> dict:
+        """Rebuild the state from the snapshot and the journal records after it."""
+        self.state = empty_state()
+        self.seq = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                snap = json.load(f)
+            self.state = snap["state"]
+            self.seq = snap["seq"]
+        replayed = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "r+b") as f:
+                good = 0
+                for line in f:
+                    try:
+                        rec = json.loads(line) if line.endswith(b"\n") else None
+                    except json.JSONDecodeError:
+                        rec = None
+                    if rec is None:
+                        # 寫到一半就掛掉的最後一行: 截掉，之後的紀錄才不會接在殘行後面
+                        f.truncate(good)
+                        break
+                    good += len(line)
+                    if rec["seq"] <= self.seq:
+                        continue
+                    self._apply(rec)
+                    self.seq = rec["seq"]
+                    replayed += 1
+        self._since_snapshot = replayed
+        return self.state
+
+    def record(self, op: str, **fields) -> dict:
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._file = open(self.journal_path, "a", encoding="utf-8")
+        rec = {"seq": self.seq + 1, "ts": time.time(), "op": op, **fields}
+        self._apply(rec)
+        self.seq = rec["seq"]
+        self._file.write(json.dumps(rec) + "\n")
+        self._sync(self._file)
+        self._since_snapshot += 1
+        if self._since_snapshot >= self.snapshot_every:
+            self.snapshot()
+        return self.state
+
+    def snapshot(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"seq": self.seq, "ts": time.time(), "state": self.state}, f)
+            self._sync(f)
+        os.replace(tmp, self.snapshot_path)
+        # snapshot 之前的紀錄都已包含在內；若在這之間掛掉，recover 會依 seq 略過舊紀錄
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.journal_path, "w", encoding="utf-8")
+        self._sync(self._file)
+        self._since_snapshot = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _same_qty(a: float, b: float) -> bool:
+    return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-12)
+
+
+def exchange_position(rows: list):
+    """(position, qty, avg_px) of the first open position in OKX `/account/positions` rows."""
+    for row in rows:
+        pos = float(row.get("pos") or 0)
+        if pos == 0:
+            continue
+        side = row.get("posSide", "net")
+        position = (1 if pos > 0 else -1) if side == "net" else (1 if side == "long" else -1)
+        avg_px = float(row["avgPx"]) if row.get("avgPx") else None
+        return position, abs(pos), avg_px
+    return 0, 0.0, None
+
+
+def reconcile_state(state: dict, rows: list):
+    """
+    Compare a recovered state with the exchange positions.
+
+    Returns (state, reason); reason is None when they agree, otherwise the
+    returned state is what the trader should continue from.
+    """
+    position, qty, avg_px = exchange_position(rows)
+    held = sum(p["qty"] for p in state["ladder"])
+    if position == state["position"] and _same_qty(qty, held):
+        if state["pending"] is None:
+            return state, None
+        # 訂單送出但沒成交 (或已撤)，持倉沒變
+        return dict(state, pending=None), "pending order was not filled"
+
+    pending = state["pending"]
+    if pending is not None:
+        action = pending["action"]
+        price = pending.get("price") or avg_px
+        if action.startswith("close") and position == 0:
+            return empty_state(), f"pending {action} filled before restart"
+        side = 1 if action == "long" else -1 if action == "short" else 0
+        if side == position and state["position"] in (0, side) and _same_qty(qty, held + pending["qty"]):
+            if state["position"] == 0:
+                new = dict(empty_state(), position=side, entry_price=price, ladder=[{"price": price, "qty": pending["qty"]}])
+            else:
+                new = dict(state, ladder=state["ladder"] + [{"price": price, "qty": pending["qty"]}], pending=None)
+            return new, f"pending {action} filled before restart"
+
+    if position == 0:
+        return empty_state(), "exchange has no position"
+    # 無法對上時以交易所為準，整個部位視為一層
+    new = dict(empty_state(), position=position, entry_price=avg_px, ladder=[{"price": avg_px, "qty": qty}])
+    return new, f"journal {state['position']}x{held} does not match exchange {position}x{qty}, ladder rebuilt from exchange"
@@ -0,0 +1,363 @@
+"""
+Hot-path latency instrumentation for the live trading loop.
+
+Stages are timed with `time.perf_counter_ns()` and recorded into log-linear
+(HDR-style) histograms: every power of two is split into 2**SUB_BITS linear
+buckets, so any recorded value is reported within ~3% with a fixed, small
+array per stage and O(1) recording.
+
+    tracker = get_tracker()
+    span = tracker.span("entry", start_ns=bar["recv_ns"])
+    span.mark("signal")      # records entry.signal = now - previous mark
+    span.mark("order_ack")
+    span.mark("filled")
+    span.finish()            # records entry.total = now - start
+
+When the tracker is disabled `span()` returns a shared no-op span and
+`record()` returns immediately, so instrumented code only pays for a method
+call. Enable with `LATENCY_METRICS=1` or `get_tracker().enable()`.
+
+Exporters:
+    MetricsServer     local HTTP endpoint, Prometheus text on /metrics and JSON on /metrics.json
+    PostgresExporter  per-interval percentiles into the `latency_stats` table for Grafana
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+try:
+    import psycopg2
+except ImportError:  # optional: only PostgresExporter needs it
+    psycopg2 = None
+
+SUB_BITS = 5
+SUB_COUNT = 1 << SUB_BITS
+# 2**36 us ≈ 19 小時，超過的值記在最後一格
+MAX_BITS = 36
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+def _bucket_index(value: int) -> int:
+    if value < SUB_COUNT:
+        return value
+    shift = value.bit_length() - SUB_BITS - 1
+    return SUB_COUNT * shift + (value >> shift)
+
+
+def _bucket_bounds(index: int):
+    # [low, high) of the values that land in bucket `index`
+    if index < SUB_COUNT:
+        return index, index + 1
+    shift = index // SUB_COUNT - 1
+    low = (index - shift * SUB_COUNT) << shift
+    return low, low + (1 << shift)
+
+
+class LatencyHistogram:
+    """Log-linear histogram of microsecond latencies."""
+
+    def __init__(self):
+        self.counts = [0] * _bucket_index((1 << MAX_BITS) - 1) + [0]
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self._lock = threading.Lock()
+
+    def record(self, value_us: int):
+        index = min(_bucket_index(max(value_us, 0)), len(self.counts) - 1)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value_us
+            if value_us > self.max:
+                self.max = value_us
+
+    def copy(self) -> "LatencyHistogram":
+        other = LatencyHistogram()
+        with self._lock:
+            other.counts = list(self.counts)
+            other.count = self.count
+            other.total = self.total
+            other.max = self.max
+        return other
+
+    def since(self, previous: Optional["LatencyHistogram"]) -> "LatencyHistogram":
+        """Values recorded after `previous` (an earlier copy of this histogram)."""
+        current = self.copy()
+        if previous is None:
+            return current
+        current.counts = [a - b for a, b in zip(current.counts, previous.counts)]
+        current.count -= previous.count
+        current.total -= previous.total
+        # 區間內的 max 只能從最高的非空 bucket 推回上界
+        current.max = 0
+        for index in range(len(current.counts) - 1, -1, -1):
+            if current.counts[index]:
+                current.max = min(_bucket_bounds(index)[1] - 1, self.max)
+                break
+        return current
+
+    def percentile(self, q: float) -> int:
+        if self.count == 0:
+            return 0
+        rank = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                low, high = _bucket_bounds(index)
+                # bucket 中點，且不超過實際最大值
+                return min((low + high - 1) // 2, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        row = {
+            "count": self.count,
+            "mean_us": self.total / self.count if self.count else 0.0,
+            "max_us": self.max,
+        }
+        for q in QUANTILES:
+            row[f"p{q * 100:g}_us"] = self.percentile(q)
+        return row
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def mark(self, stage: str):
+        pass
+
+    def finish(self, stage: str = "total"):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """Consecutive stage marks of one pass through the pipeline (e.g. one entry)."""
+
+    __slots__ = ("tracker", "name", "start_ns", "last_ns")
+
+    def __init__(self, tracker: "LatencyTracker", name: str, start_ns: Optional[int] = None):
+        self.tracker = tracker
+        self.name = name
+        self.start_ns = start_ns or time.perf_counter_ns()
+        self.last_ns = self.start_ns
+
+    def mark(self, stage: str):
+        now = time.perf_counter_ns()
+        self.tracker.record(f"{self.name}.{stage}", (now - self.last_ns) // 1000)
+        self.last_ns = now
+
+    def finish(self, stage: str = "total"):
+        self.tracker.record(f"{self.name}.{stage}", (time.perf_counter_ns() - self.start_ns) // 1000)
+
+
+class LatencyTracker:
+    """Named histograms, created on first use."""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def record(self, stage: str, value_us: int):
+        if not self.enabled:
+            return
+        hist = self.histograms.get(stage)
+        if hist is None:
+            with self._lock:
+                hist = self.histograms.setdefault(stage, LatencyHistogram())
+        hist.record(value_us)
+
+    def record_since(self, stage: str, start_ns: int):
+        if self.enabled and start_ns:
+            self.record(stage, (time.perf_counter_ns() - start_ns) // 1000)
+
+    def span(self, name: str, start_ns: Optional[int] = None):
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, start_ns)
+
+    def snapshot(self) -> Dict[str, LatencyHistogram]:
+        with self._lock:
+            items = list(self.histograms.items())
+        return {stage: hist.copy() for stage, hist in sorted(items)}
+
+    def summary(self) -> Dict[str, dict]:
+        return {stage: hist.summary() for stage, hist in self.snapshot().items()}
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+
+
+_tracker = LatencyTracker(enabled=os.getenv("LATENCY_METRICS") == "1")
+
+
+def get_tracker() -> LatencyTracker:
+    return _tracker
+
+
+def prometheus_text(tracker: LatencyTracker) -> str:
+    lines = [
+        "# HELP trade_latency_seconds Latency of each stage of the signal -> order -> fill path",
+        "# TYPE trade_latency_seconds summary",
+    ]
+    for stage, hist in tracker.snapshot().items():
+        for q in QUANTILES:
+            lines.append(f'trade_latency_seconds{{stage="{stage}",quantile="{q}"}} {hist.percentile(q) / 1e6:.6f}')
+        lines.append(f'trade_latency_seconds_sum{{stage="{stage}"}} {hist.total / 1e6:.6f}')
+        lines.append(f'trade_latency_seconds_count{{stage="{stage}"}} {hist.count}')
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Serve the tracker on http://host:port/metrics (Prometheus) and /metrics.json."""
+
+    def __init__(self, tracker: LatencyTracker = None, host: str = "127.0.0.1", port: int = 9108):
+        self.tracker = tracker or get_tracker()
+        self.host = host
+        self.port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def start(self):
+        tracker = self.tracker
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, ctype = prometheus_text(tracker).encode(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, ctype = json.dumps(tracker.summary()).encode(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"[METRICS] serving latency on http://{self.host}:{self.port}/metrics")
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def _db_config() -> dict:
+    # 與 docker-compose 的 live_trade 服務相同的環境變數
+    return {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "port": int(os.getenv("DB_PORT", "5434")),
+        "dbname": os.getenv("DB_NAME", "live_trade_db"),
+        "user": os.getenv("DB_USER", "trader"),
+        "password": os.getenv("DB_PASSWORD", "0107"),
+    }
+
+
+class PostgresExporter:
+    """
+    Every `interval` seconds insert one row per stage with the percentiles of
+    the values recorded during that interval into `latency_stats`.
+    """
+
+    def __init__(self, tracker: LatencyTracker = None, interval: float = 10.0, db_config: dict = None):
+        if psycopg2 is None:
+            raise ImportError("PostgresExporter requires psycopg2 (pip install psycopg2-binary)")
+        self.tracker = tracker or get_tracker()
+        self.interval = interval
+        self.db_config = db_config or _db_config()
+        self._previous: Dict[str, LatencyHistogram] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def create_table(self):
+        conn = psycopg2.connect(**self.db_config)
+        try:
+            with conn, conn.cursor() as cur:
+                cur.execute("""
+                CREATE TABLE IF NOT EXISTS latency_stats (
+                    ts TIMESTAMPTZ NOT NULL,
+                    stage TEXT NOT NULL,
+                    count BIGINT,
+                    mean_us DOUBLE PRECISION,
+                    p50_us BIGINT,
+                    p90_us BIGINT,
+                    p99_us BIGINT,
+                    p999_us BIGINT,
+                    max_us BIGINT,
+                    PRIMARY KEY (ts, stage)
+                );
+                """)
+        finally:
+            conn.close()
+
+    def _rows(self) -> List[tuple]:
+        ts = datetime.now(timezone.utc)
+        rows = []
+        for stage, hist in self.tracker.snapshot().items():
+            window = hist.since(self._previous.get(stage))
+            self._previous[stage] = hist
+            if window.count == 0:
+                continue
+            s = window.summary()
+            rows.append((ts, stage, s["count"], s["mean_us"], s["p50_us"], s["p90_us"],
+                         s["p99_us"], s["p99.9_us"], s["max_us"]))
+        return rows
+
+    def export(self) -> int:
+        rows = self._rows()
+        if not rows:
+            return 0
+        conn = psycopg2.connect(**self.db_config)
+        try:
+            with conn, conn.cursor() as cur:
+                cur.executemany(
+                    "INSERT INTO latency_stats (ts, stage, count, mean_us, p50_us, p90_us, p99_us, p999_us, max_us) "
+                    "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) ON CONFLICT DO NOTHING",
+                    rows
+                )
+        finally:
+            conn.close()
+        return len(rows)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.export()
+            except Exception as e:
+                print(f"[METRICS] postgres export failed: {e}")
+
+    def start(self):
+        self.create_table()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.export()
@@ -1,20 +1,223 @@
-import logging
+import atexit
+import json
 import os
-from datetime import datetime
+import struct
+import sys
+import threading
+import time
+from queue import Queue, Empty, Full
+
+# 結構化事件日誌: 交易執行緒只做一次 put_nowait，序列化、寫檔、輪替與 console 輸出都在背景執行緒
+# 每個事件為 {"ts", "level", "type", ...欄位}
 
 LOG_DIR = 'logs'
-LOG_FILE = os.path.join(LOG_DIR, 'trade.log')
-os.makedirs(LOG_DIR, exist_ok=True)
 
-logging.basicConfig(
-	filename=LOG_FILE,
-	level=logging.INFO,
-	format='%(asctime)s %(levelname)s %(message)s',
-	datefmt='%Y-%m-%d %H:%M:%S'
-)
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR'}
+
+class EventType:
+	SIGNAL = 'signal'
+	ORDER = 'order'
+	FILL = 'fill'
+	LADDER_ADD = 'ladder_add'
+	TP = 'tp'
+	TRADE = 'trade'
+	BAR = 'bar'
+	RMS = 'rms'
+	MARKET = 'market'
+	STATE = 'state'
+	MESSAGE = 'message'
+
+# binary 格式每筆: <長度 uint32><ts float64><level uint8> + JSON payload (type 與欄位)
+_BIN_HEADER = struct.Struct('<IdB')
+_FORMAT_SUFFIX = {'jsonl': '.jsonl', 'binary': '.bin'}
+
+def _parse_level(level):
+	if isinstance(level, str):
+		return {name: value for value, name in LEVEL_NAMES.items()}[level.upper()]
+	return level
+
+def _json_default(value):
+	# pandas Timestamp / numpy 數值等
+	if hasattr(value, 'isoformat'):
+		return value.isoformat()
+	if hasattr(value, 'item'):
+		return value.item()
+	return str(value)
+
+def format_event(event):
+	# console 顯示: [TYPE] msg k=v ...
+	fields = ' '.join(f"{k}={v}" for k, v in event.items() if k not in ('ts', 'level', 'type', 'msg'))
+	head = f"[{event['type'].upper()}]"
+	if event['level'] >= WARNING:
+		head += f" {LEVEL_NAMES.get(event['level'], event['level'])}"
+	if 'msg' in event:
+		head += f" {event['msg']}"
+	return f"{head} {fields}".rstrip()
+
+class EventLog:
+	def __init__(self, directory=LOG_DIR, name='events', level=INFO, console_level=INFO, fmt='jsonl',
+				 max_bytes=50 * 1024 * 1024, backup_count=10, queue_size=100_000):
+		if fmt not in _FORMAT_SUFFIX:
+			raise ValueError(f"Invalid event log format: {fmt}")
+		self.directory = directory
+		self.path = os.path.join(directory, name + _FORMAT_SUFFIX[fmt])
+		self.fmt = fmt
+		# console_level=None 只寫檔
+		self.level = _parse_level(level)
+		self.console_level = _parse_level(console_level) if console_level is not None else None
+		self.min_level = min(self.level, self.console_level) if self.console_level is not None else self.level
+		self.max_bytes = max_bytes
+		self.backup_count = backup_count
+		self.dropped = 0
+		self.written = 0
+		self._queue = Queue(maxsize=queue_size)
+		self._file = None
+		self._size = 0
+		self._stop = threading.Event()
+		self._writer = threading.Thread(target=self._run_writer, daemon=True)
+		self._writer.start()
+		atexit.register(self.close)
+
+	def enabled_for(self, level):
+		return level >= self.min_level
+
+	def emit(self, event_type, level=INFO, **fields):
+		if level < self.min_level:
+			return
+		fields['ts'] = time.time()
+		fields['level'] = level
+		fields['type'] = event_type
+		try:
+			self._queue.put_nowait(fields)
+		except Full:
+			# 寧可丟事件也不能卡住交易執行緒
+			self.dropped += 1
+
+	def debug(self, event_type, **fields):
+		self.emit(event_type, DEBUG, **fields)
+
+	def info(self, event_type, **fields):
+		self.emit(event_type, INFO, **fields)
+
+	def warning(self, event_type, **fields):
+		self.emit(event_type, WARNING, **fields)
+
+	def error(self, event_type, **fields):
+		self.emit(event_type, ERROR, **fields)
+
+	def _open(self):
+		os.makedirs(self.directory, exist_ok=True)
+		self._file = open(self.path, 'ab')
+		self._size = self._file.tell()
+
+	def _rotate(self):
+		self._file.close()
+		for i in range(self.backup_count - 1, 0, -1):
+			src = f"{self.path}.{i}"
+			if os.path.exists(src):
+				os.replace(src, f"{self.path}.{i + 1}")
+		if self.backup_count > 0:
+			os.replace(self.path, f"{self.path}.1")
+		else:
+			os.remove(self.path)
+		self._open()
+
+	def _encode(self, event):
+		if self.fmt == 'jsonl':
+			return json.dumps(event, ensure_ascii=False, default=_json_default).encode() + b'\n'
+		body = {k: v for k, v in event.items() if k not in ('ts', 'level')}
+		payload = json.dumps(body, ensure_ascii=False, default=_json_default).encode()
+		return _BIN_HEADER.pack(len(payload), event['ts'], event['level']) + payload
+
+	def _write(self, batch):
+		if self._file is None:
+			self._open()
+		for event in batch:
+			if self.console_level is not None and event['level'] >= self.console_level:
+				print(format_event(event))
+			if event['level'] < self.level:
+				continue
+			data = self._encode(event)
+			if self.max_bytes and self._size and self._size + len(data) > self.max_bytes:
+				self._rotate()
+			self._file.write(data)
+			self._size += len(data)
+			self.written += 1
+		self._file.flush()
+
+	def _run_writer(self):
+		while True:
+			try:
+				batch = [self._queue.get(timeout=0.5)]
+			except Empty:
+				if self._stop.is_set():
+					break
+				continue
+			while len(batch) < 1000:
+				try:
+					batch.append(self._queue.get_nowait())
+				except Empty:
+					break
+			try:
+				self._write(batch)
+			except Exception as e:
+				print(f"[LOG] event log write failed: {e}", file=sys.stderr)
+		if self._file is not None:
+			self._file.close()
+			self._file = None
+
+	def close(self):
+		# 寫完佇列內剩下的事件
+		if self._stop.is_set():
+			return
+		self._stop.set()
+		self._writer.join()
+		if self.dropped:
+			print(f"[LOG] {self.dropped} events dropped from {self.path} (queue full)", file=sys.stderr)
+
+def read_events(path):
+	# 依副檔名讀回 jsonl 或 binary 事件
+	with open(path, 'rb') as f:
+		if not path.endswith('.bin') and '.bin.' not in os.path.basename(path):
+			for line in f:
+				if line.strip():
+					yield json.loads(line)
+			return
+		while True:
+			header = f.read(_BIN_HEADER.size)
+			if len(header) < _BIN_HEADER.size:
+				return
+			length, ts, level = _BIN_HEADER.unpack(header)
+			event = json.loads(f.read(length))
+			event['ts'] = ts
+			event['level'] = level
+			yield event
+
+_logs = {}
+_logs_lock = threading.Lock()
+
+def get_event_log(name='events'):
+	# 每個 name 共用一個 EventLog；等級與格式可由環境變數設定
+	with _logs_lock:
+		if name not in _logs:
+			_logs[name] = EventLog(
+				directory=os.getenv('EVENT_LOG_DIR', LOG_DIR),
+				name=name,
+				level=os.getenv('EVENT_LOG_LEVEL', 'INFO'),
+				console_level=os.getenv('EVENT_LOG_CONSOLE_LEVEL', 'INFO'),
+				fmt=os.getenv('EVENT_LOG_FORMAT', 'jsonl'),
+			)
+		return _logs[name]
+
+def log_event(event_type, level=INFO, **fields):
+	get_event_log().emit(event_type, level, **fields)
 
 def log_trade(action, symbol, price, qty, position, reason=None):
-	msg = f"action={action}, symbol={symbol}, price={price}, qty={qty}, position={position}"
+	fields = dict(action=action, symbol=symbol, price=price, qty=qty, position=position)
 	if reason:
-		msg += f", reason={reason}"
-	logging.info(msg)
+		fields['reason'] = reason
+	log_event(EventType.TRADE, INFO, **fields)
@@ -1,5 +1,6 @@
 import time
 from connector.okx_order import OrderSide, PositionSide, OKXOrderError
+from engine.online.logging import get_event_log, EventType
 
 def _format_okx_error(err: Exception) -> str:
 	if isinstance(err, OKXOrderError):
@@ -10,29 +11,53 @@ def _format_okx_error(err: Exception) -> str:
 		return " | ".join(parts)
 	return str(err)
 
-def wait_order_filled(order_client, symbol, order_id, poll_interval=1, timeout=30, cancel_on_timeout=True):
+FILLED_STATES = ('filled', 'success', '2')  # 2=成交
+CLOSED_STATES = ('canceled', 'cancelled', 'mmp_canceled', 'failed', 'rejected')
+
+def _order_id(resp):
+	data = (resp or {}).get('data') or [{}]
+	return data[0].get('ordId')
+
+def rejected(reason):
+	# 本地擋下、沒有送到交易所的下單結果 (無 ordId)
+	return {'rejected': reason, 'data': []}
+
+def wait_order_filled(order_client, symbol, order_id, poll_interval=1, timeout=30, cancel_on_timeout=True, ws_private=None, placed_at=None, events=None):
 	start = time.time()
-	while time.time() - start < timeout:
+	events = events or get_event_log()
+	if ws_private is not None:
+		# push-based confirmation; None means timeout or a websocket gap
+		state = ws_private.wait_order(order_id, timeout, since=placed_at or start)
+		if state in FILLED_STATES:
+			return True
+		if state in CLOSED_STATES:
+			return False
+		if ws_private.connected.is_set() and time.time() - start < timeout:
+			events.warning(EventType.ORDER, msg="private ws gap while waiting for fill, falling back to REST", symbol=symbol, order_id=order_id)
+
+	while True:
 		try:
 			info = order_client.get_order(symbol, order_id=order_id)
 			status = info.get('data', [{}])[0].get('state')
 
 			# OKX state examples: live/partially_filled/filled/canceled
-			if status in ('filled', 'success', '2'):  # 2=成交
+			if status in FILLED_STATES:
 				return True
-			if status in ('canceled', 'cancelled', 'failed', 'rejected'):
+			if status in CLOSED_STATES:
 				return False
 		except Exception as e:
-			print(f"[OMS] get_order failed: {e}")
+			events.warning(EventType.ORDER, msg="get_order failed", symbol=symbol, order_id=order_id, error=str(e))
 
+		if time.time() - start >= timeout:
+			break
 		time.sleep(poll_interval)
 
 	if cancel_on_timeout:
 		try:
 			order_client.cancel_order(symbol, order_id=order_id)
-			print(f"[OMS] order timeout, cancelled: {order_id}")
+			events.warning(EventType.FILL, msg="order not filled in time, cancelled", symbol=symbol, order_id=order_id)
 		except Exception as e:
-			print(f"[OMS] cancel order failed: {e}")
+			events.error(EventType.ORDER, msg="cancel order failed", symbol=symbol, order_id=order_id, error=str(e))
 	return False
 
 
@@ -48,12 +73,48 @@ def _normalize_position_side(position_side):
 	raise ValueError(f"Invalid position_side: {position_side}")
 
 class OrderManager:
-	def __init__(self, client, max_retries=3, retry_delay=2):
+	def __init__(self, client, max_retries=3, retry_delay=2, ws_private=None, order_books=None, max_slippage=None, event_log=None):
 		self.client = client
+		self.events = event_log or get_event_log()
 		self.max_retries = max_retries
 		self.retry_delay = retry_delay
+		self.ws_private = ws_private
+		# order_books: {symbol: OKXOrderBook}; max_slippage: fraction vs the touch, None disables the check
+		self.order_books = order_books or {}
+		self.max_slippage = max_slippage
+
+	def estimate_slippage(self, symbol, side, qty):
+		# returns (vwap, slippage) from the local book, or (None, None) when no usable book
+		book = self.order_books.get(symbol)
+		if book is None or book.is_stale():
+			return None, None
+		side = 'buy' if side == OrderSide.BUY else 'sell'
+		vwap, filled = book.vwap_to_size(side, qty)
+		if filled < qty:
+			return vwap, float('inf')
+		return vwap, book.slippage(side, qty)
+
+	def _slippage_ok(self, symbol, side, qty):
+		if self.max_slippage is None:
+			return True
+		vwap, slippage = self.estimate_slippage(symbol, side, qty)
+		if slippage is None:
+			return True
+		if slippage == float('inf'):
+			self.events.warning(EventType.ORDER, msg="order rejected: book depth cannot fill size", symbol=symbol, side=side.value, qty=qty)
+			return False
+		if slippage > self.max_slippage:
+			self.events.warning(EventType.ORDER, msg="order rejected: estimated slippage above limit", symbol=symbol, side=side.value, qty=qty,
+								vwap=vwap, slippage=round(slippage, 6), max_slippage=self.max_slippage)
+			return False
+		return True
+
+	def wait_filled(self, symbol, order_id, timeout=30, placed_at=None):
+		return wait_order_filled(self.client, symbol, order_id, timeout=timeout, ws_private=self.ws_private, placed_at=placed_at, events=self.events)
 
 	def open_long(self, symbol, qty):
+		if not self._slippage_ok(symbol, OrderSide.BUY, qty):
+			return rejected('slippage')
 		for attempt in range(self.max_retries):
 			try:
 				resp = self.client.place_futures_market_order(
@@ -63,15 +124,18 @@ class OrderManager:
 					position_side=PositionSide.LONG,
 					reduce_only=False
 				)
-				print(f"下多單成功: {resp}")
+				self.events.info(EventType.ORDER, msg="order placed", symbol=symbol, action='long', qty=qty, order_id=_order_id(resp))
 				return resp
 			except Exception as e:
 				err_msg = _format_okx_error(e)
-				print(f"下多單失敗: {err_msg}, 重試 {attempt+1}/{self.max_retries}")
+				self.events.warning(EventType.ORDER, msg="order failed, retrying", symbol=symbol, action='long', qty=qty,
+									attempt=attempt + 1, max_retries=self.max_retries, error=err_msg)
 				time.sleep(self.retry_delay)
 		raise Exception("多單下單失敗，已重試多次")
 
 	def open_short(self, symbol, qty):
+		if not self._slippage_ok(symbol, OrderSide.SELL, qty):
+			return rejected('slippage')
 		for attempt in range(self.max_retries):
 			try:
 				resp = self.client.place_futures_market_order(
@@ -81,11 +145,12 @@ class OrderManager:
 					position_side=PositionSide.SHORT,
 					reduce_only=False
 				)
-				print(f"下空單成功: {resp}")
+				self.events.info(EventType.ORDER, msg="order placed", symbol=symbol, action='short', qty=qty, order_id=_order_id(resp))
 				return resp
 			except Exception as e:
 				err_msg = _format_okx_error(e)
-				print(f"下空單失敗: {err_msg}, 重試 {attempt+1}/{self.max_retries}")
+				self.events.warning(EventType.ORDER, msg="order failed, retrying", symbol=symbol, action='short', qty=qty,
+									attempt=attempt + 1, max_retries=self.max_retries, error=err_msg)
 				time.sleep(self.retry_delay)
 		raise Exception("空單下單失敗，已重試多次")
 
@@ -100,19 +165,20 @@ class OrderManager:
 					position_side=position_side,
 					reduce_only=True
 				)
-				print(f"平倉成功: {resp}")
+				self.events.info(EventType.ORDER, msg="order placed", symbol=symbol, action='close', qty=qty, order_id=_order_id(resp))
 				return resp
 			except Exception as e:
 				err_msg = _format_okx_error(e)
-				print(f"平倉失敗: {err_msg}, 重試 {attempt+1}/{self.max_retries}")
+				self.events.warning(EventType.ORDER, msg="order failed, retrying", symbol=symbol, action='close', qty=qty,
+									attempt=attempt + 1, max_retries=self.max_retries, error=err_msg)
 				time.sleep(self.retry_delay)
 		raise Exception("平倉失敗，已重試多次")
 
 	def get_position(self, symbol):
 		try:
 			pos_info = self.client.get_futures_positions(symbol)
-			print(f"持倉資訊: {pos_info}")
+			self.events.debug(EventType.STATE, msg="position info", symbol=symbol, data=pos_info.get('data'))
 			return pos_info
 		except Exception as e:
-			print(f"查詢持倉失敗: {e}")
+			self.events.warning(EventType.STATE, msg="position query failed", symbol=symbol, error=str(e))
 			return None
@@ -1,6 +1,10 @@
+from engine.online.logging import get_event_log, EventType
+
+
 class RiskManager:
 
-    def __init__(self):
+    def __init__(self, event_log=None):
+        self.events = event_log or get_event_log()
         # layer_index: (multiplier, reverse_pct)）
         self.layers = [
             (1, 0.00),   # #1
@@ -50,7 +54,7 @@ class RiskManager:
         multiplier, _ = self.layers[layer_idx]
         qty = base_qty * multiplier
         self.positions.append({"price": price, "qty": qty})
-        print(f"[RMS] add_position layer={layer_idx + 1} price={price} qty={qty}")
+        self.events.info(EventType.LADDER_ADD, layer=layer_idx + 1, price=price, qty=qty)
         return qty
 
     def get_next_qty(self, base_qty):
@@ -63,7 +67,7 @@ class RiskManager:
 
     def should_add_position(self, entry_price, current_price, position):
         if not self.positions:
-            print("[RMS] should_add_position: no positions yet -> True")
+            self.events.debug(EventType.RMS, msg="should_add_position: no positions yet", result=True)
             return True
 
         layer_idx = len(self.positions)
@@ -77,18 +81,17 @@ class RiskManager:
         if position == 1:  # long
             drawdown = (entry_price - current_price) / entry_price
             should_add = drawdown >= reverse_pct
-            print(
-                f"[RMS] should_add_position long layer={layer_idx + 1} entry={entry_price} price={current_price} "
-                f"drawdown={drawdown:.6f} threshold={reverse_pct:.6f} -> {should_add}"
-            )
+            # 每秒都會檢查一次，只在 DEBUG 記錄
+            self.events.debug(EventType.RMS, msg="should_add_position", side="long", layer=layer_idx + 1,
+                              entry=entry_price, price=current_price, drawdown=round(drawdown, 6),
+                              threshold=round(reverse_pct, 6), result=should_add)
             return should_add
         else:  # short
             drawup = (current_price - entry_price) / entry_price
             should_add = drawup >= reverse_pct
-            print(
-                f"[RMS] should_add_position short layer={layer_idx + 1} entry={entry_price} price={current_price} "
-                f"drawup={drawup:.6f} threshold={reverse_pct:.6f} -> {should_add}"
-            )
+            self.events.debug(EventType.RMS, msg="should_add_position", side="short", layer=layer_idx + 1,
+                              entry=entry_price, price=current_price, drawup=round(drawup, 6),
+                              threshold=round(reverse_pct, 6), result=should_add)
             return should_add
 
     def _avg_price(self):
@@ -126,12 +129,14 @@ class RiskManager:
         # 啟動移動止盈
         if self.trailing_peak is None:
             self.trailing_peak = pnl_pct
-            print(f"[RMS] start trailing take profit at pnl_pct={pnl_pct:.5f}")
+            self.events.info(EventType.TP, msg="start trailing take profit", pnl_pct=round(pnl_pct, 5))
             return False
 
         self.trailing_peak = max(self.trailing_peak, pnl_pct)
-        print(f"[RMS] trailing peak updated to pnl_pct={self.trailing_peak:.5f}")
+        self.events.debug(EventType.TP, msg="trailing peak", peak=round(self.trailing_peak, 5), pnl_pct=round(pnl_pct, 5))
         if pnl_pct <= self.trailing_peak - trail_pct:
+            self.events.info(EventType.TP, msg="trailing stop hit", peak=round(self.trailing_peak, 5),
+                             pnl_pct=round(pnl_pct, 5), trail_pct=trail_pct)
             return True
 
         return False
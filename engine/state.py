@@ -10,8 +10,12 @@ class RollingWindow:
     def get_all(self):
         return list(self.data)
 
+    def last(self):
+        return self.data[-1] if self.data else None
+
 
 class TimeframeState:
     def __init__(self):
         self.m15 = RollingWindow(100)
-        self.h1 = RollingWindow(100)
\ No newline at end of file
+        self.h1 = RollingWindow(100)
+        self.h4 = RollingWindow(100)
\ No newline at end of file
@@ -6,53 +6,125 @@ from connector.okx_order import OKXOrderClient
 from engine.online.oms import OrderManager, wait_order_filled
 from engine.online.rms import RiskManager
 from connector.okx_kline import OKXKlineFetcher, fetch_futures_klines
+from connector.kline_downloader import KlineDownloader
 from connector.okx_ws_ticker import OKXWsTicker, OKXWsKline
+from connector.okx_ws_manager import OKXWsManager
+from connector.okx_orderbook import OKXOrderBook
+from connector.ws_recorder import StreamRecorder
+from connector.okx_ws_private import OKXWsPrivate
 from datawarehouse.kline_db import insert_kline, fetch_klines_from_db, listen_and_store_kline, fetch_multi_interval_closes_from_db
 from strategy.longstrategy import LongStrategy
 from engine.state import TimeframeState
+from engine.aggregator import KlineAggregator
+from engine.online.latency import get_tracker, MetricsServer, PostgresExporter
+from engine.online.logging import get_event_log, EventType
+from engine.online.journal import TraderJournal, reconcile_state
 
 class TradingState:
     SIGNAL = 'signal'
     OMS = 'oms'
     RMS = 'rms'
 
-def trading_main(strategy_cls: Type, api_key: str, api_secret: str, passphrase: str, symbol: str, intervals: list, window: int = 100, qty: float = 0.01):
-    okx_client = OKXOrderClient(api_key, api_secret, passphrase)
-    ws = OKXWsTicker(symbol)
+def trading_main(strategy_cls: Type, api_key: str, api_secret: str, passphrase: str, symbol: str, intervals: list, window: int = 100, qty: float = 0.01, local_aggregation: bool = False, okx_client: OKXOrderClient = None, max_price_age: float = 10.0, max_kline_age: float = 120.0, max_slippage: float = None, record_dir: str = None, metrics_port: int = None, metrics_postgres: bool = False, state_dir: str = "state"):
+    # the client is thread-safe, so several symbols' runners may share one
+    okx_client = okx_client or OKXOrderClient(api_key, api_secret, passphrase)
+    # ticker and candle subscriptions share one public and one business connection
+    ws_manager = OKXWsManager()
+    # stage latencies of candle -> signal -> order -> fill; recording is a no-op unless enabled
+    tracker = get_tracker()
+    if metrics_port is not None or metrics_postgres:
+        tracker.enable()
+    if metrics_port is not None:
+        MetricsServer(tracker, port=metrics_port).start()
+    if metrics_postgres:
+        PostgresExporter(tracker).start()
+    if record_dir:
+        # raw frames of every subscription, replayable with connector.ws_recorder.StreamReplayer
+        StreamRecorder(ws_manager, record_dir).start()
+    ws = OKXWsTicker(symbol, manager=ws_manager)
     ws.start()
+    ws_private = OKXWsPrivate(api_key, api_secret, passphrase)
+    ws_private.start()
     state = TimeframeState()
     q_15m = Queue()
     q_1h = Queue()
+    q_1m = Queue()
 
-    print("[INIT] fetching REST klines")
-    for k in fetch_futures_klines(symbol=symbol, interval="15m", limit=window):
-        state.m15.append(_normalize_kline(k))
-    for k in fetch_futures_klines(symbol=symbol, interval="1H", limit=window):
-        state.h1.append(_normalize_kline(k))
-    print("[INIT] REST done")
-
-    ws_15m = OKXWsKline(symbol, "15m", q_15m)
-    ws_1h = OKXWsKline(symbol, "1H", q_1h)
-    ws_15m.start()
-    ws_1h.start()
-    order_manager = OrderManager(okx_client)
-    risk_manager = RiskManager()
+    # hot-path output goes through the background event log writer (logs/events.jsonl + console)
+    events = get_event_log()
+    events.info(EventType.STATE, msg="fetching REST klines", symbol=symbol)
+    if local_aggregation:
+        # one 1m subscription; 15m/1H/4H are derived locally so they always agree
+        ws_1m = OKXWsKline(symbol, "1m", q_1m, manager=ws_manager)
+        kline_streams = [ws_1m]
+        aggregator = KlineAggregator(["15m", "1H", "4H"], base_interval="1m")
+        windows = {"15m": state.m15, "1H": state.h1, "4H": state.h4}
+        # only 1m is fetched: enough history for `window` 4H bars plus the open buckets,
+        # and every higher-timeframe window is built from it by the aggregator
+        now_ms = int(time.time() * 1000)
+        start_ms = aggregator.bucket_start(now_ms) - window * max(aggregator.intervals.values())
+        rows = KlineDownloader(OKXKlineFetcher(market_type="futures")).download(symbol, "1m", start_ms, now_ms - now_ms % aggregator.base_ms)
+        seed_bars = [_rest_bar(r) for r in rows]
+        for bar in aggregator.seed(seed_bars):
+            _append_bar(windows[bar["interval"]], _normalize_kline(bar))
+        # the websocket backfills anything between the REST seed and its first push
+        ws_1m.last_ts = max((b['ts'] for b in seed_bars), default=None)
+    else:
+        _bootstrap_window(state.m15, symbol, "15m", window)
+        _bootstrap_window(state.h1, symbol, "1H", window)
+    events.info(EventType.STATE, msg="REST klines loaded", symbol=symbol)
+
+    if local_aggregation:
+        ws_1m.start()
+    else:
+        ws_15m = OKXWsKline(symbol, "15m", q_15m, manager=ws_manager, last_ts=_last_ts_ms(state.m15))
+        ws_1h = OKXWsKline(symbol, "1H", q_1h, manager=ws_manager, last_ts=_last_ts_ms(state.h1))
+        kline_streams = [ws_15m, ws_1h]
+        ws_15m.start()
+        ws_1h.start()
+    order_books = {}
+    if max_slippage is not None:
+        # books5 is enough for the entry sizes here and pushes full snapshots
+        order_books[symbol] = OKXOrderBook(symbol, channel="books5", manager=ws_manager)
+        order_books[symbol].start()
+    ws_manager.start()
+    order_manager = OrderManager(okx_client, ws_private=ws_private, order_books=order_books, max_slippage=max_slippage, event_log=events)
+    risk_manager = RiskManager(event_log=events)
     state_machine = TradingState.SIGNAL
     position = 0
     entry_price = None
-    print("Starting trading state machine...")
+    journal = None
+    if state_dir:
+        # resume an open ladder after a crash instead of stacking a new position on top of it
+        journal = TraderJournal(state_dir, symbol)
+        position, entry_price = _recover_state(journal, okx_client, symbol, risk_manager, events)
+        if position != 0:
+            state_machine = TradingState.RMS
+    events.info(EventType.STATE, msg="starting trading state machine", symbol=symbol, state=state_machine)
+    span = None
     while True:
         if state_machine == TradingState.SIGNAL:
+            pass_ns = time.perf_counter_ns()
+            bar_ns = None
             # update latest klines from websocket queues
+            while local_aggregation and not q_1m.empty():
+                base_bar = q_1m.get()
+                bar_ns = _bar_received(tracker, base_bar) or bar_ns
+                for bar in aggregator.update(base_bar):
+                    _append_bar(windows[bar["interval"]], _normalize_kline(bar))
+                    events.info(EventType.BAR, symbol=symbol, interval=bar['interval'], close=bar["close"])
+
             while not q_15m.empty():
                 bar = q_15m.get()
+                bar_ns = _bar_received(tracker, bar) or bar_ns
                 state.m15.append(_normalize_kline(bar))
-                print("[MAIN] new 15m bar", bar.get("close", bar.get("close_price")))
+                events.info(EventType.BAR, symbol=symbol, interval="15m", close=bar.get("close", bar.get("close_price")))
 
             while not q_1h.empty():
                 bar = q_1h.get()
+                bar_ns = _bar_received(tracker, bar) or bar_ns
                 state.h1.append(_normalize_kline(bar))
-                print("[MAIN] new 1h bar", bar.get("close", bar.get("close_price")))
+                events.info(EventType.BAR, symbol=symbol, interval="1H", close=bar.get("close", bar.get("close_price")))
 
             df_15m = pd.DataFrame(state.m15.get_all())
             df_1h = pd.DataFrame(state.h1.get_all())
@@ -61,16 +133,31 @@ def trading_main(strategy_cls: Type, api_key: str, api_secret: str, passphrase:
                 time.sleep(1)
                 continue
 
+            # never trade on a dead feed: wait for the supervisor to reconnect and backfill
+            if ws.is_stale(max_price_age) or any(k.is_stale(max_kline_age) for k in kline_streams):
+                events.warning(EventType.MARKET, msg="market data is stale, waiting for reconnect", symbol=symbol)
+                time.sleep(1)
+                continue
+
             strategy = strategy_cls()
+            signal_ns = time.perf_counter_ns()
             signal = strategy.generate_signals(df_15m, df_1h)
-            current_price = ws.get_last_price()
+            tracker.record_since("signal.compute", signal_ns)
+            snap = ws.get_snapshot()
             if signal == 1:
                 order_side = 'long'
+                current_price = snap.buy_price()
             elif signal == -1:
                 order_side = 'short'
+                current_price = snap.sell_price()
             else:
                 time.sleep(1)
                 continue
+            # measured from the candle that triggered the signal, or from this pass when
+            # the signal fires on bars that were already in the window
+            span = tracker.span("entry", start_ns=bar_ns or pass_ns)
+            span.mark("signal")
+            events.info(EventType.SIGNAL, symbol=symbol, signal=signal, side=order_side, price=current_price)
             state_machine = TradingState.OMS
             oms_action = order_side
             oms_qty = qty
@@ -78,7 +165,10 @@ def trading_main(strategy_cls: Type, api_key: str, api_secret: str, passphrase:
         elif state_machine == TradingState.OMS:
             prev_position = position
             total_qty = sum(p["qty"] for p in risk_manager.positions)
-            print(f"[OMS] execute order: {oms_action}")
+            events.info(EventType.ORDER, symbol=symbol, action=oms_action, qty=total_qty if oms_action.startswith('close') else oms_qty, price=oms_price)
+            if journal:
+                journal.record("order", action=oms_action, qty=total_qty if oms_action.startswith('close') else oms_qty, price=oms_price)
+            placed_at = time.time()
             if oms_action == 'long':
                 resp = order_manager.open_long(symbol, oms_qty)
             elif oms_action == 'short':
@@ -89,19 +179,36 @@ def trading_main(strategy_cls: Type, api_key: str, api_secret: str, passphrase:
                 resp = order_manager.close_position(symbol, total_qty, position_side='short')
             else:
                 resp = None
+            span.mark("order_ack")
             order_id = None
             # Extract order_id from response
             if resp and 'data' in resp and len(resp['data']) > 0:
                 order_id = resp['data'][0].get('ordId')
             if order_id:
-                filled = wait_order_filled(okx_client, symbol, order_id)
+                filled = order_manager.wait_filled(symbol, order_id, placed_at=placed_at)
+                span.mark("filled" if filled else "fill_timeout")
+                span.finish()
                 if not filled:
-                    print("[OMS] order is not filled in time, retrying...")
-                    state_machine = TradingState.SIGNAL
+                    events.warning(EventType.FILL, msg="order is not filled in time, retrying", symbol=symbol, order_id=order_id, action=oms_action)
+                    if journal:
+                        journal.record("order_done", order_id=order_id, filled=False)
+                    # 有持倉時回到 RMS 繼續管止盈與加倉，空倉才回 SIGNAL
+                    state_machine = TradingState.RMS if position != 0 else TradingState.SIGNAL
                     continue
+                events.info(EventType.FILL, symbol=symbol, order_id=order_id, action=oms_action, price=oms_price)
             else:
-                print("[OMS] No order_id found in response, moving to SIGNAL state")
-                state_machine = TradingState.SIGNAL
+                reason = resp.get('rejected') if resp else None
+                next_state = TradingState.RMS if position != 0 else TradingState.SIGNAL
+                if reason:
+                    events.warning(EventType.ORDER, msg=f"order rejected ({reason}), back to {next_state.upper()}", symbol=symbol, action=oms_action, qty=oms_qty)
+                else:
+                    events.warning(EventType.ORDER, msg=f"no order_id in response, back to {next_state.upper()}", symbol=symbol, action=oms_action)
+                if journal:
+                    journal.record("order_done", order_id=None, filled=False)
+                state_machine = next_state
+                if reason and position != 0:
+                    # 盤口未改善前 RMS 會再觸發同一層加倉，隔一秒再評估
+                    time.sleep(1)
                 continue
             if oms_action in ('long', 'short'):
                 if prev_position == 0:
@@ -109,37 +216,114 @@ def trading_main(strategy_cls: Type, api_key: str, api_secret: str, passphrase:
                     entry_price = oms_price
                     risk_manager.reset()
                     risk_manager.add_position(entry_price, base_qty=oms_qty)
+                    if journal:
+                        journal.record("open", position=position, entry_price=entry_price, **risk_manager.positions[-1])
                 else:
                     # adding to existing position
                     risk_manager.add_position(oms_price, base_qty=oms_qty)
+                    if journal:
+                        journal.record("add", **risk_manager.positions[-1])
                 state_machine = TradingState.RMS
             elif oms_action.startswith('close'):
                 position = 0
                 entry_price = None
+                if journal:
+                    journal.record("close", price=oms_price)
                 state_machine = TradingState.SIGNAL
         elif state_machine == TradingState.RMS:
-            current_price = ws.get_last_price()
-            print(f"[RMS] entry={entry_price} price={current_price} pos={position}")
-            if risk_manager.should_add_position(entry_price, current_price, position):
+            pass_ns = time.perf_counter_ns()
+            snap = ws.get_snapshot()
+            if ws.is_stale(max_price_age):
+                events.warning(EventType.MARKET, msg="price is stale, waiting", symbol=symbol, last_update=ws.last_update_time)
+                time.sleep(1)
+                continue
+            # market orders fill at the touch: adds cross the spread in the position's
+            # direction, exits in the opposite one
+            add_price = snap.buy_price() if position == 1 else snap.sell_price()
+            exit_price = snap.sell_price() if position == 1 else snap.buy_price()
+            events.debug(EventType.RMS, symbol=symbol, entry=entry_price, bid=snap.bid, ask=snap.ask, pos=position, latency_ms=snap.latency_ms)
+            if risk_manager.should_add_position(entry_price, add_price, position):
                 add_qty = risk_manager.get_next_qty(base_qty=qty)
                 if add_qty:
-                    print(f"[RMS] adding position, qty={add_qty}")
+                    events.info(EventType.RMS, msg="adding position", symbol=symbol, qty=add_qty, price=add_price)
                     oms_action = 'long' if position == 1 else 'short'
                     oms_qty = add_qty
-                    oms_price = current_price
+                    oms_price = add_price
+                    span = tracker.span("add", start_ns=pass_ns)
+                    span.mark("decision")
                     state_machine = TradingState.OMS
                     continue
 
-            if risk_manager.check_take_profit(current_price, position):
-                print("[RMS] taking profit, closing position")
+            peak = risk_manager.trailing_peak
+            take_profit = risk_manager.check_take_profit(exit_price, position)
+            if journal and risk_manager.trailing_peak != peak:
+                journal.record("trailing", peak=risk_manager.trailing_peak)
+            if take_profit:
+                events.info(EventType.TP, msg="taking profit, closing position", symbol=symbol, price=exit_price)
                 oms_action = 'close_long' if position == 1 else 'close_short'
                 total_qty = sum(p["qty"] for p in risk_manager.positions)
                 oms_qty = total_qty
-                oms_price = current_price
+                oms_price = exit_price
+                span = tracker.span("exit", start_ns=pass_ns)
+                span.mark("decision")
                 state_machine = TradingState.OMS
                 continue
             time.sleep(1)
 
+def _bar_received(tracker, bar: dict):
+    # queue wait of a websocket bar; REST backfilled bars carry no receive time
+    recv_ns = bar.get("recv_ns")
+    tracker.record_since("kline.queue", recv_ns)
+    return recv_ns
+
+def _recover_state(journal, okx_client, symbol, risk_manager, events):
+    # journal replay, then reconcile with the exchange; returns (position, entry_price)
+    started = time.perf_counter()
+    state = journal.recover()
+    try:
+        rows = okx_client.get_futures_positions(symbol).get('data', [])
+    except Exception as e:
+        events.warning(EventType.STATE, msg="position query failed, resuming from journal only", symbol=symbol, error=str(e))
+        rows = None
+    if rows is not None:
+        reconciled, reason = reconcile_state(state, rows)
+        if reason:
+            events.warning(EventType.STATE, msg="reconciled with exchange", symbol=symbol, reason=reason)
+            state = journal.record("reconcile", state=reconciled, reason=reason)
+    risk_manager.positions = [dict(p) for p in state["ladder"]]
+    risk_manager.trailing_peak = state["trailing_peak"]
+    events.info(EventType.STATE, msg="trader state recovered", symbol=symbol, position=state["position"],
+                entry_price=state["entry_price"], layers=len(state["ladder"]), seq=journal.seq,
+                ms=round((time.perf_counter() - started) * 1000, 3))
+    return state["position"], state["entry_price"]
+
+def _bootstrap_window(window, symbol: str, interval: str, limit: int):
+    # OKX returns newest first and includes the still-open candle
+    klines = [k for k in fetch_futures_klines(symbol=symbol, interval=interval, limit=limit) if k.get('confirm') == '1']
+    for k in sorted(klines, key=lambda k: k['timestamp']):
+        window.append(_normalize_kline(k))
+
+def _last_ts_ms(window):
+    last = window.last()
+    return int(last['timestamp'].value // 1_000_000) if last is not None else None
+
+def _rest_bar(r: dict) -> dict:
+    # KlineDownloader row -> aggregator base bar
+    return {
+        'ts': int(r['timestamp']),
+        'open': r['open'],
+        'high': r['high'],
+        'low': r['low'],
+        'close': r['close'],
+        'volume': r['volume'],
+    }
+
+def _append_bar(window, bar: dict):
+    last = window.last()
+    if last is not None and bar['timestamp'] <= last['timestamp']:
+        return
+    window.append(bar)
+
 def _normalize_kline(k: dict) -> dict:
     if 'timestamp' in k:
         ts = k['timestamp']
@@ -0,0 +1,73 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import time
+from connector import ws_decode
+from connector.ws_decode import route_key, decode_tickers, decode_candles
+
+# 實際 OKX 推播格式 (tickers 全欄位、candle、訂閱 ack、pong)
+TICKER = json.dumps({
+    "arg": {"channel": "tickers", "instId": "BTC-USDT-SWAP"},
+    "data": [{
+        "instType": "SWAP", "instId": "BTC-USDT-SWAP", "last": "67012.3", "lastSz": "0.12",
+        "askPx": "67012.4", "askSz": "215", "bidPx": "67012.3", "bidSz": "97",
+        "open24h": "66120.1", "high24h": "67555.0", "low24h": "65870.2",
+        "volCcy24h": "123456.78", "vol24h": "12345678", "sodUtc0": "66500.1", "sodUtc8": "66300.4",
+        "ts": "1718000000123"
+    }]
+}, separators=(',', ':'))
+CANDLE = json.dumps({
+    "arg": {"channel": "candle1m", "instId": "BTC-USDT-SWAP"},
+    "data": [["1718000000000", "67000.1", "67020.0", "66990.5", "67012.3", "1234", "12.34", "827000.1", "0"]]
+}, separators=(',', ':'))
+ACK = json.dumps({"event": "subscribe", "arg": {"channel": "tickers", "instId": "BTC-USDT-SWAP"}, "connId": "a4d3ae55"},
+                 separators=(',', ':'))
+PONG = "pong"
+
+
+def bench(name, fn, messages, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        for m in messages:
+            fn(m)
+    elapsed = time.perf_counter() - start
+    per_msg = elapsed / (n * len(messages)) * 1e6
+    print(f"{name:<28} {per_msg:8.2f} us/msg")
+
+
+def baseline_ticker(m):
+    # 原本的寫法: 每則完整 json.loads
+    if m == 'pong':
+        return None
+    data = json.loads(m)
+    if 'data' in data and len(data['data']) > 0:
+        return float(data['data'][0].get('last', 0))
+
+
+def fast_ticker(m):
+    if route_key(m) is None:
+        return None
+    return float(decode_tickers(m)[0].last)
+
+
+def baseline_candle(m):
+    data = json.loads(m)
+    return data["data"][0][8] if "data" in data else None
+
+
+def fast_candle(m):
+    if route_key(m) is None:
+        return None
+    return decode_candles(m)[0][8]
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"backend: {ws_decode.BACKEND}, {n} iterations")
+    bench("ticker json.loads", baseline_ticker, [TICKER], n)
+    bench("ticker fast path", fast_ticker, [TICKER], n)
+    bench("candle json.loads", baseline_candle, [CANDLE], n)
+    bench("candle fast path", fast_candle, [CANDLE], n)
+    bench("ack/pong json.loads", baseline_ticker, [ACK, PONG], n)
+    bench("ack/pong pre-filter", fast_ticker, [ACK, PONG], n)
@@ -1,77 +1,24 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import time
-import ccxt
 import pandas as pd
-
-def fetch_ohlcv_paginated(
-    exchange,
-    symbol: str,
-    timeframe: str = "15m",
-    since_ms: int | None = None,
-    until_ms: int | None = None,
-    limit: int = 300,
-    max_candles: int = 50000,
-):
-    all_rows = []
-    tf_ms = exchange.parse_timeframe(timeframe) * 1000
-
-    if since_ms is None:
-        raise ValueError("建議一定要傳 since_ms 否則回傳範圍看交易所預設。")
-
-    cursor = since_ms
-
-    while True:
-        if until_ms is not None and cursor >= until_ms:
-            break
-        if len(all_rows) >= max_candles:
-            break
-
-        ohlcv = exchange.fetch_ohlcv(symbol, timeframe=timeframe, since=cursor, limit=limit)
-
-        if not ohlcv:
-            break
-
-        all_rows.extend(ohlcv)
-
-        last_ts = ohlcv[-1][0]
-        next_cursor = last_ts + tf_ms
-
-        if next_cursor <= cursor:
-            break
-
-        cursor = next_cursor
-        time.sleep(exchange.rateLimit / 1000)
-
-    df = pd.DataFrame(all_rows, columns=["ts", "open", "high", "low", "close", "volume"])
-    df = df.drop_duplicates(subset=["ts"]).sort_values("ts").reset_index(drop=True)
-    df["ts"] = pd.to_datetime(df["ts"], unit="ms", utc=True)
+from connector.kline_downloader import interval_to_ms
+from datawarehouse.sync import KlineSync
+from datawarehouse.kline_db import fetch_klines_range_from_db
+
+def export_backtest_csv(symbol: str, interval: str, days: int, csv_path: str, db_path: str = "datawarehouse/kline.db"):
+    # 只補抓本地缺少的區間，再從資料庫匯出同一區間 (最近 days 天已收盤的K線) 的回測用 CSV
+    now = int(time.time() * 1000)
+    end_ms = now - now % interval_to_ms(interval)
+    start_ms = end_ms - days * 24 * 60 * 60 * 1000
+    KlineSync(exchange="okx", market_type="futures", db_path=db_path).sync(symbol, interval, lookback_days=days, end_time=end_ms)
+    df = fetch_klines_range_from_db(symbol, interval, start_ts=start_ms, end_ts=end_ms, db_path=db_path)
+    df = df.rename(columns={"timestamp": "ts"})
+    df["ts"] = pd.to_datetime(df["ts"].astype("int64"), unit="ms", utc=True)
+    df.to_csv(csv_path, index=False)
     return df
 
 
 if __name__ == "__main__":
-    ex = ccxt.okx({
-        "enableRateLimit": True,
-        "options": {
-            "defaultType": "swap",
-        },
-    })
-
-    ex.load_markets()
-
-    symbol = "BTC/USDT:USDT"
-    if symbol not in ex.markets:
-        raise ValueError(f"Symbol not found in markets: {symbol}. 你可印 ex.symbols 找正確 symbol。")
-
-    now = ex.milliseconds()
-    since = now - 360 * 24 * 60 * 60 * 1000
-
-    df = fetch_ohlcv_paginated(
-        exchange=ex,
-        symbol=symbol,
-        timeframe="1m",
-        since_ms=since,
-        until_ms=None,
-        limit=300,
-        max_candles=500000,
-    )
-
-    df.to_csv("data/BTC_USDT_1m_okx_swap.csv", index=False)
+    export_backtest_csv("BTC-USDT", "1m", days=360, csv_path="data/BTC_USDT_1m_okx_swap.csv")
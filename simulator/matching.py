@@ -0,0 +1,192 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class SimError(Exception):
+    # 以 OKX 的錯誤碼表示，Binance handler 會再轉成自己的格式
+    def __init__(self, code: str, message: str):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+        self.message = message
+
+
+class MatchingEngine:
+    """
+    Price-driven matching for the exchange simulator.
+
+    There is no order book: market orders fill in full at the current touch
+    (ask for buys, bid for sells) plus `slippage_bps`, and limit orders rest
+    until a quote crosses them. Quotes come from whatever feeds the simulator
+    (replayed websocket frames or stored klines) through `on_quote`.
+
+    Orders and positions are kept in OKX's field names (ordId, state, posSide,
+    avgPx, ...) so the OKX handlers can return them as-is. Positions are per
+    (instId, posSide); `net` positions are signed.
+    """
+
+    def __init__(self, slippage_bps: float = 0.0, balance: float = 100_000.0):
+        self.slippage_bps = slippage_bps
+        self.balance = balance
+        self.quotes: Dict[str, Tuple[float, float, float, int]] = {}  # instId -> (bid, ask, last, ts)
+        self.orders: Dict[str, dict] = {}
+        self.positions: Dict[Tuple[str, str], dict] = {}
+        self.listeners: List[Callable[[str, dict], None]] = []  # (channel 'orders'|'positions', row)
+        self._next_id = 1
+        self._lock = threading.RLock()
+
+    def _emit(self, channel: str, row: dict):
+        for listener in self.listeners:
+            listener(channel, dict(row))
+
+    def on_quote(self, inst_id: str, bid: float, ask: float, last: float, ts: Optional[int] = None):
+        ts = ts or int(time.time() * 1000)
+        with self._lock:
+            self.quotes[inst_id] = (bid or last, ask or last, last, ts)
+            for order in list(self.orders.values()):
+                if order['instId'] != inst_id or order['state'] != 'live':
+                    continue
+                px = float(order['px'])
+                if order['side'] == 'buy' and ask and ask <= px:
+                    self._fill(order, ask)
+                elif order['side'] == 'sell' and bid and bid >= px:
+                    self._fill(order, bid)
+
+    def _touch(self, inst_id: str, side: str) -> float:
+        quote = self.quotes.get(inst_id)
+        if quote is None:
+            raise SimError("51000", f"No market price for {inst_id}")
+        return quote[1] if side == 'buy' else quote[0]
+
+    def _position(self, inst_id: str, pos_side: str) -> dict:
+        key = (inst_id, pos_side)
+        if key not in self.positions:
+            self.positions[key] = {
+                'instId': inst_id, 'instType': 'SWAP' if inst_id.endswith('-SWAP') else 'SPOT',
+                'posSide': pos_side, 'mgnMode': 'isolated', 'pos': '0', 'avgPx': '', 'upl': '0',
+                'realizedPnl': '0', 'last': '', 'uTime': '',
+            }
+        return self.positions[key]
+
+    def _signed_qty(self, order: dict) -> float:
+        sz = float(order['sz'])
+        if order['posSide'] == 'net':
+            return sz if order['side'] == 'buy' else -sz
+        # 雙向持倉: 開多/平空為 buy，開空/平多為 sell，各自以正數表示部位
+        opening = (order['side'] == 'buy') == (order['posSide'] == 'long')
+        return sz if opening else -sz
+
+    def _fill(self, order: dict, touch: float):
+        slip = touch * self.slippage_bps / 10_000
+        price = touch + slip if order['side'] == 'buy' else touch - slip
+        now = str(int(time.time() * 1000))
+        order.update(state='filled', fillSz=order['sz'], accFillSz=order['sz'], fillPx=str(price),
+                     avgPx=str(price), uTime=now)
+
+        pos = self._position(order['instId'], order['posSide'])
+        qty = float(pos['pos'])
+        delta = self._signed_qty(order)
+        new_qty = qty + delta
+        avg = float(pos['avgPx']) if pos['avgPx'] else 0.0
+        if qty == 0 or (qty > 0) == (delta > 0):
+            # 加倉: 更新均價
+            avg = (avg * abs(qty) + price * abs(delta)) / abs(new_qty) if new_qty else 0.0
+        else:
+            closed = min(abs(delta), abs(qty))
+            direction = 1 if qty > 0 else -1
+            if pos['posSide'] == 'short':
+                direction = -1
+            pnl = (price - avg) * closed * direction
+            pos['realizedPnl'] = str(float(pos['realizedPnl']) + pnl)
+            self.balance += pnl
+            if new_qty != 0 and (new_qty > 0) != (qty > 0):
+                avg = price  # net 部位反手
+        pos.update(pos=str(new_qty), avgPx=str(avg) if new_qty else '', last=str(price), uTime=now)
+        self._emit('orders', order)
+        self._emit('positions', pos)
+
+    def place(self, inst_id: str, side: str, ord_type: str, sz: float, px: Optional[float] = None,
+              pos_side: str = 'net', reduce_only: bool = False, cl_ord_id: str = '') -> dict:
+        side = side.lower()
+        ord_type = ord_type.lower()
+        pos_side = (pos_side or 'net').lower()
+        if side not in ('buy', 'sell'):
+            raise SimError("51000", f"Parameter side error: {side}")
+        if sz <= 0:
+            raise SimError("51000", "Parameter sz error")
+        if ord_type != 'market' and px is None:
+            raise SimError("51000", "Parameter px error")
+        with self._lock:
+            touch = self._touch(inst_id, side)
+            held = float(self._position(inst_id, pos_side)['pos'])
+            if pos_side == 'net':
+                closing = (held > 0 and side == 'sell') or (held < 0 and side == 'buy')
+            else:
+                # 雙向持倉下平倉量不能超過持倉
+                closing = (side == 'sell') == (pos_side == 'long')
+                if closing and sz > held:
+                    raise SimError("51169", "Order failed because you don't have any positions in this direction")
+            if reduce_only and (not closing or sz > abs(held)):
+                raise SimError("51169", "Order failed because you don't have any positions in this direction")
+            now = str(int(time.time() * 1000))
+            order = {
+                'ordId': str(self._next_id), 'clOrdId': cl_ord_id or '', 'instId': inst_id,
+                'side': side, 'posSide': pos_side, 'ordType': ord_type, 'sz': str(sz),
+                'px': '' if px is None else str(px), 'reduceOnly': str(bool(reduce_only)).lower(),
+                'state': 'live', 'fillSz': '0', 'accFillSz': '0', 'fillPx': '', 'avgPx': '',
+                'cTime': now, 'uTime': now,
+            }
+            self._next_id += 1
+            self.orders[order['ordId']] = order
+            marketable = ord_type == 'market' or (side == 'buy' and touch <= px) or (side == 'sell' and touch >= px)
+            if marketable:
+                if ord_type == 'post_only':
+                    order['state'] = 'canceled'
+                else:
+                    self._fill(order, touch)
+            elif ord_type in ('ioc', 'fok'):
+                order['state'] = 'canceled'
+            if order['state'] != 'filled':
+                self._emit('orders', order)
+            return dict(order)
+
+    def cancel(self, inst_id: str, ord_id: str = None, cl_ord_id: str = None) -> dict:
+        with self._lock:
+            order = self.find(ord_id, cl_ord_id)
+            if order is None or order['instId'] != inst_id:
+                raise SimError("51603", "Order does not exist")
+            if order['state'] != 'live':
+                raise SimError("51400", "Order cancellation failed as the order has been filled, canceled or does not exist")
+            order.update(state='canceled', uTime=str(int(time.time() * 1000)))
+            self._emit('orders', order)
+            return dict(order)
+
+    def find(self, ord_id: str = None, cl_ord_id: str = None) -> Optional[dict]:
+        with self._lock:
+            if ord_id:
+                return self.orders.get(str(ord_id))
+            for order in self.orders.values():
+                if cl_ord_id and order['clOrdId'] == cl_ord_id:
+                    return order
+            return None
+
+    def open_orders(self, inst_id: str = None) -> List[dict]:
+        with self._lock:
+            return [dict(o) for o in self.orders.values()
+                    if o['state'] == 'live' and (inst_id is None or o['instId'] == inst_id)]
+
+    def position_rows(self, inst_id: str = None) -> List[dict]:
+        with self._lock:
+            rows = []
+            for (pos_inst, _), pos in self.positions.items():
+                if float(pos['pos']) == 0 or (inst_id is not None and pos_inst != inst_id):
+                    continue
+                row = dict(pos)
+                quote = self.quotes.get(pos_inst)
+                if quote is not None and row['avgPx']:
+                    qty = float(row['pos'])
+                    sign = -1 if row['posSide'] == 'short' else 1
+                    row['upl'] = str((quote[2] - float(row['avgPx'])) * qty * sign)
+                    row['last'] = str(quote[2])
+                rows.append(row)
+            return rows
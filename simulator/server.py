@@ -0,0 +1,752 @@
+"""
+Local OKX/Binance Exchange Simulator
+
+A stand-in for the exchange endpoints the connectors use, so OKXOrderClient,
+BinanceOrderClient, OrderManager and trading_main can be run and load-tested
+on one machine without touching the real exchange:
+
+- REST (stdlib ThreadingHTTPServer): signed OKX order placement / get_order /
+  cancel / batch / pending orders / positions / balance, public candles and
+  tickers; signed Binance order / openOrders / positionRisk / account, klines
+  and book tickers
+- websockets on the same port (/ws/v5/public, /ws/v5/business,
+  /ws/v5/private): subscribe acks, text ping/pong, login, market data pushes
+  and private `orders` / `positions` pushes
+- a MatchingEngine driven by replayed prices: recorded websocket frames
+  (connector.ws_recorder chunks) or stored klines (KlineStore)
+- latency / jitter / error-rate injection on REST and `drop_connections()` to
+  exercise websocket reconnects
+
+Point the connectors at it with the environment from `ExchangeSimulator.env()`
+(OKX_BASE_URL, OKX_WS_*_URL, BINANCE_BASE_URL and simulator credentials):
+
+    python simulator/server.py --klines datawarehouse/kline.db --symbol BTC-USDT --speed 60
+    python simulator/server.py --replay data/ws --speed 1 --latency 0.05 --error-rate 0.01
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+from connector.ws_decode import loads, route_key
+from connector.ws_recorder import chunk_files, read_frames
+from engine.aggregator import KlineAggregator, interval_to_ms
+from simulator.matching import MatchingEngine, SimError
+from simulator.ws_server import WsSession, accept_key
+
+_COMPACT = (',', ':')
+
+# Binance interval -> OKX bar
+_BINANCE_BARS = {"1h": "1H", "2h": "2H", "4h": "4H", "6h": "6H", "12h": "12H", "1d": "1D", "1w": "1W"}
+_BINANCE_STATUS = {"live": "NEW", "filled": "FILLED", "canceled": "CANCELED"}
+_BINANCE_CODES = {"51603": -2013, "51400": -2011}
+
+
+def _frame(arg: dict, data: list) -> str:
+    # 欄位順序與 OKX 相同 (arg 在前)，connector.ws_decode.route_key 才能直接路由
+    return json.dumps({"arg": arg, "data": data}, separators=_COMPACT)
+
+
+class ExchangeSimulator:
+    """
+    Simulated OKX + Binance exchange on one local port.
+
+    Args:
+        host / port: Listen address; port 0 picks a free port
+        api_key / api_secret / passphrase: Credentials the signed endpoints accept
+        latency (float): Seconds added to every REST response
+        jitter (float): Extra uniform random latency in [0, jitter) seconds
+        error_rate (float): Probability that a REST request fails with a
+            retryable exchange error (OKX 50001 / Binance -1001)
+        slippage_bps (float): Market order fill price offset from the touch
+        verify_signatures (bool): Reject requests whose HMAC signature is wrong
+        seed (int): Random seed for reproducible latency/error injection
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, api_key: str = "sim-key",
+                 api_secret: str = "sim-secret", passphrase: str = "sim-passphrase", latency: float = 0.0,
+                 jitter: float = 0.0, error_rate: float = 0.0, slippage_bps: float = 0.0,
+                 verify_signatures: bool = True, seed: Optional[int] = None):
+        self.host = host
+        self.port = port
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.passphrase = passphrase
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.verify_signatures = verify_signatures
+        self.engine = MatchingEngine(slippage_bps=slippage_bps)
+        self.engine.listeners.append(self._on_engine_event)
+        self.candles: Dict[Tuple[str, str], List[list]] = {}  # (instId, bar) -> OKX rows, ts 升冪
+        self.tickers: Dict[str, dict] = {}
+        self.requests: Dict[str, int] = {}
+        self.sessions: List[WsSession] = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._feeds: List[threading.Thread] = []
+        self._stop = threading.Event()
+
+    # ==================== LIFECYCLE ====================
+
+    def start(self):
+        handler = type("SimHandler", (_SimHandler,), {"sim": self})
+        self._server = ThreadingHTTPServer((self.host, self.port), handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"[SIM] listening on {self.base_url}")
+
+    def stop(self):
+        self._stop.set()
+        self.drop_connections()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        for feed in self._feeds:
+            feed.join()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def ws_url(self, kind: str) -> str:
+        return f"ws://{self.host}:{self.port}/ws/v5/{kind}"
+
+    def env(self) -> Dict[str, str]:
+        """Environment that points every connector at this simulator."""
+        return {
+            "OKX_BASE_URL": self.base_url,
+            "OKX_WS_PUBLIC_URL": self.ws_url("public"),
+            "OKX_WS_BUSINESS_URL": self.ws_url("business"),
+            "OKX_WS_PRIVATE_URL": self.ws_url("private"),
+            "OKX_API_KEY": self.api_key,
+            "OKX_API_SECRET": self.api_secret,
+            "OKX_PASSPHRASE": self.passphrase,
+            "BINANCE_BASE_URL": self.base_url,
+            "BINANCE_API_KEY": self.api_key,
+            "BINANCE_API_SECRET": self.api_secret,
+        }
+
+    def drop_connections(self):
+        """Close every websocket without a close frame, like an exchange-side disconnect."""
+        with self._lock:
+            sessions, self.sessions = self.sessions, []
+        for session in sessions:
+            session.close()
+
+    # ==================== MARKET DATA ====================
+
+    def publish(self, key: Tuple[str, str], frame: str):
+        with self._lock:
+            sessions = [s for s in self.sessions if key in s.subscriptions]
+        for session in sessions:
+            session.send(frame)
+
+    def on_ticker(self, inst_id: str, bid: float, ask: float, last: float, ts: int, publish: bool = True):
+        ticker = {"instType": "SWAP" if inst_id.endswith("-SWAP") else "SPOT", "instId": inst_id,
+                  "last": repr(last), "lastSz": "1", "askPx": repr(ask), "askSz": "100", "bidPx": repr(bid),
+                  "bidSz": "100", "vol24h": "0", "ts": str(ts)}
+        self.tickers[inst_id] = ticker
+        self.engine.on_quote(inst_id, bid, ask, last, ts)
+        if publish:
+            self.publish(("tickers", inst_id), _frame({"channel": "tickers", "instId": inst_id}, [ticker]))
+
+    def add_candle(self, inst_id: str, bar: str, row: list, publish: bool = True):
+        """Append a confirmed OKX candle row [ts, o, h, l, c, vol, volCcy, volCcyQuote, '1']."""
+        rows = self.candles.setdefault((inst_id, bar), [])
+        if rows and int(rows[-1][0]) >= int(row[0]):
+            return
+        rows.append(row)
+        if publish:
+            channel = f"candle{bar}"
+            self.publish((channel, inst_id), _frame({"channel": channel, "instId": inst_id}, [row]))
+
+    def load_candles(self, inst_id: str, bar: str, bars: Iterable[dict]):
+        """Preload candle history (dicts with timestamp/ts, open, high, low, close, volume) for REST bootstraps."""
+        for b in bars:
+            self.add_candle(inst_id, bar, _okx_row(b), publish=False)
+
+    def _pace(self, ts: float, start: List[Optional[float]], speed: Optional[float]) -> bool:
+        # start = [第一筆資料時間, 開始的 wall clock]；回傳 False 表示已停止
+        if speed is None:
+            return not self._stop.is_set()
+        if start[0] is None:
+            start[0], start[1] = ts, time.perf_counter()
+        delay = (ts - start[0]) / speed - (time.perf_counter() - start[1])
+        return not (delay > 0 and self._stop.wait(delay)) and not self._stop.is_set()
+
+    def replay_recording(self, path: str, speed: Optional[float] = 1.0) -> int:
+        """Replay connector.ws_recorder chunks: frames go to subscribers, tickers move the matching engine."""
+        start = [None, None]
+        frames = 0
+        for ts, message in read_frames(chunk_files(path)):
+            key = route_key(message)
+            if key is None:
+                continue
+            if not self._pace(ts, start, speed):
+                break
+            channel, inst_id = key
+            if channel == "tickers":
+                for t in loads(message)["data"]:
+                    last = float(t.get("last") or 0)
+                    self.engine.on_quote(inst_id, float(t.get("bidPx") or last), float(t.get("askPx") or last),
+                                         last, int(t.get("ts") or ts * 1000))
+                    self.tickers[inst_id] = t
+            elif channel.startswith("candle"):
+                for row in loads(message)["data"]:
+                    if row[8] == "1":
+                        self.add_candle(inst_id, channel[len("candle"):], row, publish=False)
+            self.publish(key, message)
+            frames += 1
+        return frames
+
+    def replay_klines(self, inst_id: str, bars: List[dict], interval: str = "1m", speed: Optional[float] = 60.0,
+                      warmup: int = 300, aggregate: Tuple[str, ...] = ("15m", "1H", "4H"),
+                      spread_bps: float = 1.0, rebase: bool = True) -> int:
+        """
+        Drive the market from stored klines.
+
+        The first `warmup` bars become REST history only; each later bar is
+        played as four ticker pushes (open, low/high, high/low, close) spread
+        over the bar, then pushed as a confirmed candle. Higher `aggregate`
+        intervals are built with KlineAggregator and pushed when they close.
+        With `rebase` the bars are shifted so the first replayed bar opens at
+        the current wall-clock bar; clients that backfill "until now" after a
+        reconnect then stay within the simulated history.
+        """
+        bars = sorted(bars, key=_bar_ts)
+        aggregator = KlineAggregator(list(aggregate), base_interval=interval) if aggregate else None
+        step = interval_to_ms(interval)
+        if rebase and bars:
+            now = int(time.time() * 1000)
+            offset = now - now % step - _bar_ts(bars[min(warmup, len(bars) - 1)])
+            bars = [dict(b, timestamp=_bar_ts(b) + offset) for b in bars]
+        half_spread = spread_bps / 20_000
+        for b in bars[:warmup]:
+            self.add_candle(inst_id, interval, _okx_row(b), publish=False)
+            for closed in aggregator.update(_agg_bar(b)) if aggregator else ():
+                self.add_candle(inst_id, closed["interval"], _okx_row(closed), publish=False)
+
+        start = [None, None]
+        played = 0
+        for b in bars[warmup:]:
+            ts = _bar_ts(b)
+            o, h, l, c = float(b["open"]), float(b["high"]), float(b["low"]), float(b["close"])
+            path = (o, l, h, c) if c >= o else (o, h, l, c)
+            for i, price in enumerate(path):
+                tick_ts = ts + i * step // 4
+                if not self._pace(tick_ts / 1000, start, speed):
+                    return played
+                self.on_ticker(inst_id, price * (1 - half_spread), price * (1 + half_spread), price, tick_ts)
+            if not self._pace((ts + step) / 1000, start, speed):
+                return played
+            self.add_candle(inst_id, interval, _okx_row(b))
+            for closed in aggregator.update(_agg_bar(b)) if aggregator else ():
+                self.add_candle(inst_id, closed["interval"], _okx_row(closed))
+            played += 1
+        return played
+
+    def start_feed(self, target, *args, **kwargs) -> threading.Thread:
+        """Run a replay method on a background thread."""
+        feed = threading.Thread(target=target, args=args, kwargs=kwargs, daemon=True)
+        self._feeds.append(feed)
+        feed.start()
+        return feed
+
+    def _find_candles(self, inst_id: str, bar: str) -> List[list]:
+        # fetch_futures_klines 以 BTC-USDT 查詢永續合約，兩種 instId 都接受
+        for key in (inst_id, f"{inst_id}-SWAP", inst_id[:-len("-SWAP")] if inst_id.endswith("-SWAP") else None):
+            if key and (key, bar) in self.candles:
+                return self.candles[(key, bar)]
+        return []
+
+    # ==================== PRIVATE PUSHES ====================
+
+    def _on_engine_event(self, channel: str, row: dict):
+        inst_type = "SWAP" if row["instId"].endswith("-SWAP") else "SPOT"
+        self.publish((channel, inst_type), _frame({"channel": channel, "instType": inst_type, "uid": "sim"}, [row]))
+
+    # ==================== INJECTION / AUTH ====================
+
+    def inject(self) -> bool:
+        """Apply latency; True if this request should fail."""
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+        return self.error_rate > 0 and self._random.random() < self.error_rate
+
+    def okx_sign(self, timestamp: str, method: str, path: str, body: str) -> str:
+        digest = hmac.new(self.api_secret.encode(), (timestamp + method + path + body).encode(), hashlib.sha256).digest()
+        return base64.b64encode(digest).decode()
+
+    def binance_sign(self, payload: str) -> str:
+        return hmac.new(self.api_secret.encode(), payload.encode(), hashlib.sha256).hexdigest()
+
+    def binance_inst(self, symbol: str, futures: bool) -> str:
+        known = set(self.engine.quotes) | {inst for inst, _ in self.candles}
+        for inst in known:
+            parts = inst.split("-")
+            if "".join(parts[:2]) == symbol and inst.endswith("-SWAP") == futures:
+                return inst
+        for quote in ("USDT", "USDC", "BUSD", "USD"):
+            if symbol.endswith(quote):
+                inst = f"{symbol[:-len(quote)]}-{quote}"
+                return f"{inst}-SWAP" if futures else inst
+        return symbol
+
+
+def _bar_ts(bar: dict) -> int:
+    return int(bar.get("timestamp", bar.get("ts")))
+
+
+def _agg_bar(bar: dict) -> dict:
+    return {"ts": _bar_ts(bar), "open": bar["open"], "high": bar["high"], "low": bar["low"],
+            "close": bar["close"], "volume": bar.get("volume", 0)}
+
+
+def _okx_row(bar: dict) -> list:
+    close = float(bar["close"])
+    volume = float(bar.get("volume", 0))
+    return [str(_bar_ts(bar)), repr(float(bar["open"])), repr(float(bar["high"])), repr(float(bar["low"])),
+            repr(close), repr(volume), repr(volume), repr(volume * close), "1"]
+
+
+class _SimHandler(BaseHTTPRequestHandler):
+    sim: ExchangeSimulator = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    # ---------- plumbing ----------
+
+    def _reply(self, status: int, payload: Any):
+        body = json.dumps(payload, separators=_COMPACT).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, method: str):
+        if self.headers.get("Upgrade", "").lower() == "websocket":
+            return self._websocket()
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        self.body = self.rfile.read(length).decode() if length else ""
+        self.query = dict(parse_qsl(url.query))
+        route = _ROUTES.get((method, url.path))
+        sim = self.sim
+        sim.requests[url.path] = sim.requests.get(url.path, 0) + 1
+        is_binance = not url.path.startswith("/api/v5/")
+        if route is None:
+            return self._reply(404, {"code": -1100, "msg": "Not found"} if is_binance
+                               else {"code": "50000", "msg": f"Unknown endpoint {url.path}", "data": []})
+        if sim.inject():
+            return self._reply(503, {"code": -1001, "msg": "Internal error; unable to process your request."}) \
+                if is_binance else self._reply(200, {"code": "50001", "msg": "Service temporarily unavailable", "data": []})
+        func, signed = route
+        if signed and sim.verify_signatures:
+            error = self._check_binance(url.query) if is_binance else self._check_okx(method)
+            if error is not None:
+                return self._reply(401, error)
+        try:
+            status, payload = func(self)
+        except SimError as e:
+            if is_binance:
+                status, payload = 400, {"code": _BINANCE_CODES.get(e.code, -2010), "msg": e.message}
+            else:
+                status, payload = 200, {"code": "1", "msg": "All operations failed",
+                                        "data": [{"ordId": "", "sCode": e.code, "sMsg": e.message}]}
+        except (KeyError, ValueError) as e:
+            status, payload = (400, {"code": -1102, "msg": f"Bad parameter: {e}"}) if is_binance \
+                else (200, {"code": "50014", "msg": f"Parameter {e} can not be empty", "data": []})
+        self._reply(status, payload)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+    def _check_okx(self, method: str) -> Optional[dict]:
+        sim = self.sim
+        if self.headers.get("OK-ACCESS-KEY") != sim.api_key:
+            return {"code": "50111", "msg": "Invalid OK-ACCESS-KEY", "data": []}
+        if self.headers.get("OK-ACCESS-PASSPHRASE") != sim.passphrase:
+            return {"code": "50105", "msg": "Invalid OK-ACCESS-PASSPHRASE", "data": []}
+        expected = sim.okx_sign(self.headers.get("OK-ACCESS-TIMESTAMP", ""), method, self.path, self.body)
+        if not hmac.compare_digest(expected, self.headers.get("OK-ACCESS-SIGN", "")):
+            return {"code": "50113", "msg": "Invalid Sign", "data": []}
+        return None
+
+    def _check_binance(self, query: str) -> Optional[dict]:
+        sim = self.sim
+        if self.headers.get("X-MBX-APIKEY") != sim.api_key:
+            return {"code": -2015, "msg": "Invalid API-key, IP, or permissions for action."}
+        payload, _, signature = query.rpartition("&signature=")
+        if not hmac.compare_digest(sim.binance_sign(payload), signature):
+            return {"code": -1022, "msg": "Signature for this request is not valid."}
+        return None
+
+    # ---------- websocket ----------
+
+    def _websocket(self):
+        sim = self.sim
+        kind = urlsplit(self.path).path.rsplit("/", 1)[-1]
+        self.send_response(101, "Switching Protocols")
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept_key(self.headers.get("Sec-WebSocket-Key", "")))
+        self.end_headers()
+        self.wfile.flush()
+        session = WsSession(self.connection, self.rfile, kind, conn_id=f"sim{id(self) & 0xffffff:06x}")
+        with sim._lock:
+            sim.sessions.append(session)
+        try:
+            while True:
+                message = session.receive()
+                if message is None:
+                    break
+                if message == "ping":
+                    session.send("pong")
+                    continue
+                try:
+                    self._ws_request(session, loads(message))
+                except (ValueError, KeyError, TypeError):
+                    session.send(json.dumps({"event": "error", "code": "60012", "msg": f"Invalid request: {message}",
+                                             "connId": session.conn_id}))
+        finally:
+            with sim._lock:
+                if session in sim.sessions:
+                    sim.sessions.remove(session)
+            self.close_connection = True
+
+    def _ws_request(self, session: WsSession, request: dict):
+        sim = self.sim
+        op = request["op"]
+        if op == "login":
+            arg = request["args"][0]
+            ok = (arg.get("apiKey") == sim.api_key and arg.get("passphrase") == sim.passphrase and
+                  hmac.compare_digest(sim.okx_sign(arg.get("timestamp", ""), "GET", "/users/self/verify", ""),
+                                      arg.get("sign", "")))
+            session.logged_in = ok
+            reply = {"event": "login", "code": "0", "msg": ""} if ok else \
+                {"event": "error", "code": "60009", "msg": "Login failed."}
+            reply["connId"] = session.conn_id
+            session.send(json.dumps(reply))
+            return
+        if op not in ("subscribe", "unsubscribe"):
+            raise ValueError(op)
+        for arg in request["args"]:
+            if session.path == "private" and not session.logged_in:
+                session.send(json.dumps({"event": "error", "code": "60011", "msg": "Please log in",
+                                         "connId": session.conn_id}))
+                continue
+            key = (arg["channel"], arg.get("instId") or arg.get("instType", ""))
+            if op == "subscribe":
+                session.subscriptions.add(key)
+            else:
+                session.subscriptions.discard(key)
+            session.send(json.dumps({"event": op, "arg": arg, "connId": session.conn_id}))
+            if op == "subscribe" and arg["channel"] == "positions":
+                rows = sim.engine.position_rows()
+                if rows:
+                    session.send(_frame({"channel": "positions", "instType": key[1], "uid": "sim"}, rows))
+
+
+# ==================== OKX REST ====================
+
+def _okx_ok(data: list) -> Tuple[int, dict]:
+    return 200, {"code": "0", "msg": "", "data": data}
+
+
+def _okx_place(sim: ExchangeSimulator, o: dict) -> dict:
+    order = sim.engine.place(o["instId"], o["side"], o["ordType"], float(o["sz"]),
+                             px=float(o["px"]) if o.get("px") else None, pos_side=o.get("posSide", "net"),
+                             reduce_only=str(o.get("reduceOnly", "false")).lower() == "true",
+                             cl_ord_id=o.get("clOrdId", ""))
+    return {"ordId": order["ordId"], "clOrdId": order["clOrdId"], "tag": "", "sCode": "0", "sMsg": "Order placed"}
+
+
+def okx_place_order(h: _SimHandler):
+    return _okx_ok([_okx_place(h.sim, loads(h.body))])
+
+
+def okx_get_order(h: _SimHandler):
+    order = h.sim.engine.find(h.query.get("ordId"), h.query.get("clOrdId"))
+    if order is None or order["instId"] != h.query["instId"]:
+        return 200, {"code": "51603", "msg": "Order does not exist", "data": []}
+    return _okx_ok([dict(order)])
+
+
+def okx_cancel_order(h: _SimHandler):
+    o = loads(h.body)
+    order = h.sim.engine.cancel(o["instId"], o.get("ordId"), o.get("clOrdId"))
+    return _okx_ok([{"ordId": order["ordId"], "clOrdId": order["clOrdId"], "sCode": "0", "sMsg": ""}])
+
+
+def _okx_batch(h: _SimHandler, func) -> Tuple[int, dict]:
+    rows = []
+    for o in loads(h.body):
+        try:
+            rows.append(func(o))
+        except SimError as e:
+            rows.append({"ordId": o.get("ordId", ""), "clOrdId": o.get("clOrdId", ""), "sCode": e.code, "sMsg": e.message})
+    failed = sum(1 for r in rows if r["sCode"] != "0")
+    code = "0" if failed == 0 else ("1" if failed == len(rows) else "2")
+    return 200, {"code": code, "msg": "" if code == "0" else "Operation failed", "data": rows}
+
+
+def okx_batch_orders(h: _SimHandler):
+    return _okx_batch(h, lambda o: _okx_place(h.sim, o))
+
+
+def okx_cancel_batch_orders(h: _SimHandler):
+    def cancel(o):
+        order = h.sim.engine.cancel(o["instId"], o.get("ordId"), o.get("clOrdId"))
+        return {"ordId": order["ordId"], "clOrdId": order["clOrdId"], "sCode": "0", "sMsg": ""}
+    return _okx_batch(h, cancel)
+
+
+def okx_orders_pending(h: _SimHandler):
+    return _okx_ok(h.sim.engine.open_orders(h.query.get("instId")))
+
+
+def okx_positions(h: _SimHandler):
+    return _okx_ok(h.sim.engine.position_rows(h.query.get("instId")))
+
+
+def okx_balance(h: _SimHandler):
+    bal = repr(h.sim.engine.balance)
+    return _okx_ok([{"totalEq": bal, "details": [{"ccy": "USDT", "eq": bal, "availBal": bal, "cashBal": bal}]}])
+
+
+def okx_ack(h: _SimHandler):
+    return _okx_ok([loads(h.body) if h.body else {}])
+
+
+def okx_candles(h: _SimHandler):
+    rows = h.sim._find_candles(h.query["instId"], h.query.get("bar", "1m"))
+    limit = min(int(h.query.get("limit", 100)), 300)
+    ts = [int(r[0]) for r in rows]
+    hi = bisect_left(ts, int(h.query["after"])) if "after" in h.query else len(rows)
+    lo = bisect_right(ts, int(h.query["before"])) if "before" in h.query else 0
+    # OKX 由新到舊回傳，取範圍內最新的 limit 根
+    return _okx_ok(rows[lo:hi][-limit:][::-1])
+
+
+def okx_ticker(h: _SimHandler):
+    ticker = h.sim.tickers.get(h.query["instId"])
+    return _okx_ok([ticker] if ticker else [])
+
+
+def okx_tickers(h: _SimHandler):
+    inst_type = h.query.get("instType")
+    return _okx_ok([t for t in h.sim.tickers.values() if inst_type is None or t.get("instType") == inst_type])
+
+
+# ==================== BINANCE REST ====================
+
+def _binance_futures(h: _SimHandler) -> bool:
+    return h.path.startswith("/fapi/")
+
+
+def _binance_order(order: dict, symbol: str) -> dict:
+    pos_side = {"net": "BOTH"}.get(order["posSide"], order["posSide"].upper())
+    return {
+        "orderId": int(order["ordId"]), "symbol": symbol, "status": _BINANCE_STATUS[order["state"]],
+        "clientOrderId": order["clOrdId"], "price": order["px"] or "0", "avgPrice": order["avgPx"] or "0",
+        "origQty": order["sz"], "executedQty": order["accFillSz"], "type": order["ordType"].upper(),
+        "side": order["side"].upper(), "positionSide": pos_side, "reduceOnly": order["reduceOnly"] == "true",
+        "updateTime": int(order["uTime"]),
+    }
+
+
+def binance_place_order(h: _SimHandler):
+    q = h.query
+    symbol = q["symbol"]
+    inst_id = h.sim.binance_inst(symbol, _binance_futures(h))
+    ord_type = q["type"].lower()
+    if ord_type == "limit" and q.get("timeInForce") in ("IOC", "FOK"):
+        ord_type = q["timeInForce"].lower()
+    pos_side = {"BOTH": "net", "LONG": "long", "SHORT": "short"}.get(q.get("positionSide", "BOTH"), "net")
+    order = h.sim.engine.place(inst_id, q["side"], ord_type, float(q["quantity"]),
+                               px=float(q["price"]) if q.get("price") else None, pos_side=pos_side,
+                               reduce_only=q.get("reduceOnly") == "true", cl_ord_id=q.get("newClientOrderId", ""))
+    return 200, _binance_order(order, symbol)
+
+
+def binance_get_order(h: _SimHandler):
+    q = h.query
+    order = h.sim.engine.find(q.get("orderId"), q.get("origClientOrderId"))
+    if order is None:
+        raise SimError("51603", "Order does not exist.")
+    return 200, _binance_order(order, q["symbol"])
+
+
+def binance_cancel_order(h: _SimHandler):
+    q = h.query
+    inst_id = h.sim.binance_inst(q["symbol"], _binance_futures(h))
+    order = h.sim.engine.find(q.get("orderId"), q.get("origClientOrderId"))
+    if order is None:
+        raise SimError("51603", "Unknown order sent.")
+    return 200, _binance_order(h.sim.engine.cancel(inst_id, order["ordId"]), q["symbol"])
+
+
+def binance_open_orders(h: _SimHandler):
+    q = h.query
+    inst_id = h.sim.binance_inst(q["symbol"], _binance_futures(h)) if "symbol" in q else None
+    orders = h.sim.engine.open_orders(inst_id)
+    return 200, [_binance_order(o, "".join(o["instId"].split("-")[:2])) for o in orders]
+
+
+def binance_cancel_open_orders(h: _SimHandler):
+    inst_id = h.sim.binance_inst(h.query["symbol"], _binance_futures(h))
+    for order in h.sim.engine.open_orders(inst_id):
+        h.sim.engine.cancel(inst_id, order["ordId"])
+    return 200, {"code": 200, "msg": "The operation of cancel all open order is done."}
+
+
+def binance_position_risk(h: _SimHandler):
+    q = h.query
+    inst_id = h.sim.binance_inst(q["symbol"], True) if "symbol" in q else None
+    rows = []
+    for p in h.sim.engine.position_rows(inst_id):
+        qty = float(p["pos"]) * (-1 if p["posSide"] == "short" else 1)
+        rows.append({
+            "symbol": "".join(p["instId"].split("-")[:2]), "positionAmt": repr(qty), "entryPrice": p["avgPx"],
+            "markPrice": p["last"], "unRealizedProfit": p["upl"], "leverage": "10", "marginType": "isolated",
+            "positionSide": {"net": "BOTH"}.get(p["posSide"], p["posSide"].upper()),
+        })
+    return 200, rows
+
+
+def binance_account(h: _SimHandler):
+    bal = repr(h.sim.engine.balance)
+    return 200, {"totalWalletBalance": bal, "availableBalance": bal,
+                 "assets": [{"asset": "USDT", "walletBalance": bal, "availableBalance": bal}],
+                 "balances": [{"asset": "USDT", "free": bal, "locked": "0"}]}
+
+
+def binance_ack(h: _SimHandler):
+    return 200, dict(h.query, code=200, msg="success")
+
+
+def binance_klines(h: _SimHandler):
+    q = h.query
+    interval = q.get("interval", "1m")
+    bar = _BINANCE_BARS.get(interval, interval)
+    rows = h.sim._find_candles(h.sim.binance_inst(q["symbol"], _binance_futures(h)), bar)
+    ts = [int(r[0]) for r in rows]
+    lo = bisect_left(ts, int(q["startTime"])) if "startTime" in q else 0
+    hi = bisect_right(ts, int(q["endTime"])) if "endTime" in q else len(rows)
+    limit = min(int(q.get("limit", 500)), 1500)
+    page = rows[lo:hi][:limit] if "startTime" in q else rows[lo:hi][-limit:]
+    step = interval_to_ms(bar)
+    return 200, [[int(r[0]), r[1], r[2], r[3], r[4], r[5], int(r[0]) + step - 1, r[7], 0, "0", "0", "0"]
+                 for r in page]
+
+
+def binance_book_ticker(h: _SimHandler):
+    futures = _binance_futures(h)
+    rows = []
+    for inst_id, t in h.sim.tickers.items():
+        symbol = "".join(inst_id.split("-")[:2])
+        if inst_id.endswith("-SWAP") != futures or ("symbol" in h.query and h.query["symbol"] != symbol):
+            continue
+        rows.append({"symbol": symbol, "bidPrice": t["bidPx"], "bidQty": t.get("bidSz", "0"),
+                     "askPrice": t["askPx"], "askQty": t.get("askSz", "0"), "time": int(t["ts"])})
+    return 200, rows[0] if "symbol" in h.query and rows else rows
+
+
+# (method, path) -> (handler, signed)
+_ROUTES = {
+    ("POST", "/api/v5/trade/order"): (okx_place_order, True),
+    ("GET", "/api/v5/trade/order"): (okx_get_order, True),
+    ("POST", "/api/v5/trade/cancel-order"): (okx_cancel_order, True),
+    ("POST", "/api/v5/trade/batch-orders"): (okx_batch_orders, True),
+    ("POST", "/api/v5/trade/cancel-batch-orders"): (okx_cancel_batch_orders, True),
+    ("GET", "/api/v5/trade/orders-pending"): (okx_orders_pending, True),
+    ("GET", "/api/v5/account/positions"): (okx_positions, True),
+    ("GET", "/api/v5/account/balance"): (okx_balance, True),
+    ("POST", "/api/v5/account/set-leverage"): (okx_ack, True),
+    ("POST", "/api/v5/account/set-margin-mode"): (okx_ack, True),
+    ("GET", "/api/v5/market/candles"): (okx_candles, False),
+    ("GET", "/api/v5/market/history-candles"): (okx_candles, False),
+    ("GET", "/api/v5/market/ticker"): (okx_ticker, False),
+    ("GET", "/api/v5/market/tickers"): (okx_tickers, False),
+}
+for _prefix, _order_path, _open_path, _account_path in (("/fapi", "/fapi/v1/order", "/fapi/v1/openOrders", "/fapi/v2/account"),
+                                                         ("/api", "/api/v3/order", "/api/v3/openOrders", "/api/v3/account")):
+    _ROUTES.update({
+        ("POST", _order_path): (binance_place_order, True),
+        ("GET", _order_path): (binance_get_order, True),
+        ("DELETE", _order_path): (binance_cancel_order, True),
+        ("GET", _open_path): (binance_open_orders, True),
+        ("DELETE", _open_path): (binance_cancel_open_orders, True),
+        ("GET", _account_path): (binance_account, True),
+    })
+_ROUTES.update({
+    ("GET", "/fapi/v2/positionRisk"): (binance_position_risk, True),
+    ("POST", "/fapi/v1/leverage"): (binance_ack, True),
+    ("POST", "/fapi/v1/marginType"): (binance_ack, True),
+    ("GET", "/fapi/v1/klines"): (binance_klines, False),
+    ("GET", "/api/v3/klines"): (binance_klines, False),
+    ("GET", "/fapi/v1/ticker/bookTicker"): (binance_book_ticker, False),
+    ("GET", "/api/v3/ticker/bookTicker"): (binance_book_ticker, False),
+})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OKX/Binance exchange simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--replay", help="connector.ws_recorder chunk directory to replay")
+    parser.add_argument("--klines", help="KlineStore sqlite path to replay bars from")
+    parser.add_argument("--symbol", default="BTC-USDT")
+    parser.add_argument("--interval", default="1m")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed multiplier, 0 = as fast as possible")
+    parser.add_argument("--warmup", type=int, default=300, help="bars served as REST history before the replay starts")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--slippage-bps", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    sim = ExchangeSimulator(args.host, args.port, latency=args.latency, jitter=args.jitter,
+                            error_rate=args.error_rate, slippage_bps=args.slippage_bps, seed=args.seed)
+    sim.start()
+    for name, value in sim.env().items():
+        print(f"export {name}={value}")
+    speed = args.speed if args.speed > 0 else None
+    if args.replay:
+        sim.start_feed(sim.replay_recording, args.replay, speed)
+    elif args.klines:
+        from datawarehouse.kline_db import get_store
+        rows = get_store(args.klines).fetch_range(args.symbol, args.interval).to_dict("records")
+        inst_id = f"{args.symbol.replace('_', '-').upper()}-SWAP"
+        print(f"[SIM] replaying {len(rows)} {args.interval} bars of {inst_id}")
+        sim.start_feed(sim.replay_klines, inst_id, rows, args.interval, speed, args.warmup)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        sim.stop()
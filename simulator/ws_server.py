@@ -0,0 +1,109 @@
+import base64
+import hashlib
+import socket
+import struct
+import threading
+from typing import Optional, Set, Tuple
+
+# RFC 6455 最小實作: 只處理未分段的 text / ping / close frame，足夠模擬 OKX 的 JSON 推播
+_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_TEXT = 0x1
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+
+def accept_key(key: str) -> str:
+    return base64.b64encode(hashlib.sha1(key.encode() + _GUID).digest()).decode()
+
+
+def encode_frame(payload: bytes, opcode: int = OP_TEXT) -> bytes:
+    # server -> client 不加 mask
+    n = len(payload)
+    if n < 126:
+        header = struct.pack("!BB", 0x80 | opcode, n)
+    elif n < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, n)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, n)
+    return header + payload
+
+
+def _read_exact(rfile, n: int) -> bytes:
+    data = rfile.read(n)
+    if data is None or len(data) < n:
+        raise ConnectionError("websocket closed")
+    return data
+
+
+def read_frame(rfile) -> Tuple[int, bytes]:
+    b1, b2 = _read_exact(rfile, 2)
+    opcode = b1 & 0x0F
+    n = b2 & 0x7F
+    if n == 126:
+        n = struct.unpack("!H", _read_exact(rfile, 2))[0]
+    elif n == 127:
+        n = struct.unpack("!Q", _read_exact(rfile, 8))[0]
+    mask = _read_exact(rfile, 4) if b2 & 0x80 else None
+    payload = _read_exact(rfile, n)
+    if mask is not None:
+        # 整段一次 XOR，比逐 byte 快
+        key = int.from_bytes((mask * (n // 4 + 1))[:n], "big")
+        payload = (int.from_bytes(payload, "big") ^ key).to_bytes(n, "big")
+    return opcode, payload
+
+
+class WsSession:
+    """
+    One accepted websocket connection of the simulator.
+
+    `subscriptions` holds (channel, instId-or-instType) pairs; sends are
+    serialized because pushes come from the feed thread while the handler
+    thread answers pings and subscribe requests.
+    """
+
+    def __init__(self, conn: socket.socket, rfile, path: str, conn_id: str):
+        self.conn = conn
+        self.rfile = rfile
+        self.path = path
+        self.conn_id = conn_id
+        self.subscriptions: Set[Tuple[str, str]] = set()
+        self.logged_in = False
+        self.closed = False
+        self._send_lock = threading.Lock()
+
+    def send(self, text: str, opcode: int = OP_TEXT):
+        if self.closed:
+            return
+        frame = encode_frame(text.encode() if isinstance(text, str) else text, opcode)
+        try:
+            with self._send_lock:
+                self.conn.sendall(frame)
+        except OSError:
+            self.closed = True
+
+    def receive(self) -> Optional[str]:
+        """Next text message, answering control frames; None once the peer closes."""
+        while not self.closed:
+            try:
+                opcode, payload = read_frame(self.rfile)
+            except (ConnectionError, OSError, ValueError):
+                self.closed = True
+                return None
+            if opcode == OP_TEXT:
+                return payload.decode()
+            if opcode == OP_PING:
+                self.send(payload, OP_PONG)
+            elif opcode == OP_CLOSE:
+                self.send(payload[:2], OP_CLOSE)
+                self.closed = True
+        return None
+
+    def close(self):
+        # 模擬交易所斷線: 直接關 socket，不送 close frame
+        self.closed = True
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass